@@ -57,6 +57,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "order_service.replicas.ReplicaPinMiddleware",
 ]
 
 ROOT_URLCONF = "ddp.urls"
@@ -91,9 +92,33 @@ DATABASES = {
         "PORT": os.getenv("DB_PORT"),
         "USER": os.getenv("DB_USER"),
         "PASSWORD": os.getenv("DB_PASSWORD"),
+        # пул соединений для DB_ENGINE=order_service.backends.postgresql_pool:
+        # размер на процесс, время жизни соединения и ожидание свободного, с
+        "POOL": {
+            "SIZE": int(os.getenv("DB_POOL_SIZE", 10)),
+            "MAX_AGE": int(os.getenv("DB_POOL_MAX_AGE", 600)),
+            "TIMEOUT": float(os.getenv("DB_POOL_TIMEOUT", 10)),
+        },
     }
 }
 
+# Реплики только для чтения: хосты через запятую, остальные параметры
+# подключения как у default. Каталог и история заказов читаются с реплик
+DATABASE_REPLICAS = []
+for host in filter(None, os.getenv("DB_REPLICA_HOSTS", "").split(",")):
+    alias = f"replica{len(DATABASE_REPLICAS) + 1}"
+    DATABASES[alias] = {
+        **DATABASES["default"],
+        "HOST": host.strip(),
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ["order_service.replicas.ReplicaRouter"]
+
+# Сколько секунд после записи клиент читает с основной базы
+REPLICA_STICKY_SECONDS = int(os.getenv("REPLICA_STICKY_SECONDS", 5))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -163,3 +188,42 @@ REST_FRAMEWORK = {
         "rest_framework.authentication.TokenAuthentication",
     ],
 }
+
+# Кеш должен быть общим для веб-процессов и обработчика фоновых загрузок,
+# например django.core.cache.backends.redis.RedisCache
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.getenv("CACHE_LOCATION", ""),
+    }
+}
+
+# Время хранения ответов каталога в кеше, секунды
+CATALOG_CACHE_TIMEOUT = int(os.getenv("CATALOG_CACHE_TIMEOUT", 300))
+
+# Число строк, читаемых за раз при выгрузке каталога (products/export)
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", 2000))
+
+# Выгрузка изменений (products/export?since=): на сколько секунд since
+# сдвигается назад, чтобы не пропустить строки долгих транзакций,
+# и сколько дней хранятся отметки об удалённых предложениях
+EXPORT_SINCE_OVERLAP = int(os.getenv("EXPORT_SINCE_OVERLAP", 300))
+EXPORT_TOMBSTONE_DAYS = int(os.getenv("EXPORT_TOMBSTONE_DAYS", 30))
+
+# Размер пакета при загрузке прайсов поставщиков
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", 1000))
+
+# Фоновые загрузки (manage.py run_import_jobs): обработчик отмечается
+# в задаче раз в IMPORT_JOB_HEARTBEAT секунд, задача без отметки дольше
+# IMPORT_JOB_STALE_SECONDS возвращается в очередь, а после
+# IMPORT_JOB_MAX_ATTEMPTS попыток завершается с ошибкой
+IMPORT_JOB_HEARTBEAT = int(os.getenv("IMPORT_JOB_HEARTBEAT", 10))
+IMPORT_JOB_STALE_SECONDS = int(os.getenv("IMPORT_JOB_STALE_SECONDS", 60))
+IMPORT_JOB_MAX_ATTEMPTS = int(os.getenv("IMPORT_JOB_MAX_ATTEMPTS", 3))
+
+# Загрузка прайсов по ссылкам магазинов (manage.py pull_feeds)
+FEED_PULL_INTERVAL = int(os.getenv("FEED_PULL_INTERVAL", 3600))
+FEED_PULL_CONCURRENCY = int(os.getenv("FEED_PULL_CONCURRENCY", 4))
+FEED_TIMEOUT = int(os.getenv("FEED_TIMEOUT", 60))
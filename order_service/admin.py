@@ -12,7 +12,9 @@ from order_service.models import (
     Order,
     OrderItem,
     Contact,
+    ImportJob,
 )
+from order_service.totals import refresh_order_totals
 
 
 @admin.register(User)
@@ -97,12 +99,27 @@ class ProductParameterAdmin(admin.ModelAdmin):
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
-    pass
+    readonly_fields = ("total_sum", "items_count")
 
 
 @admin.register(OrderItem)
 class OrderItemAdmin(admin.ModelAdmin):
-    pass
+    """
+    Позиции заказов: при изменении пересчитываются суммы заказов
+    """
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        refresh_order_totals({obj.order_id, form.initial.get("order", obj.order_id)})
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        refresh_order_totals([obj.order_id])
+
+    def delete_queryset(self, request, queryset):
+        order_ids = set(queryset.values_list("order_id", flat=True))
+        super().delete_queryset(request, queryset)
+        refresh_order_totals(order_ids)
 
 
 @admin.register(Contact)
@@ -110,6 +127,18 @@ class ContactAdmin(admin.ModelAdmin):
     pass
 
 
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "user",
+        "state",
+        "created_at",
+        "finished_at",
+        "rows",
+    )
+
+
 # @admin.register(ConfirmEmailToken)
 # class ConfirmEmailTokenAdmin(admin.ModelAdmin):
 #     list_display = ('user', 'key', 'created_at',)
@@ -9,3 +9,4 @@ class OrderServiceConfig(AppConfig):
         """
         импортируем сигналы
         """
+        import order_service.signals  # noqa: F401
@@ -0,0 +1,40 @@
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.psycopg_any import IsolationLevel
+
+from order_service.pooling import get_pool
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    PostgreSQL с пулом соединений процесса (order_service.pooling).
+
+    Django по-прежнему закрывает соединение в конце запроса
+    (CONN_MAX_AGE = 0), но закрытие возвращает его в пул, а следующее
+    открытие берёт готовое соединение из пула без подключения к серверу.
+    Размер пула и время жизни соединения задаются в POOL.
+    """
+
+    pool = None
+
+    def get_new_connection(self, conn_params):
+        self.pool = get_pool(self.alias, self.settings_dict)
+        if self.pool is None:
+            return super().get_new_connection(conn_params)
+        connection = self.pool.checkout(
+            lambda: super(DatabaseWrapper, self).get_new_connection(conn_params)
+        )
+        # для соединения из пула уровень изоляции берём из настроек, как
+        # при подключении
+        self.isolation_level = IsolationLevel(
+            self.settings_dict["OPTIONS"].get(
+                "isolation_level", IsolationLevel.READ_COMMITTED
+            )
+        )
+        return connection
+
+    def _close(self):
+        if self.connection is None or self.pool is None:
+            return super()._close()
+        broken = self.errors_occurred and not self.is_usable()
+        with self.wrap_database_errors:
+            self.pool.checkin(self.connection, broken=broken)
@@ -0,0 +1,139 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+CATALOG_CACHE_TIMEOUT = getattr(settings, "CATALOG_CACHE_TIMEOUT", 300)
+
+VERSION_KEY = "catalog:version"
+MODIFIED_KEY = "catalog:modified"
+HITS_KEY = "catalog:cache:hits"
+MISSES_KEY = "catalog:cache:misses"
+
+
+def _incr(key):
+    """
+    Атомарно увеличиваем счётчик в кеше, создавая его при отсутствии
+    """
+    cache.add(key, 0, None)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # ключ вытеснен из кеша между add и incr
+        cache.set(key, 1, None)
+        return 1
+
+
+def catalog_state():
+    """
+    Текущая версия каталога и время её изменения одним запросом к кешу.
+    Версия входит в ключ кеша ответов и в ETag.
+    """
+    state = cache.get_many([VERSION_KEY, MODIFIED_KEY])
+    if VERSION_KEY not in state:
+        # после потери ключа версия не должна совпасть с прежней
+        now = int(time.time())
+        cache.add(VERSION_KEY, now, None)
+        cache.set(MODIFIED_KEY, now, None)
+        state = {VERSION_KEY: cache.get(VERSION_KEY, now), MODIFIED_KEY: now}
+    elif MODIFIED_KEY not in state:
+        state[MODIFIED_KEY] = int(time.time())
+        cache.set(MODIFIED_KEY, state[MODIFIED_KEY], None)
+    return state[VERSION_KEY], state[MODIFIED_KEY]
+
+
+class _Bump:
+    """
+    Отложенный до фиксации транзакции сброс кеша каталога
+    """
+
+    done = False
+
+    def __call__(self):
+        self.done = True
+        catalog_state()
+        _incr(VERSION_KEY)
+        cache.set(MODIFIED_KEY, int(time.time()), None)
+
+
+def bump_catalog_version():
+    """
+    Сбрасываем кеш ответов каталога после фиксации транзакции:
+    ответы со старой версией в ключе больше не читаются
+    и вытесняются по таймауту.
+
+    Сигналы удаления вызывают сброс для каждой строки, поэтому
+    в одной транзакции он откладывается только один раз.
+    """
+    for _, callback, *_ in transaction.get_connection().run_on_commit:
+        if isinstance(callback, _Bump) and not callback.done:
+            return
+    transaction.on_commit(_Bump())
+
+
+def cache_stats():
+    version, modified = catalog_state()
+    return {
+        "version": version,
+        "modified": http_date(modified),
+        "hits": cache.get(HITS_KEY, 0),
+        "misses": cache.get(MISSES_KEY, 0),
+    }
+
+
+class CachedListMixin:
+    """
+    Кеширование ответов списков каталога.
+
+    Ключ - адрес запроса с параметрами и версия каталога, поэтому
+    изменения каталога сразу видны без поиска устаревших ключей.
+    В заголовке X-Cache ответа указывается HIT или MISS.
+
+    Ответы несут ETag из версии каталога и адреса и Last-Modified
+    из времени изменения каталога. На условный запрос с совпадающим
+    If-None-Match или If-Modified-Since отвечаем 304 до чтения кеша
+    ответов и базы.
+    """
+
+    cache_timeout = CATALOG_CACHE_TIMEOUT
+
+    def get_cache_key(self, request, version):
+        url = request.build_absolute_uri().encode()
+        return f"catalog:response:{version}:{hashlib.md5(url).hexdigest()}"
+
+    def get_etag(self, request, version):
+        url = request.build_absolute_uri().encode()
+        digest = hashlib.md5(url + request.accepted_renderer.format.encode())
+        return f'"{version}-{digest.hexdigest()[:16]}"'
+
+    def list(self, request, *args, **kwargs):
+        version, modified = catalog_state()
+        etag = self.get_etag(request, version)
+        not_modified = get_conditional_response(
+            request._request, etag=etag, last_modified=modified
+        )
+        headers = {"ETag": etag, "Last-Modified": http_date(modified)}
+        if not_modified is not None:
+            for name, value in headers.items():
+                not_modified[name] = value
+            return not_modified
+
+        key = self.get_cache_key(request, version)
+        data = cache.get(key)
+        if data is not None:
+            _incr(HITS_KEY)
+            return Response(data, headers={**headers, "X-Cache": "HIT"})
+
+        _incr(MISSES_KEY)
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, self.cache_timeout)
+            for name, value in headers.items():
+                response[name] = value
+        response["X-Cache"] = "MISS"
+        return response
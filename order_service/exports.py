@@ -0,0 +1,148 @@
+import csv
+import json
+from datetime import timedelta
+from itertools import chain
+
+from django.conf import settings
+from django.db.models import Max
+from django.utils import timezone
+from rest_framework import serializers
+
+from order_service.mappers import CATALOG_OPTIONAL, CATALOG_SPEC, compile_mapper
+from order_service.models import CatalogEntry, CatalogTombstone
+
+EXPORT_CHUNK_SIZE = getattr(settings, "EXPORT_CHUNK_SIZE", 2000)
+EXPORT_SINCE_OVERLAP = getattr(settings, "EXPORT_SINCE_OVERLAP", 300)
+EXPORT_TOMBSTONE_DAYS = getattr(settings, "EXPORT_TOMBSTONE_DAYS", 30)
+
+EXPORT_SPEC = (
+    *(item for item in CATALOG_SPEC if item[0] not in CATALOG_OPTIONAL),
+    ("updated_at", "updated_at"),
+)
+
+CSV_HEADER = (
+    "id",
+    "model",
+    "name",
+    "category",
+    "shop_name",
+    "quantity",
+    "price",
+    "price_rrc",
+    "parameters",
+    "updated_at",
+    "deleted",
+)
+
+
+class _Echo:
+    """
+    Буфер для csv.writer, который сразу возвращает записанную строку
+    """
+
+    def write(self, value):
+        return value
+
+
+def changed_since(since):
+    """
+    Строки каталога, изменённые после since, и id удалённых предложений.
+
+    updated_at отмечается временем записи, а не фиксации транзакции:
+    строка долгой загрузки становится видна позже своего времени. Поэтому
+    since сдвигается назад на EXPORT_SINCE_OVERLAP секунд, и строки
+    на границе выгрузок приходят повторно - получатель применяет их по id.
+    """
+    since -= timedelta(seconds=EXPORT_SINCE_OVERLAP)
+    entries = CatalogEntry.objects.filter(shop_state=True, updated_at__gt=since)
+    deleted = (
+        CatalogTombstone.objects.filter(deleted_at__gt=since)
+        .exclude(
+            product_info_id__in=CatalogEntry.objects.filter(shop_state=True).values(
+                "pk"
+            )
+        )
+        .order_by("product_info_id")
+        .values("product_info_id")
+        .annotate(deleted_at=Max("deleted_at"))
+        .values_list("product_info_id", "deleted_at")
+    )
+    # строки отключённых магазинов пропадают из выгрузки так же, как удалённые
+    disabled = (
+        CatalogEntry.objects.filter(shop_state=False, updated_at__gt=since)
+        .order_by("product_info_id")
+        .values_list("product_info_id", "updated_at")
+    )
+    return entries, chain(deleted.iterator(), disabled.iterator())
+
+
+def purge_tombstones(days=None):
+    """
+    Удаляем отметки об удалении старше EXPORT_TOMBSTONE_DAYS дней:
+    получатели выгрузки должны забирать изменения чаще
+    """
+    days = EXPORT_TOMBSTONE_DAYS if days is None else days
+    deleted, _ = CatalogTombstone.objects.filter(
+        deleted_at__lt=timezone.now() - timedelta(days=days)
+    ).delete()
+    return deleted
+
+
+def _rows(queryset, deleted, chunk_size):
+    to_representation = serializers.DateTimeField().to_representation
+    mapper = compile_mapper(EXPORT_SPEC, {"updated_at": to_representation})
+    for row in (
+        queryset.order_by("product_info_id")
+        .values(*mapper.columns)
+        .iterator(chunk_size=chunk_size)
+    ):
+        yield mapper(row)
+    for pk, deleted_at in deleted:
+        yield {"id": pk, "deleted": True, "updated_at": to_representation(deleted_at)}
+
+
+def ndjson_lines(queryset, deleted=(), chunk_size=None):
+    """
+    Строки каталога в формате JSON Lines, как в ответе products
+    с добавлением updated_at. Удалённые предложения выводятся после них
+    строками {"id", "deleted": true, "updated_at"}.
+    """
+    for row in _rows(queryset, deleted, chunk_size or EXPORT_CHUNK_SIZE):
+        yield json.dumps(row, ensure_ascii=False) + "\n"
+
+
+def csv_lines(queryset, deleted=(), chunk_size=None):
+    """
+    Строки каталога в формате CSV, параметры товара записываются
+    одним столбцом в JSON. У удалённых предложений заполнены только
+    id, updated_at и deleted.
+    """
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CSV_HEADER)
+    for row in _rows(queryset, deleted, chunk_size or EXPORT_CHUNK_SIZE):
+        if row.get("deleted"):
+            yield writer.writerow(
+                (row["id"], *[""] * (len(CSV_HEADER) - 3), row["updated_at"], "true")
+            )
+            continue
+        yield writer.writerow(
+            (
+                row["id"],
+                row["model"],
+                row["product"]["name"],
+                row["product"]["category"],
+                row["shop_name"],
+                row["quantity"],
+                row["price"],
+                row["price_rrc"],
+                json.dumps(row["product_parameters"], ensure_ascii=False),
+                row["updated_at"],
+                "false",
+            )
+        )
+
+
+EXPORTS = {
+    "ndjson": (ndjson_lines, "application/x-ndjson; charset=utf-8"),
+    "csv": (csv_lines, "text/csv; charset=utf-8"),
+}
@@ -0,0 +1,95 @@
+from collections import defaultdict
+
+from django.db.models import Count
+
+from order_service.models import CatalogFacet, FacetValue
+
+
+def index_facets(values):
+    """
+    Обновляем индекс фильтров для строк каталога.
+
+    values - словарь id строки каталога -> множество пар
+    (id параметра, значение). Добавляются только недостающие связи,
+    лишние удаляются.
+    """
+    pairs = set().union(*values.values()) if values else set()
+    if pairs:
+        FacetValue.objects.bulk_create(
+            [FacetValue(parameter_id=pk, value=value) for pk, value in pairs],
+            ignore_conflicts=True,
+        )
+    facet_ids = {
+        (parameter_id, value): pk
+        for pk, parameter_id, value in FacetValue.objects.filter(
+            parameter_id__in={pk for pk, _ in pairs},
+            value__in={value for _, value in pairs},
+        ).values_list("id", "parameter_id", "value")
+    }
+
+    needed = {
+        (entry_id, facet_ids[pair])
+        for entry_id, items in values.items()
+        for pair in items
+    }
+    current = {
+        (entry_id, facet_value_id): pk
+        for pk, entry_id, facet_value_id in CatalogFacet.objects.filter(
+            entry_id__in=values
+        ).values_list("id", "entry_id", "facet_value_id")
+    }
+    stale = [pk for key, pk in current.items() if key not in needed]
+    if stale:
+        CatalogFacet.objects.filter(id__in=stale).delete()
+    missing = needed - current.keys()
+    if missing:
+        CatalogFacet.objects.bulk_create(
+            [
+                CatalogFacet(entry_id=entry_id, facet_value_id=facet_value_id)
+                for entry_id, facet_value_id in missing
+            ],
+            ignore_conflicts=True,
+        )
+
+
+def filter_by_facets(queryset, facet_ids):
+    """
+    Отбираем строки каталога по значениям фильтров: значения одного
+    параметра объединяются через ИЛИ, разных параметров - через И
+    """
+    groups = defaultdict(list)
+    for pk, parameter_id in FacetValue.objects.filter(id__in=facet_ids).values_list(
+        "id", "parameter_id"
+    ):
+        groups[parameter_id].append(pk)
+    if not groups:
+        return queryset.none()
+    for ids in groups.values():
+        queryset = queryset.filter(
+            product_info_id__in=CatalogFacet.objects.filter(
+                facet_value_id__in=ids
+            ).values("entry_id")
+        )
+    return queryset
+
+
+def facet_counts(queryset):
+    """
+    Считаем число строк выборки для каждого значения фильтра по индексу
+    """
+    counts = dict(
+        CatalogFacet.objects.filter(entry__in=queryset.order_by().values("pk"))
+        .values_list("facet_value_id")
+        .annotate(count=Count("id"))
+    )
+    facets = defaultdict(list)
+    for pk, parameter, value in (
+        FacetValue.objects.filter(id__in=counts)
+        .order_by("parameter__name", "value")
+        .values_list("id", "parameter__name", "value")
+    ):
+        facets[parameter].append({"id": pk, "value": value, "count": counts[pk]})
+    return [
+        {"parameter": parameter, "values": values}
+        for parameter, values in facets.items()
+    ]
@@ -0,0 +1,131 @@
+import hashlib
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from urllib.error import HTTPError
+from urllib.parse import urlsplit
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from order_service.importers import import_price_list
+from order_service.models import Shop
+
+FEED_PULL_INTERVAL = getattr(settings, "FEED_PULL_INTERVAL", 3600)
+FEED_PULL_CONCURRENCY = getattr(settings, "FEED_PULL_CONCURRENCY", 4)
+FEED_TIMEOUT = getattr(settings, "FEED_TIMEOUT", 60)
+CHUNK_SIZE = 64 * 1024
+FEED_SCHEMES = ("http", "https")
+
+
+def due_shops(interval=None):
+    """
+    Активные магазины со ссылкой на прайс, который пора проверить
+    """
+    interval = FEED_PULL_INTERVAL if interval is None else interval
+    threshold = timezone.now() - timedelta(seconds=interval)
+    return (
+        Shop.objects.filter(state=True, url__isnull=False)
+        .exclude(url="")
+        .filter(Q(feed_fetched_at__isnull=True) | Q(feed_fetched_at__lte=threshold))
+    )
+
+
+def fetch_feed(shop, timeout=None):
+    """
+    Скачиваем прайс магазина во временный файл.
+
+    Скачиваются только ссылки http и https. Отправляем If-None-Match
+    и If-Modified-Since из прошлой проверки.
+    Возвращаем словарь с результатом: при ответе 304 файла нет,
+    иначе в path лежит файл, а в hash - его sha256.
+    """
+    headers = {}
+    if shop.feed_etag:
+        headers["If-None-Match"] = shop.feed_etag
+    if shop.feed_last_modified:
+        headers["If-Modified-Since"] = shop.feed_last_modified
+
+    result = {"shop": shop, "status": None, "path": None, "error": None}
+    try:
+        if urlsplit(shop.url).scheme not in FEED_SCHEMES:
+            raise ValueError("Ссылка на прайс должна начинаться с http или https")
+        with urlopen(
+            Request(shop.url, headers=headers), timeout=timeout or FEED_TIMEOUT
+        ) as response:
+            digest = hashlib.sha256()
+            with tempfile.NamedTemporaryFile(delete=False) as file:
+                result["path"] = file.name
+                while chunk := response.read(CHUNK_SIZE):
+                    digest.update(chunk)
+                    file.write(chunk)
+            result["etag"] = response.headers.get("ETag", "")
+            result["last_modified"] = response.headers.get("Last-Modified", "")
+            result["hash"] = digest.hexdigest()
+            result["status"] = "fetched"
+    except HTTPError as error:
+        if error.code == 304:
+            result["status"] = "not_modified"
+        else:
+            result["status"] = "failed"
+            result["error"] = str(error)
+    except Exception as error:
+        result["status"] = "failed"
+        result["error"] = str(error)
+    return result
+
+
+def apply_feed(result):
+    """
+    Загружаем скачанный прайс, если его содержимое изменилось,
+    и запоминаем данные для следующей проверки.
+
+    Время проверки сохраняется и при ошибке, чтобы неработающий прайс
+    проверялся раз в FEED_PULL_INTERVAL, а не при каждом запуске.
+    ETag и хеш при ошибке не сохраняются, и прайс загрузится снова.
+    """
+    shop = result["shop"]
+    update = {"feed_fetched_at": timezone.now()}
+    try:
+        if result["status"] == "fetched":
+            update.update(
+                feed_etag=result["etag"][:255],
+                feed_last_modified=result["last_modified"][:64],
+            )
+            if result["hash"] == shop.feed_hash:
+                result["status"] = "unchanged"
+            else:
+                with open(result["path"], "rb") as stream:
+                    result["stats"] = import_price_list(
+                        stream, shop=shop, name=urlsplit(shop.url).path
+                    ).stats
+                update["feed_hash"] = result["hash"]
+                result["status"] = "imported"
+    except Exception as error:
+        result["status"] = "failed"
+        result["error"] = str(error)
+    finally:
+        if result["path"]:
+            os.unlink(result["path"])
+
+    if result["status"] == "failed":
+        update = {"feed_fetched_at": update["feed_fetched_at"]}
+    Shop.objects.filter(id=shop.id).update(**update)
+    return result
+
+
+def pull_feeds(shops, concurrency=None, timeout=None):
+    """
+    Проверяем прайсы магазинов по ссылкам.
+
+    Скачивание идёт параллельно, не больше concurrency запросов
+    одновременно, а загрузка в базу - по очереди в текущем потоке.
+    """
+    with ThreadPoolExecutor(
+        max_workers=concurrency or FEED_PULL_CONCURRENCY
+    ) as executor:
+        fetched = executor.map(lambda shop: fetch_feed(shop, timeout), list(shops))
+        return [apply_feed(result) for result in fetched]
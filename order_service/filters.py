@@ -1,7 +1,10 @@
-from .models import Order, Category, Shop, ProductInfo
+from .models import Order, Category, Shop, CatalogEntry
 from django_filters import rest_framework as filters
 from django.db.models import Q
 
+from .facets import filter_by_facets
+from .search import search_entries
+
 
 class OrderFilter(filters.FilterSet):
     keyword = filters.CharFilter(method="filter_by_keyword", label="Поиск по словам")
@@ -48,16 +51,43 @@ class ShopFilter(filters.FilterSet):
         fields = ["state", "admin_email"]
 
 
+class NumberInFilter(filters.BaseInFilter, filters.NumberFilter):
+    pass
+
+
 class ProductFilter(filters.FilterSet):
     keyword = filters.CharFilter(method="filter_by_keyword", label="Поиск по словам")
+    facet = NumberInFilter(
+        method="filter_by_facet", label="Значения параметров через запятую"
+    )
+    price_min = filters.NumberFilter(
+        field_name="price", lookup_expr="gte", label="Цена от"
+    )
+    price_max = filters.NumberFilter(
+        field_name="price", lookup_expr="lte", label="Цена до"
+    )
+    in_stock = filters.BooleanFilter(method="filter_in_stock", label="В наличии")
+    shop_id = NumberInFilter(
+        field_name="shop_id", lookup_expr="in", label="Магазины через запятую"
+    )
+    category_id = NumberInFilter(
+        field_name="category_id", lookup_expr="in", label="Категории через запятую"
+    )
 
     @staticmethod
     def filter_by_keyword(queryset, name, value):
-        return queryset.filter(
-            Q(product__name__icontains=value)
-            | Q(product__category__name__icontains=value)
-        )
+        return search_entries(queryset, value)
+
+    @staticmethod
+    def filter_by_facet(queryset, name, value):
+        return filter_by_facets(queryset, value)
+
+    @staticmethod
+    def filter_in_stock(queryset, name, value):
+        if value:
+            return queryset.filter(quantity__gt=0)
+        return queryset.filter(quantity=0)
 
     class Meta:
-        model = ProductInfo
+        model = CatalogEntry
         fields = ["product_id"]
@@ -0,0 +1,787 @@
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from itertools import chain, islice
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, F, Q, Value, When
+from django.db.models.functions import Now
+
+from order_service.models import (
+    Shop,
+    Category,
+    Product,
+    ProductInfo,
+    Parameter,
+    ProductParameter,
+    OrderItem,
+    CatalogEntry,
+)
+from order_service.caching import bump_catalog_version
+from order_service.facets import index_facets
+from order_service.readers import read_price_list
+from order_service.totals import refresh_basket_totals, refresh_order_totals
+
+IMPORT_BATCH_SIZE = getattr(settings, "IMPORT_BATCH_SIZE", 1000)
+
+_EXHAUSTED = object()
+
+
+def chunked(iterable, size):
+    """
+    Разбиваем последовательность на списки длиной не больше size
+    """
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+ENTRY_FIELDS = (
+    "shop_id",
+    "shop_name",
+    "shop_state",
+    "product_id",
+    "product_name",
+    "category_id",
+    "category_name",
+    "model",
+    "external_id",
+    "quantity",
+    "price",
+    "price_rrc",
+)
+
+SOURCE_FIELDS = (
+    "shop_id",
+    "shop__name",
+    "shop__state",
+    "product_id",
+    "product__name",
+    "product__category_id",
+    "product__category__name",
+    "model",
+    "external_id",
+    "quantity",
+    "price",
+    "price_rrc",
+)
+
+
+def refresh_entries(product_info_ids, batch_size=None):
+    """
+    Пересобираем строки каталога для карточек текущей версии.
+
+    На пакет карточек выполняется постоянное число запросов: карточки
+    с магазином, товаром и категорией, их параметры, запись строк каталога
+    и индекса фильтров. Возвращаем число записанных строк.
+    """
+    batch_size = batch_size or IMPORT_BATCH_SIZE
+    written = 0
+    for chunk in chunked(product_info_ids, batch_size):
+        parameters = defaultdict(list)
+        facets = defaultdict(set)
+        for product_info_id, parameter_id, name, value in (
+            ProductParameter.objects.filter(product_info_id__in=chunk)
+            .order_by("id")
+            .values_list("product_info_id", "parameter_id", "parameter__name", "value")
+        ):
+            parameters[product_info_id].append({"parameter": name, "value": value})
+            facets[product_info_id].add((parameter_id, value))
+
+        entries = [
+            CatalogEntry(
+                product_info_id=values[0],
+                parameters=parameters[values[0]],
+                **dict(zip(ENTRY_FIELDS, values[1:])),
+            )
+            for values in ProductInfo.objects.current()
+            .filter(id__in=chunk)
+            .values_list("id", *SOURCE_FIELDS)
+        ]
+        if entries:
+            CatalogEntry.objects.bulk_create(
+                entries,
+                batch_size=batch_size,
+                update_conflicts=True,
+                unique_fields=["product_info"],
+                update_fields=[*ENTRY_FIELDS, "parameters", "updated_at"],
+            )
+            index_facets(
+                {
+                    entry.product_info_id: facets[entry.product_info_id]
+                    for entry in entries
+                }
+            )
+        written += len(entries)
+    return written
+
+
+def rebuild_shop_entries(shop, batch_size=None):
+    """
+    Пересобираем каталог магазина целиком, например после переключения
+    на новую версию: строки прошлых версий удаляются
+    """
+    current = ProductInfo.objects.current().filter(shop_id=shop.id)
+    CatalogEntry.objects.filter(shop_id=shop.id).exclude(
+        product_info__in=current
+    ).delete()
+    return refresh_entries(
+        current.values_list("id", flat=True).order_by("id"), batch_size
+    )
+
+
+def rename_categories(names):
+    """
+    Обновляем названия категорий в каталоге одним запросом,
+    names - словарь id категории -> название
+    """
+    if not names:
+        return 0
+    return CatalogEntry.objects.filter(category_id__in=names).update(
+        updated_at=Now(),
+        category_name=Case(
+            *[When(category_id=pk, then=Value(name)) for pk, name in names.items()],
+            default=F("category_name"),
+            output_field=CatalogEntry._meta.get_field("category_name"),
+        ),
+    )
+
+
+def update_shop_entries(shops):
+    """
+    Обновляем название и статус магазинов в каталоге
+    """
+    for shop in shops:
+        CatalogEntry.objects.filter(shop_id=shop.id).update(
+            shop_name=shop.name, shop_state=shop.state, updated_at=Now()
+        )
+
+
+class CatalogImporter:
+    """
+    Класс для пакетной загрузки прайса поставщика.
+
+    Загрузка идёт по фазам: категории, товары, параметры, карточки товаров
+    и значения параметров. Каждая фаза выполняет постоянное число запросов
+    на пакет товаров, поэтому время загрузки растёт с числом пакетов,
+    а не с числом строк.
+
+    Карточки товаров сравниваются с текущими по external_id: записываются
+    только новые и изменённые строки, отсутствующие в прайсе удаляются.
+    """
+
+    PRODUCT_INFO_FIELDS = ("product_id", "model", "quantity", "price", "price_rrc")
+
+    def __init__(self, shop, batch_size=None, progress=None, version=None):
+        self.shop = shop
+        self.version = shop.catalog_version if version is None else version
+        self.batch_size = batch_size or IMPORT_BATCH_SIZE
+        self.progress = progress
+        self.timings = defaultdict(float)
+        self.queries = defaultdict(int)
+        self.rows = defaultdict(int)
+        self.stats = {
+            "categories": 0,
+            "product_infos": 0,
+            "product_parameters": 0,
+            "created": 0,
+            "updated": 0,
+            "unchanged": 0,
+            "deleted": 0,
+            "parameters_created": 0,
+            "parameters_updated": 0,
+            "parameters_deleted": 0,
+        }
+        self._parameters = {}
+        self._categories = set()
+        self._linked = None
+        self._seen = set()
+        self._changed = set()
+        self._phases = []
+
+    def run(self, data):
+        with connection.execute_wrapper(self._count_query):
+            with self.phase("categories"):
+                self.import_categories(data["categories"])
+            for chunk in chunked(self.timed(data["goods"], "parse"), self.batch_size):
+                self.import_goods(chunk)
+                if self.progress:
+                    self.progress(self)
+            with self.phase("cleanup"):
+                self.delete_stale()
+            if self.version == self.shop.catalog_version:
+                with self.phase("catalog"):
+                    self.rows["catalog"] += refresh_entries(
+                        sorted(self._changed), self.batch_size
+                    )
+        return self.stats
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Суммируем время выполнения фазы загрузки,
+        запросы к базе внутри фазы относятся к ней
+        """
+        started = time.perf_counter()
+        self._phases.append(name)
+        try:
+            yield
+        finally:
+            self._phases.pop()
+            self.timings[name] += time.perf_counter() - started
+
+    def _count_query(self, execute, sql, params, many, context):
+        if self._phases:
+            self.queries[self._phases[-1]] += 1
+        return execute(sql, params, many, context)
+
+    def profile(self):
+        """
+        Время, число запросов и число строк по фазам загрузки
+        """
+        return {
+            name: {
+                "time": round(seconds, 4),
+                "queries": self.queries[name],
+                "rows": self.rows[name],
+            }
+            for name, seconds in self.timings.items()
+        }
+
+    def timed(self, iterable, name):
+        """
+        Учитываем время получения каждого элемента как фазу name
+        """
+        iterator = iter(iterable)
+        while True:
+            with self.phase(name):
+                item = next(iterator, _EXHAUSTED)
+            if item is _EXHAUSTED:
+                return
+            self.rows[name] += 1
+            yield item
+
+    def import_categories(self, categories):
+        """
+        Записываем новые и переименованные категории и привязываем их
+        к магазину. Категории могут приходить частями вместе с товарами.
+        """
+        names = {
+            category["id"]: category["name"]
+            for category in categories
+            if category["id"] not in self._categories
+        }
+        if not names:
+            return
+
+        current = dict(Category.objects.filter(id__in=names).values_list("id", "name"))
+        # строки пишутся по возрастанию id, чтобы параллельные загрузки
+        # блокировали их в одном порядке
+        changed = [
+            Category(id=pk, name=name)
+            for pk, name in sorted(names.items())
+            if current.get(pk) != name
+        ]
+        if changed:
+            Category.objects.bulk_create(
+                changed,
+                batch_size=self.batch_size,
+                update_conflicts=True,
+                unique_fields=["id"],
+                update_fields=["name"],
+            )
+            rename_categories(
+                {obj.id: obj.name for obj in changed if obj.id in current}
+            )
+
+        links = Category.shops.through
+        if self._linked is None:
+            self._linked = set(
+                links.objects.filter(shop_id=self.shop.id).values_list(
+                    "category_id", flat=True
+                )
+            )
+        if names.keys() - self._linked:
+            links.objects.bulk_create(
+                [
+                    links(category_id=pk, shop_id=self.shop.id)
+                    for pk in sorted(names.keys() - self._linked)
+                ],
+                batch_size=self.batch_size,
+                ignore_conflicts=True,
+            )
+        self._categories.update(names)
+        self.stats["categories"] += len(names)
+        self.rows["categories"] += len(names)
+
+    def import_goods(self, goods):
+        categories = [
+            {"id": item["category"], "name": item["category_name"]}
+            for item in goods
+            if "category_name" in item
+        ]
+        if categories:
+            with self.phase("categories"):
+                self.import_categories(categories)
+        with self.phase("products"):
+            keys = {(item["name"], item["category"]) for item in goods}
+            products = self.resolve_products(keys)
+            self.rows["products"] += len(keys)
+        with self.phase("parameters"):
+            names = {name for item in goods for name in item["parameters"]}
+            parameters = self.resolve_parameters(names)
+            self.rows["parameters"] += len(names)
+        with self.phase("product_infos"):
+            product_infos = self.write_product_infos(goods, products)
+            self.rows["product_infos"] += len(product_infos)
+        with self.phase("product_parameters"):
+            self.rows["product_parameters"] += self.write_product_parameters(
+                product_infos, parameters
+            )
+
+    def write_product_infos(self, goods, products):
+        """
+        Записываем новые и изменённые карточки товаров пакета, возвращаем
+        словарь id карточки -> товар из прайса
+        """
+        rows = {item["id"]: item for item in goods}
+        current = {}
+        for values in ProductInfo.objects.filter(
+            shop_id=self.shop.id, catalog_version=self.version, external_id__in=rows
+        ).values_list("id", "external_id", *self.PRODUCT_INFO_FIELDS):
+            current.setdefault(values[1], values)
+
+        product_infos = {}
+        created = []
+        updated = []
+        repriced = []
+        for external_id, item in rows.items():
+            values = (
+                products[(item["name"], item["category"])],
+                item["model"],
+                item["quantity"],
+                item["price"],
+                item["price_rrc"],
+            )
+            product_info = ProductInfo(
+                shop_id=self.shop.id,
+                catalog_version=self.version,
+                external_id=external_id,
+                **dict(zip(self.PRODUCT_INFO_FIELDS, values)),
+            )
+            if external_id not in current:
+                created.append(product_info)
+                continue
+
+            product_info.id = current[external_id][0]
+            product_infos[product_info.id] = item
+            if current[external_id][2:] != values:
+                updated.append(product_info)
+            if current[external_id][5] != item["price"]:
+                repriced.append(product_info.id)
+
+        if created:
+            ProductInfo.objects.bulk_create(
+                created,
+                batch_size=self.batch_size,
+                update_conflicts=True,
+                unique_fields=["product", "shop", "external_id", "catalog_version"],
+                update_fields=["model", "price", "price_rrc", "quantity"],
+            )
+            new = {
+                pk: rows[external_id]
+                for pk, external_id in ProductInfo.objects.filter(
+                    shop_id=self.shop.id,
+                    catalog_version=self.version,
+                    external_id__in=[obj.external_id for obj in created],
+                ).values_list("id", "external_id")
+                if pk not in product_infos
+            }
+            product_infos.update(new)
+            self._changed.update(new)
+        if updated:
+            ProductInfo.objects.bulk_update(
+                updated, self.PRODUCT_INFO_FIELDS, batch_size=self.batch_size
+            )
+            self._changed.update(obj.id for obj in updated)
+        # корзины ссылаются только на карточки текущей версии
+        if repriced and self.version == self.shop.catalog_version:
+            refresh_basket_totals(repriced, self.batch_size)
+
+        self._seen.update(product_infos)
+        self.stats["product_infos"] += len(rows)
+        self.stats["created"] += len(created)
+        self.stats["updated"] += len(updated)
+        self.stats["unchanged"] += len(rows) - len(created) - len(updated)
+        return product_infos
+
+    def write_product_parameters(self, product_infos, parameters):
+        """
+        Записываем только добавленные и изменённые значения параметров,
+        удаляем значения, которых больше нет в прайсе
+        """
+        values = {
+            (pk, parameters[name]): str(value)
+            for pk, item in product_infos.items()
+            for name, value in item["parameters"].items()
+        }
+        current = {
+            (product_info_id, parameter_id): (pk, value)
+            for pk, product_info_id, parameter_id, value in ProductParameter.objects.filter(
+                product_info_id__in=product_infos
+            ).values_list(
+                "id", "product_info_id", "parameter_id", "value"
+            )
+        }
+
+        stale = {key: pk for key, (pk, _) in current.items() if key not in values}
+        if stale:
+            ProductParameter.objects.filter(id__in=stale.values()).delete()
+
+        changed = {
+            key: value
+            for key, value in values.items()
+            if key not in current or current[key][1] != value
+        }
+        if changed:
+            ProductParameter.objects.bulk_create(
+                [
+                    ProductParameter(
+                        product_info_id=product_info_id,
+                        parameter_id=parameter_id,
+                        value=value,
+                    )
+                    for (product_info_id, parameter_id), value in changed.items()
+                ],
+                batch_size=self.batch_size,
+                update_conflicts=True,
+                unique_fields=["product_info", "parameter"],
+                update_fields=["value"],
+            )
+
+        self._changed.update(key[0] for key in chain(changed, stale))
+        created = len(changed.keys() - current.keys())
+        self.stats["product_parameters"] += len(values)
+        self.stats["parameters_created"] += created
+        self.stats["parameters_updated"] += len(changed) - created
+        self.stats["parameters_deleted"] += len(stale)
+        return len(values)
+
+    def resolve_products(self, keys):
+        """
+        Возвращаем словарь (название, категория) -> id товара,
+        недостающие товары создаём одним запросом.
+
+        Те же товары может одновременно создать параллельная загрузка:
+        конфликты по уникальному ключу пропускаются, а id перечитываются.
+        """
+        names = {name for name, _ in keys}
+        products = {
+            (name, category_id): pk
+            for pk, name, category_id in Product.objects.filter(
+                name__in=names
+            ).values_list("id", "name", "category_id")
+        }
+        missing = keys - products.keys()
+        if missing:
+            Product.objects.bulk_create(
+                [
+                    Product(name=name, category_id=category_id)
+                    for name, category_id in sorted(missing)
+                ],
+                batch_size=self.batch_size,
+                ignore_conflicts=True,
+            )
+            products.update(
+                {
+                    (name, category_id): pk
+                    for pk, name, category_id in Product.objects.filter(
+                        name__in={name for name, _ in missing}
+                    ).values_list("id", "name", "category_id")
+                }
+            )
+        return products
+
+    def resolve_parameters(self, names):
+        """
+        Возвращаем словарь название -> id параметра, названия кешируются
+        на всё время загрузки. Конфликты с параллельной загрузкой
+        обрабатываются как в resolve_products.
+        """
+        missing = names - self._parameters.keys()
+        if missing:
+            found = dict(
+                Parameter.objects.filter(name__in=missing).values_list("name", "id")
+            )
+            new = missing - found.keys()
+            if new:
+                Parameter.objects.bulk_create(
+                    [Parameter(name=name) for name in sorted(new)],
+                    batch_size=self.batch_size,
+                    ignore_conflicts=True,
+                )
+                found.update(
+                    Parameter.objects.filter(name__in=new).values_list("name", "id")
+                )
+            self._parameters.update(found)
+        return self._parameters
+
+    def delete_stale(self):
+        """
+        Удаляем карточки товаров магазина, которых не было в прайсе,
+        и отвязываем от магазина отсутствующие в прайсе категории.
+
+        Карточки, на которые ссылаются оформленные заказы, не удаляются,
+        а снимаются с продажи: пропадают из каталога и из текущей версии
+        магазина. Позиции корзин с такими карточками удаляются.
+        """
+        Category.shops.through.objects.filter(shop_id=self.shop.id).exclude(
+            category_id__in=self._categories
+        ).delete()
+
+        stale = [
+            pk
+            for pk in ProductInfo.objects.filter(
+                shop_id=self.shop.id, catalog_version=self.version
+            )
+            .values_list("id", flat=True)
+            .iterator(chunk_size=self.batch_size)
+            if pk not in self._seen
+        ]
+        for chunk in chunked(stale, self.batch_size):
+            ordered = set(
+                OrderItem.objects.filter(product_info_id__in=chunk)
+                .exclude(order__state="basket")
+                .values_list("product_info_id", flat=True)
+            )
+
+            if ordered:
+                OrderItem.objects.filter(
+                    product_info_id__in=ordered, order__state="basket"
+                ).delete()
+                CatalogEntry.objects.filter(product_info_id__in=ordered).delete()
+                ProductInfo.objects.filter(id__in=ordered).update(catalog_version=None)
+            # позиции корзин удаляются вместе с карточками,
+            # суммы корзин пересчитывает сигнал order_item_deleted
+            ProductInfo.objects.filter(id__in=chunk).exclude(id__in=ordered).delete()
+            self.stats["deleted"] += len(chunk)
+            self.rows["cleanup"] += len(chunk)
+
+
+def import_price_list(
+    stream,
+    user_id=None,
+    batch_size=None,
+    progress=None,
+    dry_run=False,
+    shop=None,
+    name=None,
+    swap=False,
+):
+    """
+    Загружаем прайс из файла в одной транзакции, возвращаем загрузчик
+    со статистикой и профилем фаз.
+
+    Без shop и user_id магазин ищется только по названию, так загружаются
+    файлы без привязки к пользователю. При dry_run загрузка выполняется
+    полностью, но транзакция откатывается. name - имя файла для
+    определения формата, если у stream его нет.
+
+    При swap каталог строится как новая версия рядом с текущей, которую
+    продолжают видеть покупатели, и затем переключается одним UPDATE
+    вместе с позициями корзин. Прошлые версии удаляет collect_old_versions. Каталог для просмотра
+    (CatalogEntry) переключается вместе с версией.
+    """
+    with transaction.atomic():
+        started = time.perf_counter()
+        data = read_price_list(stream, name)
+        parse_time = time.perf_counter() - started
+
+        if shop is None and user_id is not None:
+            shop, _ = Shop.objects.get_or_create(name=data["shop"], user_id=user_id)
+        elif shop is None:
+            shop = Shop.objects.filter(name=data["shop"]).first()
+            if shop is None:
+                shop = Shop.objects.create(name=data["shop"])
+        version = None
+        if swap:
+            shop.refresh_from_db(fields=["catalog_version"])
+            version = shop.catalog_version + 1
+        importer = CatalogImporter(shop, batch_size, progress, version)
+        importer.timings["parse"] += parse_time
+        importer.run(data)
+
+        if dry_run:
+            transaction.set_rollback(True)
+
+    if swap and not dry_run:
+        with connection.execute_wrapper(importer._count_query):
+            with importer.phase("swap"), transaction.atomic():
+                switch_catalog_version(shop, importer.version, batch_size)
+                importer.rows["swap"] += rebuild_shop_entries(shop, batch_size)
+    if not dry_run:
+        bump_catalog_version()
+    return importer
+
+
+def switch_catalog_version(shop, version, batch_size=None):
+    """
+    Переключаем читателей каталога магазина на новую версию.
+
+    Позиции корзин сразу переносим на карточки новой версии, чтобы
+    корзины показывали новые цены, а карточки прошлых версий оставляем
+    для collect_old_versions.
+    """
+    Shop.objects.filter(id=shop.id).update(catalog_version=version)
+    shop.catalog_version = version
+    move_baskets(
+        ProductInfo.objects.filter(shop_id=shop.id, catalog_version__lt=version),
+        batch_size,
+    )
+
+
+def move_baskets(old, batch_size=None):
+    """
+    Переносим позиции корзин с карточек old на карточки текущей версии
+    с тем же external_id и пересчитываем суммы корзин по новым ценам.
+
+    Позиции товаров, которых нет в текущей версии, удаляются, как при
+    загрузке без swap. Если в корзине уже есть карточка текущей версии,
+    позиция с прошлой версией удаляется.
+    """
+    batch_size = batch_size or IMPORT_BATCH_SIZE
+    items = list(
+        OrderItem.objects.filter(order__state="basket", product_info__in=old)
+        .order_by("id")
+        .values_list(
+            "id", "order_id", "product_info__shop_id", "product_info__external_id"
+        )
+    )
+    if not items:
+        return
+
+    current = {
+        (shop_id, external_id): pk
+        for pk, shop_id, external_id in ProductInfo.objects.current()
+        .filter(
+            shop_id__in={item[2] for item in items},
+            external_id__in={item[3] for item in items},
+        )
+        .values_list("id", "shop_id", "external_id")
+    }
+    taken = set(
+        OrderItem.objects.filter(
+            order_id__in={item[1] for item in items},
+            product_info_id__in=current.values(),
+        ).values_list("order_id", "product_info_id")
+    )
+    moved = []
+    dropped = []
+    for pk, order_id, shop_id, external_id in items:
+        product_info_id = current.get((shop_id, external_id))
+        if product_info_id is None or (order_id, product_info_id) in taken:
+            dropped.append(pk)
+        else:
+            moved.append(OrderItem(id=pk, product_info_id=product_info_id))
+            taken.add((order_id, product_info_id))
+    OrderItem.objects.filter(id__in=dropped).delete()
+    OrderItem.objects.bulk_update(moved, ["product_info_id"], batch_size=batch_size)
+    # цены карточек текущей версии могут отличаться от прошлой
+    refresh_order_totals({item[1] for item in items}, batch_size)
+
+
+@transaction.atomic
+def collect_old_versions(batch_size=None):
+    """
+    Удаляем карточки товаров прошлых версий каталогов и снятые с продажи.
+
+    Позиции корзин, оставшиеся на прошлых версиях, переносятся
+    move_baskets. Карточки, на которые ссылаются заказы, не удаляются.
+    Возвращаем число удалённых карточек.
+    """
+    batch_size = batch_size or IMPORT_BATCH_SIZE
+    old = ProductInfo.objects.filter(
+        Q(catalog_version__lt=F("shop__catalog_version"))
+        | Q(catalog_version__isnull=True)
+    )
+    move_baskets(old, batch_size)
+
+    stale = list(
+        old.filter(ordered_items__isnull=True)
+        .values_list("id", flat=True)
+        .iterator(chunk_size=batch_size)
+    )
+    for chunk in chunked(stale, batch_size):
+        ProductInfo.objects.filter(id__in=chunk).delete()
+    return len(stale)
+
+
+STOCK_FIELDS = ("quantity", "price", "price_rrc")
+
+
+def parse_stock_row(row):
+    """
+    Приводим строку остатков к кортежу (external_id, quantity, price, price_rrc).
+    Пустые цены означают, что цена не меняется.
+    """
+    if isinstance(row, dict):
+        row = [row.get(key) for key in ("external_id", *STOCK_FIELDS)]
+    if len(row) != 4:
+        raise ValueError(f"Ожидается external_id, quantity, price, price_rrc: {row}")
+
+    values = []
+    for position, value in enumerate(row):
+        if value in (None, "") and position > 1:
+            values.append(None)
+            continue
+        value = int(value)
+        if value < 0:
+            raise ValueError(f"Отрицательное значение в строке {row}")
+        values.append(value)
+    return tuple(values)
+
+
+def sync_stock(shop, rows, batch_size=None):
+    """
+    Обновляем остатки и цены карточек товаров магазина по external_id,
+    при изменении цен пересчитываем суммы корзин.
+
+    На пакет строк выполняется один UPDATE с CASE, товары, категории
+    и параметры не затрагиваются.
+    """
+    batch_size = batch_size or IMPORT_BATCH_SIZE
+    stats = {"rows": 0, "updated": 0, "not_found": 0}
+    with transaction.atomic():
+        for chunk in chunked(rows, batch_size):
+            values = {row[0]: row[1:] for row in map(parse_stock_row, chunk)}
+            changes = {}
+            for position, field in enumerate(STOCK_FIELDS):
+                whens = [
+                    When(external_id=external_id, then=Value(row[position]))
+                    for external_id, row in values.items()
+                    if row[position] is not None
+                ]
+                if whens:
+                    changes[field] = Case(
+                        *whens,
+                        default=F(field),
+                        output_field=ProductInfo._meta.get_field(field),
+                    )
+
+            product_infos = ProductInfo.objects.filter(
+                shop_id=shop.id,
+                catalog_version=shop.catalog_version,
+                external_id__in=values,
+            )
+            updated = product_infos.update(**changes)
+            if "price" in changes:
+                refresh_basket_totals(product_infos.values("id"))
+            CatalogEntry.objects.filter(shop_id=shop.id, external_id__in=values).update(
+                updated_at=Now(), **changes
+            )
+            stats["rows"] += len(values)
+            stats["updated"] += updated
+            stats["not_found"] += max(len(values) - updated, 0)
+        bump_catalog_version()
+    return stats
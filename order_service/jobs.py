@@ -0,0 +1,153 @@
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import F, Q
+from django.utils import timezone
+
+from order_service.importers import import_price_list
+from order_service.models import ImportJob
+
+PROGRESS_TIMEOUT = 24 * 60 * 60
+IMPORT_JOB_HEARTBEAT = getattr(settings, "IMPORT_JOB_HEARTBEAT", 10)
+IMPORT_JOB_STALE_SECONDS = getattr(settings, "IMPORT_JOB_STALE_SECONDS", 60)
+IMPORT_JOB_MAX_ATTEMPTS = getattr(settings, "IMPORT_JOB_MAX_ATTEMPTS", 3)
+STALE_JOB_ERROR = "Обработчик загрузки остановился, попытки исчерпаны"
+
+
+def progress_key(job_id):
+    return f"import_job:{job_id}:progress"
+
+
+def get_progress(job):
+    """
+    Возвращаем прогресс задачи.
+
+    Пока загрузка идёт в транзакции, её промежуточные итоги в базе
+    не видны, поэтому обработчик пишет их в кеш. Для работы с отдельным
+    процессом обработчика кеш должен быть общим.
+    """
+    progress = {
+        "progress": 100 if job.state == "done" else 0,
+        "rows": job.rows,
+        "stats": job.stats,
+        "timings": job.timings,
+    }
+    if job.state == "running":
+        progress.update(cache.get(progress_key(job.id), {}))
+    return progress
+
+
+def claim_next_job():
+    """
+    Забираем самую старую задачу из очереди.
+
+    Задача переводится в статус running условным UPDATE, поэтому
+    несколько обработчиков не возьмут одну и ту же задачу.
+    """
+    for job in ImportJob.objects.filter(state="queued").order_by("id")[:10]:
+        now = timezone.now()
+        claimed = ImportJob.objects.filter(id=job.id, state="queued").update(
+            state="running",
+            started_at=now,
+            heartbeat_at=now,
+            attempts=F("attempts") + 1,
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+    return None
+
+
+def reclaim_stale_jobs(stale_seconds=None):
+    """
+    Возвращаем в очередь задачи, обработчик которых перестал отмечаться,
+    например после остановки его процесса. Загрузка идёт в одной
+    транзакции и откатывается вместе с процессом, поэтому её можно
+    повторить с начала. После IMPORT_JOB_MAX_ATTEMPTS попыток задача
+    завершается с ошибкой. Возвращаем число возвращённых и завершённых задач.
+    """
+    now = timezone.now()
+    deadline = now - timedelta(seconds=stale_seconds or IMPORT_JOB_STALE_SECONDS)
+    stale = ImportJob.objects.filter(
+        Q(heartbeat_at__lt=deadline)
+        | Q(heartbeat_at__isnull=True, started_at__lt=deadline),
+        state="running",
+    )
+    failed = stale.filter(attempts__gte=IMPORT_JOB_MAX_ATTEMPTS).update(
+        state="failed", errors=STALE_JOB_ERROR, finished_at=now
+    )
+    requeued = stale.update(state="queued", started_at=None, heartbeat_at=None)
+    return requeued, failed
+
+
+class Heartbeat(threading.Thread):
+    """
+    Отмечаем задачу, пока идёт загрузка. У потока своё соединение
+    с базой, поэтому отметки видны другим процессам, хотя загрузка
+    ещё не завершила свою транзакцию.
+    """
+
+    def __init__(self, job_id, interval=None):
+        super().__init__(daemon=True)
+        self.job_id = job_id
+        self.interval = interval or IMPORT_JOB_HEARTBEAT
+        self.stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self.stopped.wait(self.interval):
+                ImportJob.objects.filter(id=self.job_id, state="running").update(
+                    heartbeat_at=timezone.now()
+                )
+        finally:
+            connection.close()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def run_job(job):
+    """
+    Выполняем загрузку прайса и сохраняем итоги задачи
+    """
+    size = job.file.size
+
+    def report(importer):
+        cache.set(
+            progress_key(job.id),
+            {
+                "progress": round(100 * stream.tell() / size, 1) if size else 0,
+                "rows": importer.stats["product_infos"],
+                "stats": importer.stats,
+                "timings": importer.profile(),
+            },
+            PROGRESS_TIMEOUT,
+        )
+
+    heartbeat = Heartbeat(job.id)
+    heartbeat.start()
+    try:
+        with job.file.open("rb") as stream:
+            importer = import_price_list(
+                stream, job.user_id, progress=report, swap=job.swap
+            )
+    except Exception as e:
+        job.state = "failed"
+        job.errors = str(e)
+    else:
+        job.state = "done"
+        job.rows = importer.stats["product_infos"]
+        job.stats = importer.stats
+        job.timings = importer.profile()
+        job.file.delete(save=False)
+    finally:
+        heartbeat.stop()
+
+    job.finished_at = timezone.now()
+    job.save()
+    cache.delete(progress_key(job.id))
+    return job
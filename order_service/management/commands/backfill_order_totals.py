@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from order_service.importers import chunked
+from order_service.models import Order
+from order_service.totals import TOTALS_BATCH_SIZE, refresh_order_totals
+
+
+class Command(BaseCommand):
+    help = "Пересчёт сохранённых сумм и числа товаров всех заказов"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=TOTALS_BATCH_SIZE,
+            help="Число заказов в одной транзакции",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        updated = 0
+        order_ids = (
+            Order.objects.order_by("id")
+            .values_list("id", flat=True)
+            .iterator(chunk_size=batch_size)
+        )
+        for chunk in chunked(order_ids, batch_size):
+            updated += refresh_order_totals(chunk, batch_size)
+        self.stdout.write(f"Пересчитано заказов: {updated}")
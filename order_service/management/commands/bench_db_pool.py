@@ -0,0 +1,84 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import RequestFactory
+
+from order_service.pooling import close_pools, pool_stats
+
+POOL_ENGINE = "order_service.backends.postgresql_pool"
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнение времени ответа на запросы к API с пулом соединений "
+        "и с новым подключением к базе на каждый запрос"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--url", default="/order_service/partner/state", help="Адрес запроса"
+        )
+        parser.add_argument("--token", help="Токен пользователя для Authorization")
+        parser.add_argument(
+            "--requests", type=int, default=500, help="Число запросов в каждом замере"
+        )
+        parser.add_argument(
+            "--threads", type=int, default=1, help="Число одновременных клиентов"
+        )
+
+    def run(self, environ, count, threads):
+        """
+        Запросы идут через WSGIHandler, как на сервере: в конце каждого
+        запроса Django закрывает соединение или возвращает его в пул
+        """
+        handler = WSGIHandler()
+
+        def request(_):
+            started = time.perf_counter()
+            response = handler(dict(environ), lambda status, headers: None)
+            b"".join(response)
+            response.close()
+            return time.perf_counter() - started
+
+        with ThreadPoolExecutor(threads) as executor:
+            return sorted(executor.map(request, range(count)))
+
+    def report(self, name, timings):
+        self.stdout.write(
+            f"{name:<12}{statistics.mean(timings) * 1000:>10.2f}"
+            f"{timings[len(timings) // 2] * 1000:>10.2f}"
+            f"{timings[int(len(timings) * 0.95)] * 1000:>10.2f}"
+        )
+
+    def handle(self, *args, **options):
+        settings_dict = connections["default"].settings_dict
+        if settings_dict["ENGINE"] != POOL_ENGINE:
+            raise CommandError(f"Укажите DB_ENGINE={POOL_ENGINE}")
+
+        extra = {}
+        if options["token"]:
+            extra["HTTP_AUTHORIZATION"] = f"Token {options['token']}"
+        environ = RequestFactory().get(options["url"], **extra).environ
+        count, threads = options["requests"], options["threads"]
+
+        pool = settings_dict["POOL"]
+        self.stdout.write(f"{'':<12}{'среднее':>10}{'p50':>10}{'p95':>10}  мс")
+        try:
+            connections.close_all()
+            settings_dict["POOL"] = {**pool, "SIZE": 0}
+            self.report("без пула", self.run(environ, count, threads))
+
+            connections.close_all()
+            settings_dict["POOL"] = pool
+            self.report("с пулом", self.run(environ, count, threads))
+            stats = pool_stats()["pools"].get("default", {})
+        finally:
+            settings_dict["POOL"] = pool
+            connections.close_all()
+            close_pools()
+
+        self.stdout.write(", ".join(f"{key}: {value}" for key, value in stats.items()))
@@ -0,0 +1,102 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from order_service.mappers import (
+    CATALOG_OPTIONAL,
+    CATALOG_SPEC,
+    CATEGORY_SPEC,
+    SHOP_SPEC,
+    compile_mapper,
+    order_rows,
+    select_spec,
+)
+from order_service.models import CatalogEntry, Category, Order, Shop
+from order_service.serializers import (
+    CatalogEntrySerializer,
+    CategorySerializer,
+    OrderSerializer,
+    ShopSerializer,
+)
+from order_service.views import order_relations
+
+
+def _serialize(serializer_class, queryset):
+    return serializer_class(list(queryset), many=True).data
+
+
+def _map(spec, queryset):
+    mapper = compile_mapper(spec)
+    return [mapper(row) for row in queryset.values(*mapper.columns)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнение скорости вывода списков через сериализаторы "
+        "и через values() с готовыми функциями преобразования"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows", type=int, default=1000, help="Число строк каждого списка"
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=5, help="Число повторов замера"
+        )
+
+    def measure(self, build, repeat):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            data = build()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best, JSONRenderer().render(data), len(data)
+
+    def handle(self, *args, **options):
+        rows, repeat = options["rows"], options["repeat"]
+        spec = select_spec(CATALOG_SPEC, None, CATALOG_OPTIONAL)
+        cases = [
+            (
+                "categories",
+                lambda: _serialize(CategorySerializer, Category.objects.all()[:rows]),
+                lambda: _map(CATEGORY_SPEC, Category.objects.all()[:rows]),
+            ),
+            (
+                "shops",
+                lambda: _serialize(ShopSerializer, Shop.objects.all()[:rows]),
+                lambda: _map(SHOP_SPEC, Shop.objects.all()[:rows]),
+            ),
+            (
+                "products",
+                lambda: _serialize(
+                    CatalogEntrySerializer, CatalogEntry.objects.all()[:rows]
+                ),
+                lambda: _map(spec, CatalogEntry.objects.all()[:rows]),
+            ),
+            (
+                "orders",
+                lambda: _serialize(
+                    OrderSerializer, order_relations(Order.objects.all()[:rows], {})
+                ),
+                lambda: order_rows(Order.objects.all()[:rows]),
+            ),
+        ]
+
+        self.stdout.write(
+            f"{'список':<12}{'строк':>8}{'сериализатор, мкс':>20}"
+            f"{'values(), мкс':>16}{'ускорение':>12}"
+        )
+        for name, slow, fast in cases:
+            slow_time, slow_json, count = self.measure(slow, repeat)
+            fast_time, fast_json, _ = self.measure(fast, repeat)
+            if slow_json != fast_json:
+                raise CommandError(f"{name}: ответы не совпадают")
+            if not count:
+                self.stdout.write(f"{name:<12}{0:>8}  нет данных")
+                continue
+            self.stdout.write(
+                f"{name:<12}{count:>8}{slow_time / count * 1e6:>20.1f}"
+                f"{fast_time / count * 1e6:>16.1f}{slow_time / fast_time:>11.1f}x"
+            )
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from order_service.exports import purge_tombstones
+from order_service.importers import collect_old_versions
+
+
+class Command(BaseCommand):
+    help = (
+        "Удаление карточек товаров прошлых версий каталогов магазинов "
+        "и старых отметок об удалённых предложениях"
+    )
+
+    def handle(self, *args, **options):
+        deleted = collect_old_versions()
+        self.stdout.write(f"Удалено карточек прошлых версий: {deleted}")
+        purged = purge_tombstones()
+        self.stdout.write(f"Удалено отметок об удалённых предложениях: {purged}")
@@ -0,0 +1,154 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+from psycopg2 import errorcodes
+
+from order_service.importers import IMPORT_BATCH_SIZE, import_price_list
+from order_service.readers import EXTENSIONS
+
+STATE_FILE = ".load_catalogs.json"
+# число попыток загрузить файл после взаимоблокировки с другим процессом
+RETRIES = 3
+RETRY_CODES = (errorcodes.DEADLOCK_DETECTED, errorcodes.SERIALIZATION_FAILURE)
+
+
+def _init_worker():
+    django.setup()
+
+
+def _is_conflict(error):
+    return getattr(error.__cause__, "pgcode", None) in RETRY_CODES
+
+
+def _load_file(path, batch_size):
+    """
+    Загружаем один файл в процессе-обработчике.
+
+    Параллельные загрузки пишут общие категории, товары и параметры.
+    Если база прервала транзакцию из-за взаимоблокировки, загрузка
+    откатывается целиком и файл загружается заново.
+    """
+    started = time.perf_counter()
+    for attempt in range(1, RETRIES + 1):
+        try:
+            with open(path, "rb") as stream:
+                importer = import_price_list(stream, batch_size=batch_size)
+        except OperationalError as e:
+            if _is_conflict(e) and attempt < RETRIES:
+                continue
+            return path, None, str(e), time.perf_counter() - started
+        except Exception as e:
+            return path, None, str(e), time.perf_counter() - started
+        return path, importer.stats, None, time.perf_counter() - started
+
+
+class Command(BaseCommand):
+    help = (
+        "Параллельная загрузка прайсов поставщиков из каталога "
+        "(YAML, CSV, JSON Lines, MessagePack)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("directory", help="Каталог с файлами прайсов")
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count(),
+            help="Число процессов загрузки",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=IMPORT_BATCH_SIZE,
+            help="Число товаров в одном пакете записи",
+        )
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Загрузить все файлы заново, не учитывая прошлый запуск",
+        )
+
+    def handle(self, *args, **options):
+        directory = Path(options["directory"])
+        if not directory.is_dir():
+            raise CommandError(f"Каталог {directory} не найден")
+
+        state_path = directory / STATE_FILE
+        state = {}
+        if state_path.exists() and not options["restart"]:
+            state = json.loads(state_path.read_text())
+
+        files = {}
+        skipped = 0
+        for extension in EXTENSIONS:
+            for path in directory.glob(f"*{extension}"):
+                stat = path.stat()
+                signature = [stat.st_size, stat.st_mtime_ns]
+                if state.get(path.name) == signature:
+                    skipped += 1
+                else:
+                    files[str(path)] = signature
+        self.stdout.write(
+            f"Файлов к загрузке: {len(files)}, загружено ранее: {skipped}"
+        )
+
+        workers = options["workers"]
+        if connection.vendor == "sqlite" and workers > 1:
+            # SQLite допускает только одну пишущую транзакцию
+            self.stdout.write(self.style.WARNING("SQLite: загрузка в один процесс"))
+            workers = 1
+
+        # процессы-обработчики открывают собственные соединения с базой
+        connections.close_all()
+        started = time.perf_counter()
+        rows = size = 0
+        failed = []
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker
+        ) as executor:
+            futures = [
+                executor.submit(_load_file, path, options["batch_size"])
+                for path in sorted(files)
+            ]
+            for future in as_completed(futures):
+                path, stats, error, elapsed = future.result()
+                name = Path(path).name
+                if error:
+                    failed.append(name)
+                    self.stdout.write(self.style.ERROR(f"{name}: {error}"))
+                    continue
+
+                rows += stats["product_infos"]
+                size += files[path][0]
+                state[name] = files[path]
+                self._save_state(state_path, state)
+                self.stdout.write(
+                    f"{name}: {stats['product_infos']} строк за {elapsed:.2f} с"
+                )
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Загружено файлов: {len(files) - len(failed)}, строк: {rows}, "
+                f"{size / 2**20:.1f} МБ за {elapsed:.2f} с "
+                f"({rows / elapsed if elapsed else 0:.0f} строк/с, "
+                f"{size / 2**20 / elapsed if elapsed else 0:.2f} МБ/с)"
+            )
+        )
+        if failed:
+            raise CommandError(
+                f"Не загружены файлы: {', '.join(failed)}. "
+                "Повторный запуск продолжит с них."
+            )
+
+    @staticmethod
+    def _save_state(path, state):
+        temporary = path.with_suffix(".tmp")
+        temporary.write_text(json.dumps(state))
+        temporary.replace(path)
@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from order_service.feeds import (
+    FEED_PULL_CONCURRENCY,
+    FEED_PULL_INTERVAL,
+    due_shops,
+    pull_feeds,
+)
+
+
+class Command(BaseCommand):
+    help = "Загрузка прайсов поставщиков по ссылкам из карточек магазинов"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=FEED_PULL_INTERVAL,
+            help="Как часто проверять прайс магазина, секунд",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=FEED_PULL_CONCURRENCY,
+            help="Сколько прайсов скачивать одновременно",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Проверить прайсы один раз и завершиться",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            for result in pull_feeds(
+                due_shops(options["interval"]), options["concurrency"]
+            ):
+                message = f"{result['shop']}: {result['status']}"
+                if result["status"] == "failed":
+                    self.stdout.write(self.style.ERROR(f"{message} {result['error']}"))
+                elif result["status"] == "imported":
+                    self.stdout.write(
+                        self.style.SUCCESS(f"{message} {result['stats']}")
+                    )
+                else:
+                    self.stdout.write(message)
+
+            if options["once"]:
+                return
+            time.sleep(min(options["interval"], 60))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from order_service.importers import rebuild_shop_entries
+from order_service.models import Shop
+
+
+class Command(BaseCommand):
+    help = "Пересборка каталога для просмотра товаров (CatalogEntry)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("shop_ids", nargs="*", type=int, help="ИД магазинов")
+
+    def handle(self, *args, **options):
+        shops = Shop.objects.all()
+        if options["shop_ids"]:
+            shops = shops.filter(id__in=options["shop_ids"])
+        for shop in shops:
+            with transaction.atomic():
+                rows = rebuild_shop_entries(shop)
+            self.stdout.write(f"{shop.name}: {rows} строк")
@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from order_service.importers import collect_old_versions
+from order_service.jobs import claim_next_job, reclaim_stale_jobs, run_job
+
+
+class Command(BaseCommand):
+    help = "Обработка очереди загрузок прайсов поставщиков"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5,
+            help="Пауза между проверками пустой очереди, секунд",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Обработать задачи в очереди и завершиться",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            requeued, failed = reclaim_stale_jobs()
+            if requeued or failed:
+                self.stdout.write(
+                    f"Зависшие загрузки: возвращено в очередь {requeued}, "
+                    f"завершено с ошибкой {failed}"
+                )
+            job = claim_next_job()
+            if job is None:
+                deleted = collect_old_versions()
+                if deleted:
+                    self.stdout.write(f"Удалено карточек прошлых версий: {deleted}")
+                if options["once"]:
+                    return
+                time.sleep(options["interval"])
+                continue
+
+            self.stdout.write(f"Загрузка {job.id}: {job.file.name}")
+            job = run_job(job)
+            if job.state == "done":
+                self.stdout.write(self.style.SUCCESS(f"Загрузка {job.id}: {job.stats}"))
+            else:
+                self.stdout.write(self.style.ERROR(f"Загрузка {job.id}: {job.errors}"))
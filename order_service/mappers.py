@@ -0,0 +1,206 @@
+from collections import defaultdict
+
+from rest_framework import serializers
+from rest_framework.response import Response
+
+from order_service.models import Contact, OrderItem, ProductParameter
+
+CATEGORY_SPEC = (("id", "id"), ("name", "name"))
+
+SHOP_SPEC = (("id", "id"), ("name", "name"), ("state", "state"))
+
+CATALOG_SPEC = (
+    ("id", "product_info_id"),
+    ("model", "model"),
+    ("product", (("name", "product_name"), ("category", "category_name"))),
+    ("name", "product_name"),
+    ("shop_name", "shop_name"),
+    ("quantity", "quantity"),
+    ("price", "price"),
+    ("price_rrc", "price_rrc"),
+    ("product_parameters", "parameters"),
+)
+CATALOG_OPTIONAL = ("name",)
+
+CONTACT_SPEC = (
+    ("id", "id"),
+    ("city", "city"),
+    ("street", "street"),
+    ("house", "house"),
+    ("structure", "structure"),
+    ("building", "building"),
+    ("apartment", "apartment"),
+    ("phone", "phone"),
+)
+
+ORDER_ITEM_SPEC = (
+    ("id", "id"),
+    (
+        "product_info",
+        (
+            ("id", "product_info_id"),
+            ("model", "product_info__model"),
+            (
+                "product",
+                (
+                    ("name", "product_info__product__name"),
+                    ("category", "product_info__product__category__name"),
+                ),
+            ),
+            ("shop_name", "product_info__shop__name"),
+            ("quantity", "product_info__quantity"),
+            ("price", "product_info__price"),
+            ("price_rrc", "product_info__price_rrc"),
+            ("product_parameters", "parameters"),
+        ),
+    ),
+    ("quantity", "quantity"),
+)
+
+ORDER_SPEC = (
+    ("id", "id"),
+    ("ordered_items", "ordered_items"),
+    ("state", "state"),
+    ("dt", "dt"),
+    ("total_sum", "total_sum"),
+    ("items_count", "items_count"),
+    ("contact", "contact"),
+)
+
+_mappers = {}
+
+
+def _columns(spec):
+    for _, source in spec:
+        if isinstance(source, tuple):
+            yield from _columns(source)
+        else:
+            yield source
+
+
+def _source(spec, converters):
+    parts = []
+    for key, source in spec:
+        if isinstance(source, tuple):
+            value = _source(source, converters)
+        elif source in converters:
+            value = f"converters[{source!r}](row[{source!r}])"
+        else:
+            value = f"row[{source!r}]"
+        parts.append(f"{key!r}: {value}")
+    return "{" + ", ".join(parts) + "}"
+
+
+def compile_mapper(spec, converters=None):
+    """
+    Собираем функцию, которая строит словарь ответа из строки values().
+
+    spec - кортеж пар (ключ ответа, столбец) или (ключ, вложенный spec)
+    в порядке полей сериализатора, converters - функции преобразования
+    значений столбцов. Функция собирается один раз на spec, в ней нет
+    циклов по полям, поэтому строка обрабатывается в разы быстрее, чем
+    сериализатором. Список столбцов доступен в атрибуте columns.
+    """
+    key = (spec, tuple(converters or ()))
+    if key not in _mappers:
+        mapper = eval(
+            f"lambda row: {_source(spec, converters or {})}",
+            {"converters": converters or {}},
+        )
+        mapper.columns = tuple(dict.fromkeys(_columns(spec)))
+        _mappers[key] = mapper
+    return _mappers[key]
+
+
+def select_spec(spec, fields, optional=()):
+    """
+    Оставляем в spec поля из fields, как SparseFieldsMixin
+    """
+    names = {name for name, _ in spec}
+    if fields and fields & names:
+        return tuple(item for item in spec if item[0] in fields)
+    return tuple(item for item in spec if item[0] not in optional)
+
+
+class ValuesListMixin:
+    """
+    Быстрый вывод списка только для чтения: строки читаются через
+    values() и преобразуются функцией compile_mapper без сериализатора.
+    Ответ совпадает с ответом serializer_class.
+    """
+
+    values_spec = None
+
+    def get_values_spec(self):
+        return self.values_spec
+
+    def list(self, request, *args, **kwargs):
+        mapper = compile_mapper(self.get_values_spec())
+        queryset = self.filter_queryset(self.get_queryset())
+        ordering = [
+            field.lstrip("-")
+            for field in queryset.query.order_by or queryset.model._meta.ordering
+            if isinstance(field, str)
+        ]
+        queryset = queryset.values(
+            *dict.fromkeys(
+                [*mapper.columns, *ordering, queryset.model._meta.pk.attname]
+            )
+        )
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response([mapper(row) for row in page])
+        return Response([mapper(row) for row in queryset])
+
+
+def order_rows(queryset):
+    """
+    Заказы в формате OrderSerializer, собранные тремя запросами values()
+    """
+    orders = list(
+        queryset.prefetch_related(None).values(
+            "id", "state", "dt", "total_sum", "items_count", "contact_id"
+        )
+    )
+    order_ids = [order["id"] for order in orders]
+
+    contact_mapper = compile_mapper(CONTACT_SPEC)
+    contacts = {
+        row["id"]: contact_mapper(row)
+        for row in Contact.objects.filter(
+            id__in={order["contact_id"] for order in orders}
+        ).values(*contact_mapper.columns)
+    }
+
+    item_mapper = compile_mapper(ORDER_ITEM_SPEC)
+    items = list(
+        OrderItem.objects.filter(order_id__in=order_ids)
+        .order_by("id")
+        .values(
+            "order_id",
+            *(column for column in item_mapper.columns if column != "parameters"),
+        )
+    )
+    parameters = defaultdict(list)
+    for product_info_id, name, value in (
+        ProductParameter.objects.filter(
+            product_info_id__in={item["product_info_id"] for item in items}
+        )
+        .order_by("id")
+        .values_list("product_info_id", "parameter__name", "value")
+    ):
+        parameters[product_info_id].append({"parameter": name, "value": value})
+
+    ordered_items = defaultdict(list)
+    for item in items:
+        item["parameters"] = parameters[item["product_info_id"]]
+        ordered_items[item["order_id"]].append(item_mapper(item))
+
+    order_mapper = compile_mapper(
+        ORDER_SPEC, {"dt": serializers.DateTimeField().to_representation}
+    )
+    for order in orders:
+        order["ordered_items"] = ordered_items[order["id"]]
+        order["contact"] = contacts.get(order["contact_id"])
+    return [order_mapper(order) for order in orders]
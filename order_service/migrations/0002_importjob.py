@@ -0,0 +1,146 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:57
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("order_service", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="parameter",
+            options={
+                "ordering": ("-name",),
+                "verbose_name": "Название параметра",
+                "verbose_name_plural": "Список названий параметров",
+            },
+        ),
+        migrations.AlterModelOptions(
+            name="product",
+            options={
+                "ordering": ("-name",),
+                "verbose_name": "Товар",
+                "verbose_name_plural": "Список товаров",
+            },
+        ),
+        migrations.AlterModelOptions(
+            name="productinfo",
+            options={
+                "ordering": ("-model",),
+                "verbose_name": "Информация о товаре",
+                "verbose_name_plural": "Карточка товара",
+            },
+        ),
+        migrations.AlterModelOptions(
+            name="productparameter",
+            options={
+                "verbose_name": "Параметр",
+                "verbose_name_plural": "Список используемых параметров",
+            },
+        ),
+        migrations.AlterField(
+            model_name="orderitem",
+            name="product_info",
+            field=models.ForeignKey(
+                blank=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="ordered_items",
+                to="order_service.productinfo",
+                verbose_name="Информация о товаре",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="productinfo",
+            name="product",
+            field=models.ForeignKey(
+                blank=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="product_infos",
+                to="order_service.product",
+                verbose_name="Товар",
+            ),
+        ),
+        migrations.CreateModel(
+            name="ImportJob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "file",
+                    models.FileField(upload_to="imports/", verbose_name="Файл прайса"),
+                ),
+                (
+                    "state",
+                    models.CharField(
+                        choices=[
+                            ("queued", "В очереди"),
+                            ("running", "Выполняется"),
+                            ("done", "Завершена"),
+                            ("failed", "Ошибка"),
+                        ],
+                        default="queued",
+                        max_length=10,
+                        verbose_name="Статус",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Создана"),
+                ),
+                (
+                    "started_at",
+                    models.DateTimeField(blank=True, null=True, verbose_name="Начата"),
+                ),
+                (
+                    "finished_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Завершена"
+                    ),
+                ),
+                (
+                    "rows",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Обработано строк"
+                    ),
+                ),
+                (
+                    "stats",
+                    models.JSONField(
+                        blank=True, default=dict, verbose_name="Статистика"
+                    ),
+                ),
+                (
+                    "timings",
+                    models.JSONField(
+                        blank=True, default=dict, verbose_name="Время фаз"
+                    ),
+                ),
+                ("errors", models.TextField(blank=True, verbose_name="Ошибки")),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="import_jobs",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Пользователь",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Загрузка прайса",
+                "verbose_name_plural": "Список загрузок прайсов",
+                "ordering": ("-created_at",),
+            },
+        ),
+    ]
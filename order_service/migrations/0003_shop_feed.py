@@ -0,0 +1,40 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("order_service", "0002_importjob"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="shop",
+            name="feed_etag",
+            field=models.CharField(
+                blank=True, max_length=255, verbose_name="ETag прайса по ссылке"
+            ),
+        ),
+        migrations.AddField(
+            model_name="shop",
+            name="feed_fetched_at",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="Время проверки прайса по ссылке"
+            ),
+        ),
+        migrations.AddField(
+            model_name="shop",
+            name="feed_hash",
+            field=models.CharField(
+                blank=True, max_length=64, verbose_name="Хеш прайса по ссылке"
+            ),
+        ),
+        migrations.AddField(
+            model_name="shop",
+            name="feed_last_modified",
+            field=models.CharField(
+                blank=True, max_length=64, verbose_name="Last-Modified прайса по ссылке"
+            ),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("order_service", "0003_shop_feed"),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name="productinfo",
+            name="unique_product_info",
+        ),
+        migrations.AddField(
+            model_name="importjob",
+            name="swap",
+            field=models.BooleanField(
+                default=False, verbose_name="Загрузка новой версией каталога"
+            ),
+        ),
+        migrations.AddField(
+            model_name="productinfo",
+            name="catalog_version",
+            field=models.PositiveIntegerField(
+                default=0, verbose_name="Версия каталога"
+            ),
+        ),
+        migrations.AddField(
+            model_name="shop",
+            name="catalog_version",
+            field=models.PositiveIntegerField(
+                default=0, verbose_name="Текущая версия каталога"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="productinfo",
+            constraint=models.UniqueConstraint(
+                fields=("product", "shop", "external_id", "catalog_version"),
+                name="unique_product_info",
+            ),
+        ),
+    ]
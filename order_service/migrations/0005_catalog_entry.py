@@ -0,0 +1,154 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:09
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import F
+
+
+def fill_catalog(apps, schema_editor):
+    """
+    Заполняем каталог карточками текущих версий
+    """
+    ProductInfo = apps.get_model("order_service", "ProductInfo")
+    ProductParameter = apps.get_model("order_service", "ProductParameter")
+    CatalogEntry = apps.get_model("order_service", "CatalogEntry")
+
+    parameters = {}
+    for product_info_id, name, value in ProductParameter.objects.order_by(
+        "id"
+    ).values_list("product_info_id", "parameter__name", "value"):
+        parameters.setdefault(product_info_id, []).append(
+            {"parameter": name, "value": value}
+        )
+
+    entries = [
+        CatalogEntry(
+            product_info_id=product_info.id,
+            shop_id=product_info.shop_id,
+            shop_name=product_info.shop.name,
+            shop_state=product_info.shop.state,
+            product_id=product_info.product_id,
+            product_name=product_info.product.name,
+            category_id=product_info.product.category_id,
+            category_name=product_info.product.category.name,
+            model=product_info.model,
+            external_id=product_info.external_id,
+            quantity=product_info.quantity,
+            price=product_info.price,
+            price_rrc=product_info.price_rrc,
+            parameters=parameters.get(product_info.id, []),
+        )
+        for product_info in ProductInfo.objects.filter(
+            catalog_version=F("shop__catalog_version")
+        ).select_related("shop", "product__category")
+    ]
+    CatalogEntry.objects.bulk_create(entries, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("order_service", "0004_catalog_version"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CatalogEntry",
+            fields=[
+                (
+                    "product_info",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="catalog_entry",
+                        serialize=False,
+                        to="order_service.productinfo",
+                        verbose_name="Информация о товаре",
+                    ),
+                ),
+                (
+                    "shop_name",
+                    models.CharField(max_length=50, verbose_name="Название магазина"),
+                ),
+                (
+                    "shop_state",
+                    models.BooleanField(default=True, verbose_name="Статус магазина"),
+                ),
+                (
+                    "product_name",
+                    models.CharField(max_length=80, verbose_name="Название товара"),
+                ),
+                (
+                    "category_name",
+                    models.CharField(
+                        blank=True, max_length=40, verbose_name="Название категории"
+                    ),
+                ),
+                (
+                    "model",
+                    models.CharField(blank=True, max_length=80, verbose_name="Модель"),
+                ),
+                ("external_id", models.PositiveIntegerField(verbose_name="Внешний ИД")),
+                ("quantity", models.PositiveIntegerField(verbose_name="Количество")),
+                ("price", models.PositiveIntegerField(verbose_name="Цена")),
+                (
+                    "price_rrc",
+                    models.PositiveIntegerField(
+                        verbose_name="Рекомендуемая розничная цена"
+                    ),
+                ),
+                (
+                    "parameters",
+                    models.JSONField(default=list, verbose_name="Параметры"),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="Обновлена"),
+                ),
+                (
+                    "category",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="catalog_entries",
+                        to="order_service.category",
+                        verbose_name="Категория",
+                    ),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="catalog_entries",
+                        to="order_service.product",
+                        verbose_name="Товар",
+                    ),
+                ),
+                (
+                    "shop",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="catalog_entries",
+                        to="order_service.shop",
+                        verbose_name="Магазин",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Строка каталога",
+                "verbose_name_plural": "Каталог товаров",
+                "ordering": ("-model",),
+                "indexes": [
+                    models.Index(
+                        fields=["shop_state", "-model"], name="catalog_entry_model"
+                    ),
+                    models.Index(
+                        fields=["shop", "external_id"], name="catalog_entry_shop"
+                    ),
+                    models.Index(
+                        fields=["category", "price"], name="catalog_entry_category"
+                    ),
+                ],
+            },
+        ),
+        migrations.RunPython(fill_catalog, migrations.RunPython.noop),
+    ]
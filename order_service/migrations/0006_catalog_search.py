@@ -0,0 +1,88 @@
+from django.db import migrations
+
+ENTRY_TABLE = "order_service_catalogentry"
+SEARCH_TABLE = "order_service_catalogsearch"
+SEARCH_CONFIG = "russian"
+
+POSTGRES_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"""
+    ALTER TABLE {ENTRY_TABLE} ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (
+        to_tsvector('{SEARCH_CONFIG}', product_name || ' ' || category_name)
+    ) STORED
+    """,
+    f"CREATE INDEX catalog_entry_search ON {ENTRY_TABLE} USING gin (search_vector)",
+    f"""
+    CREATE INDEX catalog_entry_trigram ON {ENTRY_TABLE}
+    USING gin (product_name gin_trgm_ops)
+    """,
+]
+
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS catalog_entry_trigram",
+    "DROP INDEX IF EXISTS catalog_entry_search",
+    f"ALTER TABLE {ENTRY_TABLE} DROP COLUMN IF EXISTS search_vector",
+]
+
+SQLITE_FORWARD = [
+    f"""
+    CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5(
+        product_name, category_name,
+        content='{ENTRY_TABLE}', content_rowid='product_info_id',
+        tokenize='unicode61'
+    )
+    """,
+    f"""
+    CREATE TRIGGER {SEARCH_TABLE}_insert AFTER INSERT ON {ENTRY_TABLE} BEGIN
+        INSERT INTO {SEARCH_TABLE}(rowid, product_name, category_name)
+        VALUES (new.product_info_id, new.product_name, new.category_name);
+    END
+    """,
+    f"""
+    CREATE TRIGGER {SEARCH_TABLE}_delete AFTER DELETE ON {ENTRY_TABLE} BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, product_name, category_name)
+        VALUES ('delete', old.product_info_id, old.product_name, old.category_name);
+    END
+    """,
+    f"""
+    CREATE TRIGGER {SEARCH_TABLE}_update
+    AFTER UPDATE OF product_name, category_name ON {ENTRY_TABLE} BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, product_name, category_name)
+        VALUES ('delete', old.product_info_id, old.product_name, old.category_name);
+        INSERT INTO {SEARCH_TABLE}(rowid, product_name, category_name)
+        VALUES (new.product_info_id, new.product_name, new.category_name);
+    END
+    """,
+    f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')",
+]
+
+SQLITE_BACKWARD = [
+    f"DROP TRIGGER IF EXISTS {SEARCH_TABLE}_update",
+    f"DROP TRIGGER IF EXISTS {SEARCH_TABLE}_delete",
+    f"DROP TRIGGER IF EXISTS {SEARCH_TABLE}_insert",
+    f"DROP TABLE IF EXISTS {SEARCH_TABLE}",
+]
+
+STATEMENTS = {
+    "postgresql": (POSTGRES_FORWARD, POSTGRES_BACKWARD),
+    "sqlite": (SQLITE_FORWARD, SQLITE_BACKWARD),
+}
+
+
+def execute(position):
+    def run(apps, schema_editor):
+        for sql in STATEMENTS.get(schema_editor.connection.vendor, ((), ()))[position]:
+            schema_editor.execute(sql)
+
+    return run
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("order_service", "0005_catalog_entry"),
+    ]
+
+    operations = [
+        migrations.RunPython(execute(0), execute(1)),
+    ]
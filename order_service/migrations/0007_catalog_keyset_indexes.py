@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("order_service", "0006_catalog_search"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="catalogentry",
+            name="catalog_entry_model",
+        ),
+        migrations.AddIndex(
+            model_name="catalogentry",
+            index=models.Index(
+                fields=["shop_state", "-model", "product_info"],
+                name="catalog_entry_model",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="catalogentry",
+            index=models.Index(
+                fields=["shop_state", "price", "product_info"],
+                name="catalog_entry_price",
+            ),
+        ),
+    ]
@@ -0,0 +1,134 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:14
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_facets(apps, schema_editor):
+    """
+    Строим индекс фильтров по параметрам строк каталога
+    """
+    ProductParameter = apps.get_model("order_service", "ProductParameter")
+    FacetValue = apps.get_model("order_service", "FacetValue")
+    CatalogFacet = apps.get_model("order_service", "CatalogFacet")
+
+    rows = list(
+        ProductParameter.objects.filter(
+            product_info__catalog_entry__isnull=False
+        ).values_list("product_info_id", "parameter_id", "value")
+    )
+    FacetValue.objects.bulk_create(
+        [
+            FacetValue(parameter_id=parameter_id, value=value)
+            for parameter_id, value in {row[1:] for row in rows}
+        ],
+        ignore_conflicts=True,
+    )
+    facet_ids = {
+        (parameter_id, value): pk
+        for pk, parameter_id, value in FacetValue.objects.values_list(
+            "id", "parameter_id", "value"
+        )
+    }
+    CatalogFacet.objects.bulk_create(
+        [
+            CatalogFacet(
+                entry_id=entry_id, facet_value_id=facet_ids[(parameter_id, value)]
+            )
+            for entry_id, parameter_id, value in rows
+        ],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("order_service", "0007_catalog_keyset_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FacetValue",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("value", models.CharField(max_length=100, verbose_name="Значение")),
+                (
+                    "parameter",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="facet_values",
+                        to="order_service.parameter",
+                        verbose_name="Параметр",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Значение фильтра",
+                "verbose_name_plural": "Список значений фильтров",
+            },
+        ),
+        migrations.CreateModel(
+            name="CatalogFacet",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "entry",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="facets",
+                        to="order_service.catalogentry",
+                        verbose_name="Строка каталога",
+                    ),
+                ),
+                (
+                    "facet_value",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="entries",
+                        to="order_service.facetvalue",
+                        verbose_name="Значение фильтра",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Значение фильтра строки каталога",
+                "verbose_name_plural": "Индекс фильтров каталога",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="facetvalue",
+            constraint=models.UniqueConstraint(
+                fields=("parameter", "value"), name="unique_facet_value"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="catalogfacet",
+            index=models.Index(
+                fields=["facet_value", "entry"], name="catalog_facet_value"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="catalogfacet",
+            constraint=models.UniqueConstraint(
+                fields=("entry", "facet_value"), name="unique_catalog_facet"
+            ),
+        ),
+        migrations.RunPython(fill_facets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,16 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("order_service", "0008_catalog_facets"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="catalogentry",
+            index=models.Index(fields=["updated_at"], name="catalog_entry_updated"),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("order_service", "0009_catalog_entry_updated"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="catalogentry",
+            name="catalog_entry_category",
+        ),
+        migrations.RemoveIndex(
+            model_name="catalogentry",
+            name="catalog_entry_model",
+        ),
+        migrations.RemoveIndex(
+            model_name="catalogentry",
+            name="catalog_entry_price",
+        ),
+        migrations.AddIndex(
+            model_name="catalogentry",
+            index=models.Index(
+                condition=models.Q(("shop_state", True)),
+                fields=["-model", "product_info"],
+                name="catalog_entry_model",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="catalogentry",
+            index=models.Index(
+                condition=models.Q(("shop_state", True)),
+                fields=["price", "product_info"],
+                name="catalog_entry_price",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="catalogentry",
+            index=models.Index(
+                condition=models.Q(("quantity__gt", 0), ("shop_state", True)),
+                fields=["price", "product_info"],
+                name="catalog_entry_in_stock",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="catalogentry",
+            index=models.Index(
+                condition=models.Q(("shop_state", True)),
+                fields=["shop", "price", "product_info"],
+                name="catalog_entry_shop_price",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="catalogentry",
+            index=models.Index(
+                condition=models.Q(("shop_state", True)),
+                fields=["category", "price", "product_info"],
+                name="catalog_entry_category",
+            ),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("order_service", "0013_importjob_heartbeat"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="productinfo",
+            name="catalog_version",
+            field=models.PositiveIntegerField(
+                blank=True, default=0, null=True, verbose_name="Версия каталога"
+            ),
+        ),
+    ]
@@ -0,0 +1,113 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:54
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+
+def _duplicates(model, *fields):
+    """
+    Возвращаем словарь id оставляемой строки -> id дублей с теми же fields
+    """
+    groups = defaultdict(list)
+    for pk, *key in model.objects.order_by("id").values_list("id", *fields):
+        groups[tuple(key)].append(pk)
+    return {pks[0]: pks[1:] for pks in groups.values() if len(pks) > 1}
+
+
+def _collisions(model, field, ids, *key):
+    """
+    Строки model со ссылкой field на ids, которые совпадают по полям key
+    с более ранней строкой: словарь id лишней строки -> id оставляемой.
+    Строки с NULL в key не совпадают, как и в уникальном ограничении.
+    """
+    kept = {}
+    merged = {}
+    for pk, *value in (
+        model.objects.filter(**{f"{field}__in": ids})
+        .order_by(field, "id")
+        .values_list("id", *key)
+    ):
+        value = tuple(value)
+        if None in value:
+            continue
+        if value in kept:
+            merged[pk] = kept[value]
+        else:
+            kept[value] = pk
+    return merged
+
+
+def _repoint(model, field, keep, duplicates, *key):
+    """
+    Переносим строки model со ссылкой field на дубли на строку keep,
+    совпавшие по key строки удаляем
+    """
+    merged = _collisions(model, field, [keep, *duplicates], *key)
+    model.objects.filter(id__in=merged).delete()
+    model.objects.filter(**{f"{field}__in": duplicates}).update(**{field: keep})
+
+
+def merge_duplicates(apps, schema_editor):
+    """
+    Объединяем товары и параметры с одинаковыми названиями перед
+    добавлением уникальных ограничений
+    """
+    Product = apps.get_model("order_service", "Product")
+    ProductInfo = apps.get_model("order_service", "ProductInfo")
+    CatalogEntry = apps.get_model("order_service", "CatalogEntry")
+    Parameter = apps.get_model("order_service", "Parameter")
+    ProductParameter = apps.get_model("order_service", "ProductParameter")
+    FacetValue = apps.get_model("order_service", "FacetValue")
+    CatalogFacet = apps.get_model("order_service", "CatalogFacet")
+    OrderItem = apps.get_model("order_service", "OrderItem")
+
+    for keep, duplicates in _duplicates(Product, "name", "category_id").items():
+        # предложения одного магазина с тем же external_id и версией
+        # объединяем, позиции заказов переносим на оставляемое
+        merged = _collisions(
+            ProductInfo,
+            "product_id",
+            [keep, *duplicates],
+            "shop_id",
+            "external_id",
+            "catalog_version",
+        )
+        for duplicate, kept in merged.items():
+            _repoint(OrderItem, "product_info_id", kept, [duplicate], "order_id")
+        ProductInfo.objects.filter(id__in=merged).delete()
+        ProductInfo.objects.filter(product_id__in=duplicates).update(product_id=keep)
+        CatalogEntry.objects.filter(product_id__in=duplicates).update(product_id=keep)
+        Product.objects.filter(id__in=duplicates).delete()
+
+    for keep, duplicates in _duplicates(Parameter, "name").items():
+        _repoint(ProductParameter, "parameter_id", keep, duplicates, "product_info_id")
+        # значения фильтров с тем же текстом объединяем вместе с индексом
+        merged = _collisions(FacetValue, "parameter_id", [keep, *duplicates], "value")
+        for duplicate, kept in merged.items():
+            _repoint(CatalogFacet, "facet_value_id", kept, [duplicate], "entry_id")
+        FacetValue.objects.filter(id__in=merged).delete()
+        FacetValue.objects.filter(parameter_id__in=duplicates).update(parameter_id=keep)
+        Parameter.objects.filter(id__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("order_service", "0014_product_info_retired"),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="parameter",
+            constraint=models.UniqueConstraint(
+                fields=("name",), name="unique_parameter"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="product",
+            constraint=models.UniqueConstraint(
+                fields=("name", "category"), name="unique_product"
+            ),
+        ),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:02
+
+from django.db import migrations, models
+
+ENTRY_TABLE = "order_service_catalogentry"
+TOMBSTONE_TABLE = "order_service_catalogtombstone"
+
+# время удаления - как у Now(), которым отмечается updated_at строк каталога
+POSTGRES_FORWARD = [
+    f"""
+    CREATE FUNCTION {TOMBSTONE_TABLE}_insert() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO {TOMBSTONE_TABLE}(product_info_id, deleted_at)
+        VALUES (OLD.product_info_id, STATEMENT_TIMESTAMP());
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    f"""
+    CREATE TRIGGER {TOMBSTONE_TABLE}_insert AFTER DELETE ON {ENTRY_TABLE}
+    FOR EACH ROW EXECUTE FUNCTION {TOMBSTONE_TABLE}_insert()
+    """,
+]
+
+POSTGRES_BACKWARD = [
+    f"DROP TRIGGER IF EXISTS {TOMBSTONE_TABLE}_insert ON {ENTRY_TABLE}",
+    f"DROP FUNCTION IF EXISTS {TOMBSTONE_TABLE}_insert()",
+]
+
+SQLITE_FORWARD = [
+    f"""
+    CREATE TRIGGER {TOMBSTONE_TABLE}_insert AFTER DELETE ON {ENTRY_TABLE} BEGIN
+        INSERT INTO {TOMBSTONE_TABLE}(product_info_id, deleted_at)
+        VALUES (old.product_info_id, STRFTIME('%Y-%m-%d %H:%M:%f', 'NOW'));
+    END
+    """,
+]
+
+SQLITE_BACKWARD = [
+    f"DROP TRIGGER IF EXISTS {TOMBSTONE_TABLE}_insert",
+]
+
+STATEMENTS = {
+    "postgresql": (POSTGRES_FORWARD, POSTGRES_BACKWARD),
+    "sqlite": (SQLITE_FORWARD, SQLITE_BACKWARD),
+}
+
+
+def execute(position):
+    def run(apps, schema_editor):
+        for sql in STATEMENTS.get(schema_editor.connection.vendor, ((), ()))[position]:
+            schema_editor.execute(sql)
+
+    return run
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("order_service", "0015_unique_product_parameter_names"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CatalogTombstone",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "product_info_id",
+                    models.PositiveIntegerField(verbose_name="ИД карточки товара"),
+                ),
+                ("deleted_at", models.DateTimeField(verbose_name="Удалена")),
+            ],
+            options={
+                "verbose_name": "Удалённая строка каталога",
+                "verbose_name_plural": "Удалённые строки каталога",
+                "indexes": [
+                    models.Index(
+                        fields=["deleted_at"], name="catalog_tombstone_deleted"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(execute(0), execute(1)),
+    ]
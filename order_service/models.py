@@ -4,7 +4,7 @@ from django.contrib.auth.base_user import BaseUserManager
 from django.contrib.auth.models import AbstractUser, Group, Permission
 from django.contrib.auth.validators import UnicodeUsernameValidator
 from django.db import models
-from django.db.models import Manager
+from django.db.models import F, Manager
 from django.utils.translation import gettext_lazy as _
 
 
@@ -23,6 +23,13 @@ USER_TYPE_CHOICES = (
     ("buyer", "Покупатель"),
 )
 
+IMPORT_JOB_STATE_CHOICES = (
+    ("queued", "В очереди"),
+    ("running", "Выполняется"),
+    ("done", "Завершена"),
+    ("failed", "Ошибка"),
+)
+
 
 class UserManager(BaseUserManager):
     use_in_migrations = True
@@ -134,6 +141,21 @@ class Shop(models.Model):
     admin_email = models.EmailField(
         verbose_name="Email администратора магазина", null=True, blank=True
     )
+    feed_etag = models.CharField(
+        verbose_name="ETag прайса по ссылке", max_length=255, blank=True
+    )
+    feed_last_modified = models.CharField(
+        verbose_name="Last-Modified прайса по ссылке", max_length=64, blank=True
+    )
+    feed_hash = models.CharField(
+        verbose_name="Хеш прайса по ссылке", max_length=64, blank=True
+    )
+    feed_fetched_at = models.DateTimeField(
+        verbose_name="Время проверки прайса по ссылке", null=True, blank=True
+    )
+    catalog_version = models.PositiveIntegerField(
+        verbose_name="Текущая версия каталога", default=0
+    )
     objects = Manager()
 
     class Meta:
@@ -176,11 +198,23 @@ class Product(models.Model):
         verbose_name = "Товар"
         verbose_name_plural = "Список товаров"
         ordering = ("-name",)
+        constraints = [
+            # индекс ограничения служит и для поиска товара по названию
+            models.UniqueConstraint(fields=["name", "category"], name="unique_product"),
+        ]
 
     def __str__(self):
         return self.name
 
 
+class ProductInfoQuerySet(models.QuerySet):
+    def current(self):
+        """
+        Карточки текущей версии каталога магазина
+        """
+        return self.filter(catalog_version=F("shop__catalog_version"))
+
+
 class ProductInfo(models.Model):
     model = models.CharField(max_length=80, verbose_name="Модель", blank=True)
     external_id = models.PositiveIntegerField(verbose_name="Внешний ИД")
@@ -201,14 +235,24 @@ class ProductInfo(models.Model):
     quantity = models.PositiveIntegerField(verbose_name="Количество")
     price = models.PositiveIntegerField(verbose_name="Цена")
     price_rrc = models.PositiveIntegerField(verbose_name="Рекомендуемая розничная цена")
-    objects = Manager()
+    # NULL - карточка снята с продажи, но на неё ссылаются оформленные заказы
+    catalog_version = models.PositiveIntegerField(
+        verbose_name="Версия каталога", default=0, null=True, blank=True
+    )
+    objects = ProductInfoQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Информация о товаре"
         verbose_name_plural = "Карточка товара"
         constraints = [
             models.UniqueConstraint(
-                fields=["product", "shop", "external_id"], name="unique_product_info"
+                fields=["product", "shop", "external_id", "catalog_version"],
+                name="unique_product_info",
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["product", "catalog_version"], name="product_info_current"
             ),
         ]
         ordering = ("-model",)
@@ -222,6 +266,9 @@ class Parameter(models.Model):
         verbose_name = "Название параметра"
         verbose_name_plural = "Список названий параметров"
         ordering = ("-name",)
+        constraints = [
+            models.UniqueConstraint(fields=["name"], name="unique_parameter"),
+        ]
 
     def __str__(self):
         return self.name
@@ -296,22 +343,31 @@ class Order(models.Model):
     contact = models.ForeignKey(
         Contact, verbose_name="Контакт", blank=True, null=True, on_delete=models.CASCADE
     )
+    # пересчитываются refresh_order_totals при изменении позиций заказа
+    total_sum = models.PositiveIntegerField(verbose_name="Сумма", default=0)
+    items_count = models.PositiveIntegerField(
+        verbose_name="Количество товаров", default=0
+    )
     objects = Manager()
 
     class Meta:
         verbose_name = "Заказ"
         verbose_name_plural = "Список заказов"
         ordering = ("-dt",)
+        indexes = [
+            models.Index(fields=["user", "state"], name="order_user_state"),
+            # корзина у пользователя одна, а заказов много
+            models.Index(
+                fields=["user"],
+                name="order_basket",
+                condition=models.Q(state="basket"),
+            ),
+        ]
 
     def __str__(self):
         return str(self.dt)
 
 
-# @property
-# def sum(self):
-#     return self.ordered_items.aggregate(total=Sum("quantity"))["total"]
-
-
 class OrderItem(models.Model):
     order = models.ForeignKey(
         Order,
@@ -347,3 +403,200 @@ class OrderItem(models.Model):
                 fields=["order_id", "product_info"], name="unique_order_item"
             ),
         ]
+
+
+class CatalogEntry(models.Model):
+    """
+    Плоская строка каталога для просмотра товаров: карточка текущей
+    версии каталога вместе с магазином, товаром, категорией и параметрами
+    """
+
+    product_info = models.OneToOneField(
+        ProductInfo,
+        verbose_name="Информация о товаре",
+        related_name="catalog_entry",
+        primary_key=True,
+        on_delete=models.CASCADE,
+    )
+    shop = models.ForeignKey(
+        Shop,
+        verbose_name="Магазин",
+        related_name="catalog_entries",
+        on_delete=models.CASCADE,
+    )
+    shop_name = models.CharField(max_length=50, verbose_name="Название магазина")
+    shop_state = models.BooleanField(verbose_name="Статус магазина", default=True)
+    product = models.ForeignKey(
+        Product,
+        verbose_name="Товар",
+        related_name="catalog_entries",
+        on_delete=models.CASCADE,
+    )
+    product_name = models.CharField(max_length=80, verbose_name="Название товара")
+    category = models.ForeignKey(
+        Category,
+        verbose_name="Категория",
+        related_name="catalog_entries",
+        null=True,
+        on_delete=models.SET_NULL,
+    )
+    category_name = models.CharField(
+        max_length=40, verbose_name="Название категории", blank=True
+    )
+    model = models.CharField(max_length=80, verbose_name="Модель", blank=True)
+    external_id = models.PositiveIntegerField(verbose_name="Внешний ИД")
+    quantity = models.PositiveIntegerField(verbose_name="Количество")
+    price = models.PositiveIntegerField(verbose_name="Цена")
+    price_rrc = models.PositiveIntegerField(verbose_name="Рекомендуемая розничная цена")
+    parameters = models.JSONField(verbose_name="Параметры", default=list)
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Обновлена")
+    objects = Manager()
+
+    class Meta:
+        verbose_name = "Строка каталога"
+        verbose_name_plural = "Каталог товаров"
+        ordering = ("-model",)
+        indexes = [
+            # индексы списка товаров строятся только по строкам
+            # активных магазинов, по ним же идёт выборка
+            models.Index(
+                fields=["-model", "product_info"],
+                name="catalog_entry_model",
+                condition=models.Q(shop_state=True),
+            ),
+            models.Index(
+                fields=["price", "product_info"],
+                name="catalog_entry_price",
+                condition=models.Q(shop_state=True),
+            ),
+            models.Index(
+                fields=["price", "product_info"],
+                name="catalog_entry_in_stock",
+                condition=models.Q(shop_state=True, quantity__gt=0),
+            ),
+            models.Index(
+                fields=["shop", "price", "product_info"],
+                name="catalog_entry_shop_price",
+                condition=models.Q(shop_state=True),
+            ),
+            models.Index(
+                fields=["category", "price", "product_info"],
+                name="catalog_entry_category",
+                condition=models.Q(shop_state=True),
+            ),
+            models.Index(fields=["shop", "external_id"], name="catalog_entry_shop"),
+            models.Index(fields=["updated_at"], name="catalog_entry_updated"),
+        ]
+
+
+class CatalogTombstone(models.Model):
+    """
+    Отметка об удалённой строке каталога для выгрузки изменений.
+    Строки добавляет триггер базы при удалении CatalogEntry
+    (миграция 0016_catalog_tombstones).
+    """
+
+    product_info_id = models.PositiveIntegerField(verbose_name="ИД карточки товара")
+    deleted_at = models.DateTimeField(verbose_name="Удалена")
+    objects = Manager()
+
+    class Meta:
+        verbose_name = "Удалённая строка каталога"
+        verbose_name_plural = "Удалённые строки каталога"
+        indexes = [
+            models.Index(fields=["deleted_at"], name="catalog_tombstone_deleted"),
+        ]
+
+
+class FacetValue(models.Model):
+    parameter = models.ForeignKey(
+        Parameter,
+        verbose_name="Параметр",
+        related_name="facet_values",
+        on_delete=models.CASCADE,
+    )
+    value = models.CharField(verbose_name="Значение", max_length=100)
+    objects = Manager()
+
+    class Meta:
+        verbose_name = "Значение фильтра"
+        verbose_name_plural = "Список значений фильтров"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["parameter", "value"], name="unique_facet_value"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.parameter}: {self.value}"
+
+
+class CatalogFacet(models.Model):
+    """
+    Индекс значений параметров строк каталога для фильтров и их счётчиков
+    """
+
+    entry = models.ForeignKey(
+        CatalogEntry,
+        verbose_name="Строка каталога",
+        related_name="facets",
+        on_delete=models.CASCADE,
+    )
+    facet_value = models.ForeignKey(
+        FacetValue,
+        verbose_name="Значение фильтра",
+        related_name="entries",
+        on_delete=models.CASCADE,
+    )
+    objects = Manager()
+
+    class Meta:
+        verbose_name = "Значение фильтра строки каталога"
+        verbose_name_plural = "Индекс фильтров каталога"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["entry", "facet_value"], name="unique_catalog_facet"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["facet_value", "entry"], name="catalog_facet_value"),
+        ]
+
+
+class ImportJob(models.Model):
+    user = models.ForeignKey(
+        User,
+        verbose_name="Пользователь",
+        related_name="import_jobs",
+        on_delete=models.CASCADE,
+    )
+    file = models.FileField(upload_to="imports/", verbose_name="Файл прайса")
+    state = models.CharField(
+        verbose_name="Статус",
+        choices=IMPORT_JOB_STATE_CHOICES,
+        max_length=10,
+        default="queued",
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Создана")
+    started_at = models.DateTimeField(verbose_name="Начата", null=True, blank=True)
+    finished_at = models.DateTimeField(verbose_name="Завершена", null=True, blank=True)
+    rows = models.PositiveIntegerField(verbose_name="Обработано строк", default=0)
+    stats = models.JSONField(verbose_name="Статистика", default=dict, blank=True)
+    timings = models.JSONField(verbose_name="Время фаз", default=dict, blank=True)
+    errors = models.TextField(verbose_name="Ошибки", blank=True)
+    swap = models.BooleanField(
+        verbose_name="Загрузка новой версией каталога", default=False
+    )
+    heartbeat_at = models.DateTimeField(
+        verbose_name="Последний сигнал обработчика", null=True, blank=True
+    )
+    attempts = models.PositiveIntegerField(verbose_name="Число попыток", default=0)
+    objects = Manager()
+
+    class Meta:
+        verbose_name = "Загрузка прайса"
+        verbose_name_plural = "Список загрузок прайсов"
+        ordering = ("-created_at",)
+
+    def __str__(self):
+        return f"{self.file.name} ({self.state})"
@@ -0,0 +1,94 @@
+import base64
+import binascii
+import json
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class CustomPagination(PageNumberPagination):
+    page_size = 10
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+
+class KeysetPagination(CustomPagination):
+    """
+    Постраничный вывод по номеру страницы или по курсору.
+
+    С параметром cursor (пустым для первой страницы) следующая страница
+    выбирается условием по ключу сортировки и id, а не через OFFSET,
+    и общее число строк не считается. Стоимость страницы не зависит от
+    её номера, поэтому так удобно обходить весь список.
+    """
+
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Неверный курсор"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = self.cursor_query_param in request.query_params
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        page_size = self.get_page_size(request)
+        pk = queryset.model._meta.pk.attname
+        ordering = [
+            field
+            for field in queryset.query.order_by or queryset.model._meta.ordering
+            if isinstance(field, str)
+        ]
+        key = ordering[0].lstrip("-") if ordering else pk
+        descending = bool(ordering) and ordering[0].startswith("-")
+
+        cursor = self.decode_cursor(request.query_params[self.cursor_query_param])
+        if cursor is not None:
+            value, last = cursor
+            further = Q(**{f"{key}__lt" if descending else f"{key}__gt": value})
+            queryset = queryset.filter(further | Q(**{key: value, f"{pk}__gt": last}))
+        if key != pk:
+            queryset = queryset.order_by(f"-{key}" if descending else key, pk)
+        else:
+            queryset = queryset.order_by(f"-{pk}" if descending else pk)
+
+        page = list(queryset[: page_size + 1])
+        self.next_cursor = None
+        if len(page) > page_size:
+            page = page[:page_size]
+            last = page[-1]
+            if not isinstance(last, dict):
+                last = {key: getattr(last, key), pk: getattr(last, pk)}
+            self.next_cursor = self.encode_cursor(last[key], last[pk])
+        return page
+
+    def decode_cursor(self, cursor):
+        if not cursor:
+            return None
+        try:
+            value, last = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except (binascii.Error, ValueError, TypeError):
+            raise NotFound(self.invalid_cursor_message)
+        return value, last
+
+    @staticmethod
+    def encode_cursor(value, last):
+        return base64.urlsafe_b64encode(json.dumps([value, last]).encode()).decode()
+
+    def get_next_link(self):
+        if not self.cursor_mode:
+            return super().get_next_link()
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.next_cursor,
+        )
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+        return Response({"next": self.get_next_link(), "results": data})
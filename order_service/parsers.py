@@ -0,0 +1,29 @@
+import codecs
+import csv
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+class CSVParser(BaseParser):
+    """
+    Разбор тела запроса в формате CSV в список строк.
+    Первая строка пропускается, если это заголовок.
+    """
+
+    media_type = "text/csv"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        try:
+            rows = [
+                row for row in csv.reader(codecs.iterdecode(stream, encoding)) if row
+            ]
+        except (csv.Error, UnicodeDecodeError) as error:
+            raise ParseError(f"CSV parse error - {error}")
+
+        if rows and not rows[0][0].strip().isdigit():
+            rows = rows[1:]
+        return {"items": rows}
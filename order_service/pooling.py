@@ -0,0 +1,226 @@
+import os
+import threading
+import time
+from collections import Counter, deque
+
+from psycopg2 import extensions
+
+# соединение, простоявшее дольше, проверяется запросом SELECT 1
+HEALTH_CHECK_IDLE = 30
+
+# ожидающему передано право открыть новое соединение
+_SLOT = object()
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    """
+    Пул соединений с базой в процессе.
+
+    Открыто не больше size соединений, запрос соединения ждёт
+    освобождения не дольше timeout секунд. Соединения старше max_age
+    секунд и сломанные закрываются, вместо них открываются новые.
+    """
+
+    def __init__(self, size, max_age, timeout):
+        self.size = size
+        self.max_age = max_age
+        self.timeout = timeout
+        self.opened = 0
+        self.closed = False
+        self.stats = Counter()
+        self._idle = []
+        self._waiters = deque()
+        self._created = {}
+        self._released = {}
+        self._lock = threading.Lock()
+
+    def checkout(self, connect):
+        started = time.perf_counter()
+        waiter = None
+        with self._lock:
+            if self._idle:
+                connection = self._idle.pop()
+            elif self.opened < self.size:
+                self.opened += 1
+                connection = None
+            else:
+                # ожидающие получают соединения по очереди, новые запросы
+                # не забирают освободившееся соединение раньше них
+                waiter = [threading.Event(), None]
+                self._waiters.append(waiter)
+        if waiter is not None:
+            waiter[0].wait(self.timeout)
+            with self._lock:
+                if waiter[1] is None:
+                    self._waiters.remove(waiter)
+                    self.stats["timeouts"] += 1
+                    raise PoolTimeout(f"Нет свободных соединений за {self.timeout} с")
+            connection = None if waiter[1] is _SLOT else waiter[1]
+        wait = time.perf_counter() - started
+        with self._lock:
+            self.stats["checkouts"] += 1
+            self.stats["waits"] += waiter is not None
+            self.stats["wait_time"] += wait
+            self.stats["max_wait"] = max(self.stats["max_wait"], wait)
+
+        reason = connection is not None and self._unusable(connection)
+        if reason:
+            self._discard(connection)
+            with self._lock:
+                self.stats[reason] += 1
+            connection = None
+        if connection is None:
+            try:
+                connection = connect()
+            except Exception:
+                with self._lock:
+                    self._free_slot()
+                raise
+            self._created[id(connection)] = time.monotonic()
+            with self._lock:
+                self.stats["connects"] += 1
+        return connection
+
+    def checkin(self, connection, broken=False):
+        if self.closed:
+            self._release(connection)
+            return
+        if broken or connection.closed:
+            self._release(connection, "reconnects")
+            return
+        if self._age(connection) > self.max_age:
+            self._release(connection, "expired")
+            return
+        try:
+            if connection.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+                connection.rollback()
+        except Exception:
+            self._release(connection, "reconnects")
+            return
+        self._released[id(connection)] = time.monotonic()
+        with self._lock:
+            if not self._hand_over(connection):
+                self._idle.append(connection)
+
+    def close(self):
+        with self._lock:
+            self.closed = True
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            self._release(connection)
+
+    def snapshot(self):
+        with self._lock:
+            idle = len(self._idle)
+            stats = dict(self.stats)
+        in_use = self.opened - idle
+        checkouts = stats.get("checkouts", 0)
+        wait_time = stats.get("wait_time", 0)
+        return {
+            "size": self.size,
+            "max_age": self.max_age,
+            "opened": self.opened,
+            "in_use": in_use,
+            "idle": idle,
+            "saturation": round(in_use / self.size, 3),
+            "checkouts": checkouts,
+            "waits": stats.get("waits", 0),
+            "timeouts": stats.get("timeouts", 0),
+            "avg_wait_ms": round(wait_time / checkouts * 1000, 3) if checkouts else 0,
+            "max_wait_ms": round(stats.get("max_wait", 0) * 1000, 3),
+            "connects": stats.get("connects", 0),
+            "reconnects": stats.get("reconnects", 0),
+            "expired": stats.get("expired", 0),
+        }
+
+    def _age(self, connection):
+        return time.monotonic() - self._created.get(id(connection), 0)
+
+    def _unusable(self, connection):
+        """
+        Причина замены соединения из пула или None, если оно годится
+        """
+        if connection.closed:
+            return "reconnects"
+        if self._age(connection) > self.max_age:
+            return "expired"
+        if time.monotonic() - self._released.get(id(connection), 0) > HEALTH_CHECK_IDLE:
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+                connection.rollback()
+            except Exception:
+                return "reconnects"
+        return None
+
+    def _discard(self, connection):
+        self._created.pop(id(connection), None)
+        self._released.pop(id(connection), None)
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _hand_over(self, item):
+        """
+        Передать соединение или место под новое первому ожидающему
+        """
+        if not self._waiters:
+            return False
+        waiter = self._waiters.popleft()
+        waiter[1] = item
+        waiter[0].set()
+        return True
+
+    def _free_slot(self):
+        if not self._hand_over(_SLOT):
+            self.opened -= 1
+
+    def _release(self, connection, reason=None):
+        self._discard(connection)
+        with self._lock:
+            if reason:
+                self.stats[reason] += 1
+            self._free_slot()
+
+
+def get_pool(alias, settings_dict):
+    """
+    Пул соединений для базы alias по настройке POOL, None - без пула
+    """
+    options = settings_dict.get("POOL") or {}
+    if not options.get("SIZE"):
+        return None
+    with _pools_lock:
+        if alias not in _pools:
+            _pools[alias] = ConnectionPool(
+                options["SIZE"], options.get("MAX_AGE", 600), options.get("TIMEOUT", 10)
+            )
+        return _pools[alias]
+
+
+def close_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+def pool_stats():
+    """
+    Счётчики пулов соединений текущего процесса
+    """
+    with _pools_lock:
+        pools = dict(_pools)
+    return {
+        "pid": os.getpid(),
+        "pools": {alias: pool.snapshot() for alias, pool in pools.items()},
+    }
@@ -0,0 +1,270 @@
+import codecs
+import csv
+import json
+import os
+from itertools import chain
+
+import yaml
+from yaml import events, nodes
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# C-версия загрузчика есть только при сборке PyYAML с libyaml
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+def _compose(loader, anchors):
+    """
+    Собираем узел YAML из событий парсера.
+
+    CSafeLoader не даёт собрать отдельный узел внутри документа,
+    поэтому узлы строим сами и передаём конструктору загрузчика.
+    """
+    event = loader.get_event()
+    if isinstance(event, events.AliasEvent):
+        if event.anchor not in anchors:
+            raise yaml.composer.ComposerError(
+                None, None, f"found undefined alias {event.anchor}", event.start_mark
+            )
+        return anchors[event.anchor]
+
+    tag = event.tag
+    if isinstance(event, events.ScalarEvent):
+        if tag is None or tag == "!":
+            tag = loader.resolve(nodes.ScalarNode, event.value, event.implicit)
+        node = nodes.ScalarNode(
+            tag, event.value, event.start_mark, event.end_mark, style=event.style
+        )
+    elif isinstance(event, events.SequenceStartEvent):
+        if tag is None or tag == "!":
+            tag = loader.resolve(nodes.SequenceNode, None, event.implicit)
+        node = nodes.SequenceNode(
+            tag, [], event.start_mark, None, flow_style=event.flow_style
+        )
+        while not loader.check_event(events.SequenceEndEvent):
+            node.value.append(_compose(loader, anchors))
+        node.end_mark = loader.get_event().end_mark
+    else:
+        if tag is None or tag == "!":
+            tag = loader.resolve(nodes.MappingNode, None, event.implicit)
+        node = nodes.MappingNode(
+            tag, [], event.start_mark, None, flow_style=event.flow_style
+        )
+        while not loader.check_event(events.MappingEndEvent):
+            key = _compose(loader, anchors)
+            node.value.append((key, _compose(loader, anchors)))
+        node.end_mark = loader.get_event().end_mark
+
+    if event.anchor is not None:
+        anchors[event.anchor] = node
+    return node
+
+
+def _read_value(loader, anchors):
+    return loader.construct_document(_compose(loader, anchors))
+
+
+def _read_goods(loader, anchors):
+    if not loader.check_event(events.SequenceStartEvent):
+        raise ValueError("Раздел goods должен быть списком")
+    loader.get_event()
+    while not loader.check_event(events.SequenceEndEvent):
+        yield _read_value(loader, anchors)
+    loader.get_event()
+
+
+def _stream_goods(loader, anchors):
+    """
+    Отдаём товары по одному, не держа в памяти весь список
+    """
+    try:
+        yield from _read_goods(loader, anchors)
+        while not loader.check_event(events.MappingEndEvent):
+            _compose(loader, anchors)
+            _compose(loader, anchors)
+    finally:
+        loader.dispose()
+
+
+def read_yaml(stream):
+    """
+    Потоковое чтение прайса в формате YAML.
+
+    Возвращаем словарь с ключами shop, categories и goods, где goods -
+    генератор товаров. Если раздел goods идёт раньше shop и categories,
+    товары приходится прочитать целиком.
+    """
+    loader = YAML_LOADER(stream)
+    anchors = {}
+    loader.get_event()
+    if not loader.check_event(events.DocumentStartEvent):
+        raise ValueError("Файл не содержит данных")
+    loader.get_event()
+    if not loader.check_event(events.MappingStartEvent):
+        raise ValueError("Прайс должен быть словарём")
+    loader.get_event()
+
+    data = {}
+    while not loader.check_event(events.MappingEndEvent):
+        key = _read_value(loader, anchors)
+        if key != "goods":
+            data[key] = _read_value(loader, anchors)
+        elif {"shop", "categories"}.issubset(data):
+            data["goods"] = _stream_goods(loader, anchors)
+            return data
+        else:
+            data["goods"] = list(_read_goods(loader, anchors))
+
+    loader.dispose()
+    return data
+
+
+CSV_COLUMNS = (
+    "shop",
+    "category_id",
+    "category_name",
+    "id",
+    "model",
+    "name",
+    "price",
+    "price_rrc",
+    "quantity",
+)
+
+
+def _csv_goods(rows, positions, parameters):
+    for row in rows:
+        if not row:
+            continue
+        category_id, category_name, external_id, model, name, *numbers = (
+            row[position] for position in positions[1:]
+        )
+        price, price_rrc, quantity = map(int, numbers)
+        yield {
+            "id": int(external_id),
+            "category": int(category_id),
+            "category_name": category_name,
+            "model": model,
+            "name": name,
+            "price": price,
+            "price_rrc": price_rrc,
+            "quantity": quantity,
+            "parameters": {
+                parameter: row[position]
+                for position, parameter in parameters
+                if row[position] != ""
+            },
+        }
+
+
+def read_csv(stream):
+    """
+    Потоковое чтение прайса в формате CSV.
+
+    Одна строка - один товар, столбцы перечислены в CSV_COLUMNS.
+    Остальные столбцы считаются параметрами товара, пустое значение
+    означает отсутствие параметра. Категории собираются из строк товаров.
+    """
+    rows = csv.reader(codecs.iterdecode(stream, "utf-8-sig"))
+    header = next(rows, None)
+    if header is None:
+        raise ValueError("Файл не содержит данных")
+    missing = set(CSV_COLUMNS) - set(header)
+    if missing:
+        raise ValueError(f"Нет столбцов: {', '.join(sorted(missing))}")
+
+    positions = [header.index(column) for column in CSV_COLUMNS]
+    parameters = [
+        (position, name)
+        for position, name in enumerate(header)
+        if name not in CSV_COLUMNS
+    ]
+    first = next(rows, None)
+    if first is None:
+        raise ValueError("Файл не содержит товаров")
+
+    return {
+        "shop": first[positions[0]],
+        "categories": [],
+        "goods": _csv_goods(chain([first], rows), positions, parameters),
+    }
+
+
+def _read_records(records):
+    """
+    Первая запись - заголовок с shop и categories, остальные - товары
+    """
+    header = next(records, None)
+    if not isinstance(header, dict) or not {"shop", "categories"}.issubset(header):
+        raise ValueError("Первая запись должна содержать shop и categories")
+    return {
+        "shop": header["shop"],
+        "categories": header["categories"],
+        "goods": records,
+    }
+
+
+def read_jsonl(stream):
+    """
+    Потоковое чтение прайса в формате JSON Lines
+    """
+    return _read_records(json.loads(line) for line in stream if line.strip())
+
+
+def read_msgpack(stream):
+    """
+    Потоковое чтение прайса из последовательности объектов MessagePack
+    """
+    if msgpack is None:
+        raise ValueError("Для формата MessagePack установите пакет msgpack")
+    return _read_records(iter(msgpack.Unpacker(stream, raw=False)))
+
+
+READERS = {
+    "yaml": read_yaml,
+    "csv": read_csv,
+    "jsonl": read_jsonl,
+    "msgpack": read_msgpack,
+}
+
+EXTENSIONS = {
+    ".yaml": "yaml",
+    ".yml": "yaml",
+    ".csv": "csv",
+    ".jsonl": "jsonl",
+    ".ndjson": "jsonl",
+    ".msgpack": "msgpack",
+    ".mpk": "msgpack",
+}
+
+
+def detect_format(name, head):
+    """
+    Определяем формат прайса по расширению файла,
+    а если оно неизвестно - по первым байтам
+    """
+    extension = os.path.splitext(name or "")[1].lower()
+    if extension in EXTENSIONS:
+        return EXTENSIONS[extension]
+
+    if head[:1] and (0x80 <= head[0] <= 0x8F or head[0] in (0xDE, 0xDF)):
+        return "msgpack"
+    head = head.lstrip()
+    if head[:1] == b"{":
+        return "jsonl"
+    if b"," in head.split(b"\n", 1)[0] and b"shop" in head.split(b"\n", 1)[0]:
+        return "csv"
+    return "yaml"
+
+
+def read_price_list(stream, name=None):
+    """
+    Потоковое чтение прайса любого поддерживаемого формата
+    """
+    name = name or getattr(stream, "name", None)
+    head = stream.read(512)
+    stream.seek(0)
+    return READERS[detect_format(name, head)](stream)
@@ -0,0 +1,118 @@
+import hashlib
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+PIN_COOKIE = "primary_pin"
+PIN_KEY = "replica:pin:{}"
+
+# чтение с реплики разрешено (безопасный запрос к представлению каталога)
+_use_replica = ContextVar("use_replica", default=False)
+# клиент писал в базу недавно или в этом запросе - читаем с основной базы
+_pinned = ContextVar("pinned", default=False)
+_wrote = ContextVar("wrote", default=False)
+
+
+def replica_aliases():
+    return getattr(settings, "DATABASE_REPLICAS", ())
+
+
+@contextmanager
+def read_from_replica():
+    """
+    Запросы на чтение внутри блока уходят на реплику, пока не было записи
+    """
+    token = _use_replica.set(True)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Маршрутизатор баз: чтение внутри read_from_replica() - на случайную
+    реплику из DATABASE_REPLICAS, всё остальное - на основную базу
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = replica_aliases()
+        if replicas and _use_replica.get() and not (_pinned.get() or _wrote.get()):
+            return random.choice(replicas)
+        return None
+
+    def db_for_write(self, model, **hints):
+        _wrote.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *replica_aliases()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # схему реплик обновляет репликация
+        if db in replica_aliases():
+            return False
+        return None
+
+
+class ReplicaReadMixin:
+    """
+    Безопасные запросы (GET, HEAD, OPTIONS) к представлению читают с реплики
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ("GET", "HEAD", "OPTIONS"):
+            return super().dispatch(request, *args, **kwargs)
+        with read_from_replica():
+            return super().dispatch(request, *args, **kwargs)
+
+
+def _pin_key(request):
+    authorization = request.headers.get("Authorization")
+    if not authorization:
+        return None
+    return PIN_KEY.format(hashlib.sha256(authorization.encode()).hexdigest())
+
+
+class ReplicaPinMiddleware:
+    """
+    После запроса с записью клиент REPLICA_STICKY_SECONDS секунд читает
+    с основной базы, чтобы сразу видеть свои изменения, пока они идут
+    на реплики.
+
+    Клиент узнаётся по cookie и, для API с токеном, по заголовку
+    Authorization: отметка о записи хранится в общем кеше.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not replica_aliases():
+            return self.get_response(request)
+
+        key = _pin_key(request)
+        pinned = PIN_COOKIE in request.COOKIES or (
+            key is not None and cache.get(key, False)
+        )
+        pinned_token, wrote_token = _pinned.set(pinned), _wrote.set(False)
+        try:
+            response = self.get_response(request)
+            wrote = _wrote.get()
+        finally:
+            _pinned.reset(pinned_token)
+            _wrote.reset(wrote_token)
+
+        if wrote:
+            seconds = settings.REPLICA_STICKY_SECONDS
+            response.set_cookie(PIN_COOKIE, "1", max_age=seconds, httponly=True)
+            if key is not None:
+                cache.set(key, True, seconds)
+        return response
@@ -0,0 +1,102 @@
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, F, FloatField, Func, Q, Value
+from django.db.models.expressions import RawSQL
+
+SEARCH_CONFIG = "russian"
+# Индексы и таблица FTS5 создаются миграцией 0006_catalog_search
+SEARCH_TABLE = "order_service_catalogsearch"
+
+WORD_RE = re.compile(r"\w+")
+
+
+def _like_pattern(value):
+    """
+    Шаблон ILIKE для поиска подстроки: символы % и _ из запроса
+    ищутся как есть
+    """
+    for char in ("\\", "%", "_"):
+        value = value.replace(char, f"\\{char}")
+    return f"%{value}%"
+
+
+def _postgres_search(queryset, words, value):
+    query = " & ".join(f"{word}:*" for word in words)
+    return (
+        queryset.filter(
+            RawSQL(
+                f"(search_vector @@ to_tsquery('{SEARCH_CONFIG}', %s)"
+                " OR product_name ILIKE %s)",
+                (query, _like_pattern(value)),
+                output_field=BooleanField(),
+            )
+        )
+        .annotate(
+            rank=RawSQL(
+                f"ts_rank(search_vector, to_tsquery('{SEARCH_CONFIG}', %s))"
+                " + similarity(product_name, %s)",
+                (query, value),
+                output_field=FloatField(),
+            )
+        )
+        .order_by("-rank", "product_info_id")
+    )
+
+
+class _SqliteRank(Func):
+    """
+    Ранг FTS5 строки каталога: аргументы - запрос и id строки.
+    Столбец строки подставляет компилятор, поэтому выражение работает
+    и во вложенном запросе с псевдонимом таблицы.
+    """
+
+    template = (
+        f"(SELECT -rank FROM {SEARCH_TABLE} "
+        f"WHERE {SEARCH_TABLE} MATCH %(query)s AND rowid = %(row)s)"
+    )
+    arity = 2
+    output_field = FloatField()
+
+    def as_sql(self, compiler, connection, **extra_context):
+        (query, query_params), (row, row_params) = (
+            compiler.compile(expression) for expression in self.get_source_expressions()
+        )
+        return self.template % {"query": query, "row": row}, (
+            *query_params,
+            *row_params,
+        )
+
+
+def _sqlite_search(queryset, words):
+    query = " ".join(f'"{word}"*' for word in words)
+    return (
+        queryset.filter(
+            product_info_id__in=RawSQL(
+                f"SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s",
+                (query,),
+            )
+        )
+        .annotate(rank=_SqliteRank(Value(query), F("product_info_id")))
+        .order_by("-rank", "product_info_id")
+    )
+
+
+def search_entries(queryset, value):
+    """
+    Полнотекстовый поиск по названиям товара и категории с сортировкой
+    по релевантности.
+
+    В PostgreSQL используется tsvector с индексом GIN, части слов
+    ищутся по триграммному индексу названия товара. В SQLite - таблица
+    FTS5 с поиском по началу слов. На других базах остаётся icontains.
+    """
+    words = WORD_RE.findall(value.lower())
+    vendor = connections[queryset.db].vendor
+    if words and vendor == "postgresql":
+        return _postgres_search(queryset, words, value)
+    if words and vendor == "sqlite":
+        return _sqlite_search(queryset, words)
+    return queryset.filter(
+        Q(product_name__icontains=value) | Q(category_name__icontains=value)
+    )
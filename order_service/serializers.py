@@ -10,10 +10,30 @@ from order_service.models import (
     OrderItem,
     Order,
     Contact,
+    ImportJob,
+    CatalogEntry,
 )
 from django.contrib.auth.tokens import default_token_generator
 from rest_framework.authtoken.models import Token
-from django.db.models import Sum, F
+
+
+class SparseFieldsMixin:
+    """
+    Оставляем в ответе только поля из контекста fields.
+    Поля optional_fields выводятся, только если запрошены явно.
+    """
+
+    optional_fields = ()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = self.context.get("fields")
+        if fields and set(fields) & set(self.fields):
+            drop = set(self.fields) - set(fields)
+        else:
+            drop = set(self.optional_fields)
+        for name in drop:
+            self.fields.pop(name)
 
 
 class ContactSerializer(serializers.ModelSerializer):
@@ -115,6 +135,50 @@ class ProductInfoSerializer(serializers.ModelSerializer):
         read_only_fields = ("id",)
 
 
+class CatalogEntrySerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """
+    Строка каталога в формате ProductInfoSerializer без вложенных сериализаторов
+    """
+
+    # столбцы, которые нужно прочитать для каждого поля ответа
+    columns = {
+        "id": ("product_info_id",),
+        "model": ("model",),
+        "product": ("product_name", "category_name"),
+        "name": ("product_name",),
+        "shop_name": ("shop_name",),
+        "quantity": ("quantity",),
+        "price": ("price",),
+        "price_rrc": ("price_rrc",),
+        "product_parameters": ("parameters",),
+    }
+    optional_fields = ("name",)
+
+    id = serializers.IntegerField(source="product_info_id", read_only=True)
+    name = serializers.CharField(source="product_name", read_only=True)
+    product = serializers.SerializerMethodField()
+    product_parameters = serializers.JSONField(source="parameters", read_only=True)
+
+    @staticmethod
+    def get_product(obj):
+        return {"name": obj.product_name, "category": obj.category_name}
+
+    class Meta:
+        model = CatalogEntry
+        fields = (
+            "id",
+            "model",
+            "product",
+            "name",
+            "shop_name",
+            "quantity",
+            "price",
+            "price_rrc",
+            "product_parameters",
+        )
+        read_only_fields = fields
+
+
 class OrderItemSerializer(serializers.ModelSerializer):
     class Meta:
         model = OrderItem
@@ -132,18 +196,34 @@ class OrderItemCreateSerializer(OrderItemSerializer):
     product_info = ProductInfoSerializer(read_only=True)
 
 
-class OrderSerializer(serializers.ModelSerializer):
-    ordered_items = OrderItemCreateSerializer(read_only=True, many=True)
+class OrderSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """
+    Заказ с позициями. Если в контексте передан expand, вложенными
+    выводятся только перечисленные связи (contact, product_info, product,
+    product_parameters), остальные - идентификаторами или не выводятся.
+    """
 
-    total_sum = serializers.SerializerMethodField()
+    ordered_items = OrderItemCreateSerializer(read_only=True, many=True)
     contact = ContactSerializer(read_only=True)
 
-    @staticmethod
-    def get_total_sum(obj):
-        total_sum = obj.ordered_items.aggregate(
-            total_sum=Sum(F("quantity") * F("product_info__price"))
-        )["total_sum"]
-        return total_sum
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        expand = self.context.get("expand")
+        if expand is None:
+            return
+
+        if "contact" in self.fields and "contact" not in expand:
+            self.fields["contact"] = serializers.PrimaryKeyRelatedField(read_only=True)
+        if "ordered_items" in self.fields:
+            item = self.fields["ordered_items"].child
+            if "product_info" not in expand:
+                item.fields["product_info"] = serializers.PrimaryKeyRelatedField(
+                    read_only=True
+                )
+            else:
+                for name in ("product", "product_parameters"):
+                    if name not in expand:
+                        item.fields["product_info"].fields.pop(name)
 
     class Meta:
         model = Order
@@ -153,9 +233,25 @@ class OrderSerializer(serializers.ModelSerializer):
             "state",
             "dt",
             "total_sum",
+            "items_count",
             "contact",
         )
-        read_only_fields = ("id",)
+        read_only_fields = ("id", "total_sum", "items_count")
+
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ImportJob
+        fields = (
+            "id",
+            "state",
+            "created_at",
+            "started_at",
+            "finished_at",
+            "attempts",
+            "errors",
+        )
+        read_only_fields = fields
 
 
 class ConfirmEmailTokenSerializer(serializers.ModelSerializer):
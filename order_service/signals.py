@@ -1,11 +1,34 @@
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.mail import EmailMultiAlternatives
+from django.db.models import QuerySet
+from django.db.models.signals import post_save, post_delete, pre_delete
 from django.dispatch import receiver, Signal
 from django_rest_passwordreset.signals import reset_password_token_created
 from django.core.mail import send_mail
 from rest_framework.authtoken.models import Token
 
+from order_service.caching import bump_catalog_version
+from order_service.importers import (
+    refresh_entries,
+    rename_categories,
+    update_shop_entries,
+)
+from order_service.models import (
+    Shop,
+    Category,
+    Product,
+    ProductInfo,
+    Parameter,
+    ProductParameter,
+    OrderItem,
+)
+from order_service.totals import (
+    adjust_order_totals,
+    refresh_basket_totals,
+    refresh_order_totals,
+)
+
 new_user_registered = Signal()
 new_order = Signal()
 updated_order = Signal()
@@ -105,3 +128,142 @@ def updated_order_signal(sender, user_email, admin_emails, **kwargs):
         admin_emails,
         fail_silently=False,
     )
+
+
+@receiver(post_save, sender=Shop)
+def shop_saved(sender, instance, created, **kwargs):
+    """
+    Обновляем название и статус магазина в каталоге
+    """
+    if not created:
+        update_shop_entries([instance])
+
+
+@receiver(post_save, sender=Category)
+def category_saved(sender, instance, created, **kwargs):
+    """
+    Обновляем название категории в каталоге
+    """
+    if not created:
+        rename_categories({instance.id: instance.name})
+
+
+@receiver(post_save, sender=ProductInfo)
+def product_info_saved(sender, instance, update_fields=None, **kwargs):
+    """
+    Пересобираем строку каталога после изменения карточки товара
+    и пересчитываем корзины с ней по новой цене
+    """
+    refresh_entries([instance.id])
+    if update_fields is None or "price" in update_fields:
+        refresh_basket_totals([instance.id])
+
+
+# путь от позиции заказа к объекту, с которого начато удаление
+DELETE_PATHS = {
+    ProductInfo: "product_info",
+    Product: "product_info__product",
+    Shop: "product_info__shop",
+    Category: "product_info__product__category",
+}
+
+
+@receiver(pre_delete, sender=ProductInfo)
+def product_info_deleting(sender, instance, origin=None, **kwargs):
+    """
+    Запоминаем позиции заказов, которые удалятся каскадом вместе
+    с карточкой. Если удаление начато с карточки, товара, магазина
+    или категории, позиции читаются одним запросом на всё удаление.
+    """
+    if hasattr(origin, "_order_items"):
+        return
+    path = DELETE_PATHS.get(getattr(origin, "model", type(origin)))
+    if path is None:
+        target, lookup = instance, {"product_info": instance}
+    elif isinstance(origin, QuerySet):
+        target, lookup = origin, {f"{path}__in": origin}
+    else:
+        target, lookup = origin, {path: origin}
+    target._order_items = list(
+        OrderItem.objects.filter(**lookup).values_list(
+            "order_id", "order__state", "quantity", "product_info__price"
+        )
+    )
+
+
+@receiver(post_delete, sender=ProductInfo)
+def product_info_deleted(sender, instance, origin=None, **kwargs):
+    """
+    Пересчитываем суммы заказов после каскадного удаления позиций.
+    Корзины пересчитываются по текущим ценам, из суммы оформленного
+    заказа вычитаются только удалённые позиции.
+    """
+    for target in (instance, origin):
+        items = getattr(target, "__dict__", {}).pop("_order_items", None)
+        if not items:
+            continue
+        refresh_order_totals(
+            {order_id for order_id, state, *_ in items if state == "basket"}
+        )
+        for order_id, state, quantity, price in items:
+            if state != "basket":
+                adjust_order_totals(order_id, -quantity, price)
+
+
+@receiver(post_save, sender=ProductParameter)
+def product_parameter_saved(sender, instance, **kwargs):
+    """
+    Пересобираем строку каталога после изменения параметров товара
+    """
+    refresh_entries([instance.product_info_id])
+
+
+@receiver(post_delete, sender=ProductParameter)
+def product_parameter_deleted(sender, instance, origin=None, **kwargs):
+    """
+    Пересобираем строку каталога после удаления параметра товара.
+    При удалении самой карточки строка каталога удаляется вместе с ней.
+    """
+    if getattr(origin, "model", type(origin)) in (ProductParameter, Parameter):
+        refresh_entries([instance.product_info_id])
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, created, **kwargs):
+    """
+    Обновляем название и категорию товара в каталоге
+    """
+    if not created:
+        refresh_entries(
+            instance.product_infos.order_by("id").values_list("id", flat=True)
+        )
+
+
+@receiver(post_save, sender=Parameter)
+def parameter_saved(sender, instance, created, **kwargs):
+    """
+    Обновляем название параметра в строках каталога
+    """
+    if not created:
+        refresh_entries(
+            instance.product_parameters.order_by("product_info_id").values_list(
+                "product_info_id", flat=True
+            )
+        )
+
+
+@receiver(post_save, sender=Shop)
+@receiver(post_delete, sender=Shop)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Parameter)
+@receiver(post_save, sender=ProductInfo)
+@receiver(post_delete, sender=ProductInfo)
+@receiver(post_save, sender=ProductParameter)
+@receiver(post_delete, sender=ProductParameter)
+def catalog_changed(sender, **kwargs):
+    """
+    Сбрасываем кеш ответов каталога после правок, например в админке
+    """
+    bump_catalog_version()
@@ -1,3 +1,1949 @@
-from django.test import TestCase
+import copy
+import csv
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from datetime import datetime, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import skipUnless
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from psycopg2 import extensions
+from django.urls import reverse
+from django.utils import timezone
+from django_rest_passwordreset.models import ResetPasswordToken
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from order_service.caching import cache_stats
+from order_service.exports import EXPORT_TOMBSTONE_DAYS, purge_tombstones
+from order_service.feeds import due_shops, pull_feeds
+from order_service.filters import ProductFilter
+from order_service.importers import (
+    collect_old_versions,
+    import_price_list,
+    refresh_entries,
+    sync_stock,
+)
+from order_service.jobs import (
+    IMPORT_JOB_MAX_ATTEMPTS,
+    STALE_JOB_ERROR,
+    claim_next_job,
+    reclaim_stale_jobs,
+    run_job,
+)
+from order_service.mappers import (
+    CATALOG_OPTIONAL,
+    CATALOG_SPEC,
+    compile_mapper,
+    order_rows,
+    select_spec,
+)
+from order_service.pooling import ConnectionPool, PoolTimeout
+from order_service.readers import detect_format, msgpack, read_price_list
+from order_service.search import _like_pattern
+from order_service.replicas import PIN_COOKIE
+from order_service.totals import refresh_order_totals
+from order_service.models import (
+    Shop,
+    Category,
+    Product,
+    ProductInfo,
+    Parameter,
+    ProductParameter,
+    CatalogEntry,
+    CatalogTombstone,
+    User,
+    Contact,
+    ImportJob,
+    Order,
+    OrderItem,
+)
+from order_service.serializers import (
+    CatalogEntrySerializer,
+    CategorySerializer,
+    OrderSerializer,
+    ShopSerializer,
+)
+from order_service.urls import urlpatterns
+from order_service.views import order_relations
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+class FeedHandler(BaseHTTPRequestHandler):
+    """
+    Сервер-заглушка поставщика: отдаёт shop1.yaml с ETag
+    """
+
+    body = (BASE_DIR / "shop1.yaml").read_bytes()
+    etag = '"v1"'
+    honor_etag = True
+    requests = []
+
+    def do_GET(self):
+        self.requests.append(dict(self.headers))
+        if self.honor_etag and self.headers.get("If-None-Match") == self.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", self.etag)
+        self.send_header("Content-Length", str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, *args):
+        pass
+
+
+class PullFeedsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), FeedHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        FeedHandler.requests = []
+        FeedHandler.honor_etag = True
+        host, port = self.server.server_address
+        self.shop = Shop.objects.create(
+            name="Связной", url=f"http://{host}:{port}/shop1.yaml"
+        )
+
+    def pull(self):
+        return [result["status"] for result in pull_feeds(due_shops(interval=0))]
+
+    def test_pull_imports_then_skips_not_modified(self):
+        self.assertEqual(self.pull(), ["imported"])
+        self.assertEqual(ProductInfo.objects.filter(shop=self.shop).count(), 4)
+
+        self.assertEqual(self.pull(), ["not_modified"])
+        self.assertEqual(FeedHandler.requests[-1]["If-None-Match"], '"v1"')
+
+    def test_unchanged_content_is_not_imported(self):
+        FeedHandler.honor_etag = False
+        self.assertEqual(self.pull(), ["imported"])
+        ProductInfo.objects.filter(shop=self.shop).update(quantity=0)
+
+        self.assertEqual(self.pull(), ["unchanged"])
+        self.assertFalse(
+            ProductInfo.objects.filter(shop=self.shop, quantity__gt=0).exists()
+        )
+
+    def test_failed_feed_waits_for_next_interval(self):
+        self.addCleanup(setattr, FeedHandler, "body", FeedHandler.body)
+        FeedHandler.body = b"shop: [broken"
+        self.assertEqual(self.pull(), ["failed"])
+        FeedHandler.body = (BASE_DIR / "shop1.yaml").read_bytes()
+        self.shop.refresh_from_db()
+        self.assertIsNotNone(self.shop.feed_fetched_at)
+        self.assertEqual((self.shop.feed_etag, self.shop.feed_hash), ("", ""))
+        self.assertFalse(due_shops(interval=3600).exists())
+        self.assertEqual(self.pull(), ["imported"])
+
+    def test_only_http_links_are_fetched(self):
+        Shop.objects.filter(id=self.shop.id).update(url="file:///etc/passwd")
+        [result] = pull_feeds(due_shops(interval=0))
+        self.assertEqual(result["status"], "failed")
+        self.assertIn("http", result["error"])
+        self.assertEqual(FeedHandler.requests, [])
+
+    def test_inactive_and_recent_shops_are_not_due(self):
+        self.pull()
+        self.assertFalse(due_shops(interval=3600).exists())
+        Shop.objects.filter(id=self.shop.id).update(state=False)
+        self.assertFalse(due_shops(interval=0).exists())
+
+
+class ReaderTest(SimpleTestCase):
+    """
+    Чтение прайсов всех форматов
+    """
+
+    goods = [
+        {
+            "id": 1,
+            "category": 5,
+            "model": "m-1",
+            "name": "Товар 1",
+            "price": 100,
+            "price_rrc": 120,
+            "quantity": 3,
+            "parameters": {"Цвет": "белый", "Вес": 2},
+        },
+        {
+            "id": 2,
+            "category": 5,
+            "model": "m-2",
+            "name": "Товар 2",
+            "price": 200,
+            "price_rrc": 220,
+            "quantity": 0,
+            "parameters": {"Цвет": "белый", "Вес": 2},
+        },
+    ]
+
+    def read(self, content, name=None):
+        stream = io.BytesIO(content.encode() if isinstance(content, str) else content)
+        return read_price_list(stream, name)
+
+    def test_yaml_streams_goods_after_header(self):
+        data = self.read(
+            """
+shop: Склад
+categories:
+  - {id: 5, name: Техника}
+goods:
+  - &first
+    id: 1
+    category: 5
+    model: m-1
+    name: Товар 1
+    price: 100
+    price_rrc: 120
+    quantity: 3
+    parameters: &parameters {"Цвет": белый, "Вес": 2}
+  - <<: *first
+    id: 2
+    model: m-2
+    name: Товар 2
+    price: 200
+    price_rrc: 220
+    quantity: 0
+    parameters: *parameters
+version: 2
+""",
+            "shop.yaml",
+        )
+        self.assertEqual(data["shop"], "Склад")
+        self.assertEqual(data["categories"], [{"id": 5, "name": "Техника"}])
+        self.assertNotIsInstance(data["goods"], list)
+        self.assertEqual(list(data["goods"]), self.goods)
+
+    def test_yaml_goods_before_header(self):
+        data = self.read(
+            """
+goods:
+  - {id: 1, category: 5, model: m-1, name: Товар 1, price: 100,
+     price_rrc: 120, quantity: 3, parameters: {"Цвет": белый, "Вес": 2}}
+shop: Склад
+categories: [{id: 5, name: Техника}]
+""",
+            "shop.yaml",
+        )
+        self.assertEqual(data["shop"], "Склад")
+        self.assertEqual(list(data["goods"]), self.goods[:1])
+
+    def test_yaml_errors(self):
+        for content in ("", "- 1\n- 2\n", "shop: Склад\ngoods: {id: 1}\n"):
+            with self.subTest(content=content), self.assertRaises(ValueError):
+                list(self.read(content, "shop.yaml")["goods"])
+
+    def test_csv_parameter_columns(self):
+        data = self.read(
+            "\ufeffshop,category_id,category_name,id,model,name,price,price_rrc,"
+            "quantity,Цвет,Вес\n"
+            "Склад,5,Техника,1,m-1,Товар 1,100,120,3,белый,2\n"
+            "Склад,5,Техника,2,m-2,Товар 2,200,220,0,,\n",
+            "shop.csv",
+        )
+        self.assertEqual(data["shop"], "Склад")
+        goods = list(data["goods"])
+        self.assertEqual(
+            goods[0],
+            {
+                **self.goods[0],
+                "category_name": "Техника",
+                "parameters": {"Цвет": "белый", "Вес": "2"},
+            },
+        )
+        self.assertEqual(goods[1]["parameters"], {})
+
+    def test_csv_missing_columns(self):
+        with self.assertRaisesMessage(ValueError, "Нет столбцов: price_rrc"):
+            self.read("shop,category_id,category_name,id,model,name,price,quantity\n")
+
+    def records(self, name, records):
+        if name == "msgpack":
+            return b"".join(msgpack.packb(record) for record in records)
+        return "\n".join(json.dumps(record) for record in records).encode()
+
+    def test_record_formats(self):
+        header = {"shop": "Склад", "categories": [{"id": 5, "name": "Техника"}]}
+        for name in ("jsonl", "msgpack"):
+            if name == "msgpack" and msgpack is None:
+                continue
+            with self.subTest(name):
+                data = self.read(self.records(name, [header, *self.goods]))
+                self.assertEqual(data["categories"], header["categories"])
+                self.assertEqual(list(data["goods"]), self.goods)
+                with self.assertRaisesMessage(ValueError, "shop и categories"):
+                    self.read(self.records(name, self.goods))
+
+    def test_detect_format(self):
+        cases = [
+            ("prices.YML", b"", "yaml"),
+            ("prices.ndjson", b"", "jsonl"),
+            ("prices.mpk", b"", "msgpack"),
+            ("prices.csv", b"", "csv"),
+            (None, b"\x82\xa4shop", "msgpack"),
+            (None, '  {"shop": "Склад"}'.encode(), "jsonl"),
+            ("upload", "shop,category_id,id\nСклад,1,2".encode(), "csv"),
+            (None, "shop: Склад\ngoods: []".encode(), "yaml"),
+        ]
+        for name, head, expected in cases:
+            with self.subTest(name=name, head=head):
+                self.assertEqual(detect_format(name, head), expected)
+
+
+class ImportJobTest(TestCase):
+    """
+    Фоновые загрузки: задачи остановившегося обработчика возвращаются
+    в очередь, а после нескольких попыток завершаются с ошибкой
+    """
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings = override_settings(MEDIA_ROOT=media.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.user = User.objects.create(email="shop@example.com", type="shop")
+
+    def running_job(self, seconds_ago, attempts):
+        beat = timezone.now() - timedelta(seconds=seconds_ago)
+        return ImportJob.objects.create(
+            user=self.user,
+            file="imports/x.yaml",
+            state="running",
+            started_at=beat,
+            heartbeat_at=beat,
+            attempts=attempts,
+        )
+
+    def test_run_job(self):
+        ImportJob.objects.create(
+            user=self.user,
+            file=SimpleUploadedFile(
+                "shop1.yaml", (BASE_DIR / "shop1.yaml").read_bytes()
+            ),
+        )
+        job = run_job(claim_next_job())
+        job.refresh_from_db()
+        self.assertEqual((job.state, job.attempts, job.rows), ("done", 1, 4))
+        self.assertIsNotNone(job.heartbeat_at)
+
+    def test_stale_jobs_are_requeued_then_failed(self):
+        alive = self.running_job(5, 1)
+        stale = self.running_job(120, 1)
+        self.assertEqual(reclaim_stale_jobs(60), (1, 0))
+        alive.refresh_from_db()
+        stale.refresh_from_db()
+        self.assertEqual((alive.state, stale.state), ("running", "queued"))
+
+        self.assertEqual(claim_next_job().id, stale.id)
+        stale.refresh_from_db()
+        self.assertEqual((stale.state, stale.attempts), ("running", 2))
+
+        ImportJob.objects.filter(id=stale.id).update(
+            heartbeat_at=timezone.now() - timedelta(seconds=120),
+            attempts=IMPORT_JOB_MAX_ATTEMPTS,
+        )
+        self.assertEqual(reclaim_stale_jobs(60), (0, 1))
+        stale.refresh_from_db()
+        self.assertEqual((stale.state, stale.errors), ("failed", STALE_JOB_ERROR))
+        self.assertIsNotNone(stale.finished_at)
+
+
+class CatalogImportTest(TestCase):
+    """
+    Повторная загрузка прайса записывает только изменения по external_id
+    """
+
+    def setUp(self):
+        self.records = price_records("Склад", 0, goods=10)
+        import_price_list(jsonl(self.records))
+
+    def reimport(self, records):
+        stats = import_price_list(jsonl(records)).stats
+        return {key: value for key, value in stats.items() if value}
+
+    def test_unchanged_reimport_writes_nothing(self):
+        ids = dict(ProductInfo.objects.values_list("external_id", "id"))
+        self.assertEqual(
+            self.reimport(self.records),
+            {
+                "categories": 8,
+                "product_infos": 10,
+                "product_parameters": 20,
+                "unchanged": 10,
+            },
+        )
+        self.assertEqual(
+            dict(ProductInfo.objects.values_list("external_id", "id")), ids
+        )
+
+    def test_delta(self):
+        records = copy.deepcopy(self.records)
+        records[1]["price"] += 1
+        records[2]["parameters"]["Цвет"] = "новый"
+        del records[3]["parameters"]["Вес"]
+        del records[4]
+        records.append({**records[-1], "id": 100, "name": "Новый товар"})
+
+        self.assertEqual(
+            self.reimport(records),
+            {
+                "categories": 8,
+                "product_infos": 10,
+                "product_parameters": 19,
+                "created": 1,
+                "updated": 1,
+                "unchanged": 8,
+                "deleted": 1,
+                "parameters_created": 2,
+                "parameters_updated": 1,
+                "parameters_deleted": 1,
+            },
+        )
+        entries = {entry.external_id: entry for entry in CatalogEntry.objects.all()}
+        self.assertEqual(sorted(entries), [0, 1, 2, 4, 5, 6, 7, 8, 9, 100])
+        self.assertEqual(entries[0].price, records[1]["price"])
+        self.assertIn({"parameter": "Цвет", "value": "новый"}, entries[1].parameters)
+        self.assertEqual(
+            [item["parameter"] for item in entries[2].parameters], ["Цвет"]
+        )
+
+    def test_product_change_keeps_offer_row(self):
+        product_info = ProductInfo.objects.get(external_id=0)
+        records = copy.deepcopy(self.records)
+        records[1]["name"] = "Переименованный товар"
+        records[1]["category"] = 8
+
+        stats = self.reimport(records)
+        self.assertEqual((stats["updated"], stats["unchanged"]), (1, 9))
+        product_info.refresh_from_db()
+        self.assertEqual(
+            (product_info.product.name, product_info.product.category_id),
+            ("Переименованный товар", 8),
+        )
+        entry = CatalogEntry.objects.get(product_info=product_info)
+        self.assertEqual(
+            (entry.product_name, entry.category_id), ("Переименованный товар", 8)
+        )
+
+    def test_offer_in_placed_order_is_retired(self):
+        user = User.objects.create(email="buyer@example.com", type="buyer")
+        product_info = ProductInfo.objects.get(external_id=0)
+        orders = [
+            Order.objects.create(user=user, state=state) for state in ("new", "basket")
+        ]
+        for order in orders:
+            OrderItem.objects.create(order=order, product_info=product_info, quantity=2)
+        refresh_order_totals([order.id for order in orders])
+
+        self.assertEqual(
+            self.reimport(self.records[:1] + self.records[2:])["deleted"], 1
+        )
+        placed, basket = orders
+        self.assertEqual(
+            list(placed.ordered_items.values_list("product_info_id", flat=True)),
+            [product_info.id],
+        )
+        placed.refresh_from_db()
+        self.assertEqual(placed.total_sum, product_info.price * 2)
+        self.assertFalse(basket.ordered_items.exists())
+        product_info.refresh_from_db()
+        self.assertIsNone(product_info.catalog_version)
+        self.assertFalse(ProductInfo.objects.current().filter(external_id=0).exists())
+        self.assertFalse(CatalogEntry.objects.filter(external_id=0).exists())
+        self.assertEqual(collect_old_versions(), 0)
+
+        # оффер вернулся в прайс - создаётся новая карточка
+        self.assertEqual(self.reimport(self.records)["created"], 1)
+        self.assertEqual(ProductInfo.objects.filter(external_id=0).count(), 2)
+        self.assertTrue(CatalogEntry.objects.filter(external_id=0).exists())
+
+
+@skipUnless(
+    connection.vendor == "postgresql", "параллельная запись только в PostgreSQL"
+)
+class ConcurrentImportTest(TransactionTestCase):
+    """
+    Параллельные загрузки прайсов с общими товарами и параметрами
+    не создают дублей
+    """
+
+    workers = 4
+
+    def load(self, barrier, shop, errors):
+        try:
+            barrier.wait()
+            import_price_list(price_list(shop, 0, goods=200))
+        except Exception as error:
+            errors.append(error)
+        finally:
+            connection.close()
+
+    def test_shared_dictionaries(self):
+        # категории уже есть, поэтому загрузки не ждут друг друга на них
+        Category.objects.bulk_create(
+            Category(id=pk, name=f"Категория {pk}") for pk in range(1, 9)
+        )
+        barrier = threading.Barrier(self.workers)
+        errors = []
+        threads = [
+            threading.Thread(target=self.load, args=(barrier, f"Магазин {pk}", errors))
+            for pk in range(self.workers)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(Product.objects.count(), 200)
+        self.assertEqual(Parameter.objects.count(), 2)
+        self.assertEqual(Category.objects.count(), 8)
+        self.assertEqual(CatalogEntry.objects.count(), 200 * self.workers)
+
+
+class CatalogSignalsTest(TestCase):
+    """
+    Правки товаров и параметров, например в админке, попадают в каталог
+    """
+
+    def setUp(self):
+        with open(BASE_DIR / "shop1.yaml", "rb") as stream:
+            import_price_list(stream)
+        self.product_info = ProductInfo.objects.get(external_id=4216292)
+
+    def entry(self):
+        return CatalogEntry.objects.get(product_info=self.product_info)
+
+    def parameters(self):
+        return [item["parameter"] for item in self.entry().parameters]
+
+    def test_product_saved(self):
+        product = self.product_info.product
+        product.name = "Переименованный товар"
+        product.save()
+        self.assertEqual(self.entry().product_name, "Переименованный товар")
+
+    def test_parameter_saved(self):
+        parameter = Parameter.objects.get(name="Цвет")
+        parameter.name = "Оттенок"
+        parameter.save()
+        self.assertIn("Оттенок", self.parameters())
+        names = {
+            item["parameter"]
+            for parameters in CatalogEntry.objects.values_list("parameters", flat=True)
+            for item in parameters
+        }
+        self.assertNotIn("Цвет", names)
+
+    def test_product_parameter_deleted(self):
+        facets = self.entry().facets.count()
+        self.product_info.product_parameters.get(parameter__name="Цвет").delete()
+        self.assertNotIn("Цвет", self.parameters())
+        self.assertEqual(self.entry().facets.count(), facets - 1)
+
+        ProductParameter.objects.filter(product_info=self.product_info).delete()
+        self.assertEqual(self.parameters(), [])
+
+    def test_product_info_deleted(self):
+        self.product_info.delete()
+        self.assertFalse(CatalogEntry.objects.filter(external_id=4216292).exists())
+
+
+class CatalogCacheTest(TestCase):
+    """
+    Кеш ответов каталога сбрасывается после правок каталога
+    """
+
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            with open(BASE_DIR / "shop1.yaml", "rb") as stream:
+                import_price_list(stream)
+        self.product_info = ProductInfo.objects.get(external_id=4216292)
+        self.client = APIClient()
+
+    def names(self):
+        response = self.client.get("/order_service/products", {"page_size": 100})
+        return {item["product"]["name"] for item in response.data["results"]}
+
+    def test_product_rename_invalidates_list(self):
+        product = self.product_info.product
+        self.assertIn(product.name, self.names())
+        hits = cache_stats()["hits"]
+        self.assertIn(product.name, self.names())
+        self.assertEqual(cache_stats()["hits"], hits + 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            product.name = "Переименованный товар"
+            product.save()
+        self.assertIn("Переименованный товар", self.names())
+
+    def test_deletes_bump_version_once(self):
+        version = cache_stats()["version"]
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            ProductParameter.objects.filter(product_info=self.product_info).delete()
+            self.product_info.delete()
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(cache_stats()["version"], version + 1)
+        self.assertEqual(len(self.names()), 3)
+
+    def test_conditional_requests(self):
+        url = "/order_service/products"
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag, modified = response["ETag"], response["Last-Modified"]
+        self.assertNotEqual(self.client.get(url, {"page_size": 1})["ETag"], etag)
+
+        stats = cache_stats()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=modified)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["Last-Modified"], modified)
+        self.assertEqual(cache_stats(), stats)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product_info.price += 1
+            self.product_info.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response["X-Cache"], "MISS")
+
+
+class CatalogSearchTest(TestCase):
+    """
+    Поиск по словам в каталоге
+    """
+
+    def setUp(self):
+        cache.clear()
+        with open(BASE_DIR / "shop1.yaml", "rb") as stream:
+            import_price_list(stream)
+        self.client = APIClient()
+
+    def search(self, keyword, **params):
+        response = self.client.get(
+            "/order_service/products", {"keyword": keyword, **params}
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_keyword_with_facets(self):
+        data = self.search("xr", facets="true")
+        self.assertEqual(data["count"], 3)
+        facets = {facet["parameter"]: facet["values"] for facet in data["facets"]}
+        self.assertEqual(
+            {item["value"]: item["count"] for item in facets["Цвет"]},
+            {"красный": 1, "черный": 1, "синий": 1},
+        )
+        self.assertEqual(
+            sum(item["count"] for item in facets["Встроенная память (Гб)"]), 3
+        )
+
+    def names(self, keyword):
+        return [
+            item["product"]["name"]
+            for item in self.search(keyword, ordering="")["results"]
+        ]
+
+    @skipUnless(connection.vendor == "sqlite", "поиск FTS5")
+    def test_sqlite_prefix_and_ranking(self):
+        records = price_records("Аксессуары", 0, goods=3)
+        for record, name in zip(
+            records[1:], ("Кабель USB", "Кабель USB и кабель Lightning", "Адаптер")
+        ):
+            record["name"] = name
+        import_price_list(jsonl(records))
+
+        self.assertEqual(len(self.names("смартф")), 4)
+        self.assertEqual(
+            self.names("iph xs"), ["Смартфон Apple iPhone XS Max 512GB (золотистый)"]
+        )
+        self.assertEqual(
+            self.names("кабель"), ["Кабель USB и кабель Lightning", "Кабель USB"]
+        )
+        self.assertCountEqual(self.names("кабел usb"), self.names("кабель"))
+        self.assertEqual(self.names("ада"), ["Адаптер"])
+        self.assertEqual(self.names("кабельный"), [])
+
+    def test_like_pattern(self):
+        self.assertEqual(_like_pattern("50%_a\\b"), "%50\\%\\_a\\\\b%")
+
+
+class ProductExportTest(TestCase):
+    """
+    Выгрузка каталога и изменений с since
+    """
+
+    def setUp(self):
+        self.records = price_records("Склад", 0, goods=10)
+        import_price_list(jsonl(self.records))
+        self.client = APIClient()
+
+    def export(self, **params):
+        response = self.client.get(reverse("order_service:products-export"), params)
+        self.assertEqual(response.status_code, 200)
+        content = b"".join(response.streaming_content).decode()
+        return response["X-Export-Timestamp"], content.splitlines()
+
+    def rows(self, **params):
+        since, lines = self.export(**params)
+        return since, {
+            row["id"]: row for row in map(json.loads, lines) if row is not None
+        }
+
+    def age_entries(self):
+        CatalogEntry.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+
+    def test_since_returns_changes_and_tombstones(self):
+        since, rows = self.rows()
+        self.assertEqual(len(rows), 10)
+        self.assertFalse(any(row.get("deleted") for row in rows.values()))
+
+        self.age_entries()
+        records = copy.deepcopy(self.records)
+        records[1]["price"] += 1
+        removed = ProductInfo.objects.get(external_id=records.pop(4)["id"]).id
+        import_price_list(jsonl(records))
+        changed = ProductInfo.objects.get(external_id=0).id
+
+        _, rows = self.rows(since=since)
+        self.assertEqual(sorted(rows), sorted([changed, removed]))
+        self.assertEqual(rows[changed]["price"], records[1]["price"])
+        self.assertEqual(rows[removed]["deleted"], True)
+
+    def test_since_overlaps_previous_export(self):
+        since, _ = self.rows()
+        self.age_entries()
+        # строка транзакции, которая началась до прошлой выгрузки,
+        # а зафиксирована после неё
+        late = ProductInfo.objects.get(external_id=1).id
+        CatalogEntry.objects.filter(product_info_id=late).update(
+            updated_at=datetime.fromisoformat(since) - timedelta(seconds=60)
+        )
+        _, rows = self.rows(since=since)
+        self.assertEqual(list(rows), [late])
+
+    def test_disabled_shop_and_restored_offer(self):
+        since, _ = self.rows()
+        self.age_entries()
+        shop = Shop.objects.get(name="Склад")
+        shop.state = False
+        shop.save()
+        _, rows = self.rows(since=since)
+        self.assertEqual(len(rows), 10)
+        self.assertTrue(all(row["deleted"] for row in rows.values()))
+
+        # предложение снова в каталоге - отметка об удалении не выводится
+        shop.state = True
+        shop.save()
+        pk = CatalogEntry.objects.values_list("pk", flat=True).first()
+        CatalogEntry.objects.filter(pk=pk).delete()
+        refresh_entries([pk])
+        _, rows = self.rows(since=since)
+        self.assertEqual(len(rows), 10)
+        self.assertFalse(any(row.get("deleted") for row in rows.values()))
+
+    def test_csv_tombstone(self):
+        since, _ = self.rows()
+        self.age_entries()
+        pk = CatalogEntry.objects.values_list("pk", flat=True).first()
+        CatalogEntry.objects.filter(pk=pk).delete()
+        _, lines = self.export(type="csv", since=since)
+        header, row = csv.reader(lines)
+        self.assertEqual(header[-1], "deleted")
+        self.assertEqual((row[0], row[1], row[-1]), (str(pk), "", "true"))
+
+    def test_purge_tombstones(self):
+        CatalogEntry.objects.all()[0].delete()
+        CatalogTombstone.objects.update(
+            deleted_at=timezone.now() - timedelta(days=EXPORT_TOMBSTONE_DAYS + 1)
+        )
+        CatalogEntry.objects.all()[0].delete()
+        self.assertEqual(purge_tombstones(), 1)
+        self.assertEqual(CatalogTombstone.objects.count(), 1)
+
+
+class PartnerUpdateTest(TestCase):
+    """
+    Загрузка прайса через partner/update
+    """
+
+    def setUp(self):
+        self.user = User.objects.create(
+            email="shop@example.com", type="shop", is_active=True
+        )
+        self.client = APIClient()
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        self.url = reverse("order_service:partner-update")
+
+    def upload(self, name, content, **flags):
+        response = self.client.post(
+            self.url,
+            {"file": SimpleUploadedFile(name, content), **flags},
+            format="multipart",
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def test_formats(self):
+        records = price_records("Склад", 0, goods=3)
+        lines = [
+            "shop,category_id,category_name,id,model,name,price,price_rrc,quantity,Цвет"
+        ] + [
+            f"Склад,{item['category']},Категория {item['category']},{item['id']},"
+            f"{item['model']},{item['name']},{item['price']},{item['price_rrc']},"
+            f"{item['quantity']},{item['parameters']['Цвет']}"
+            for item in records[1:]
+        ]
+        cases = [
+            ("catalog.csv", "\n".join(lines).encode()),
+            ("catalog.jsonl", jsonl(records).getvalue()),
+            ("catalog", jsonl(records).getvalue()),
+        ]
+        for name, content in cases:
+            data = self.upload(name, content)
+            self.assertEqual(data["Stats"]["product_infos"], 3, name)
+        entries = CatalogEntry.objects.order_by("external_id")
+        self.assertEqual(
+            [entry.product_name for entry in entries],
+            [item["name"] for item in records[1:]],
+        )
+        self.assertEqual(
+            entries[0].parameters[0], {"parameter": "Цвет", "value": "цвет 0"}
+        )
+
+    def test_dry_run_and_profile(self):
+        content = jsonl(price_records("Склад", 0, goods=5)).getvalue()
+        data = self.upload("catalog.jsonl", content, dry_run="true", profile="true")
+        self.assertTrue(data["DryRun"])
+        self.assertEqual((data["Stats"]["created"], data["Stats"]["deleted"]), (5, 0))
+        self.assertLessEqual(
+            {"parse", "categories", "products", "product_infos", "product_parameters"},
+            data["Profile"].keys(),
+        )
+        self.assertEqual(data["Profile"]["product_infos"]["rows"], 5)
+        self.assertGreater(data["Profile"]["product_infos"]["queries"], 0)
+        self.assertFalse(Shop.objects.exists())
+        self.assertFalse(ProductInfo.objects.exists())
+        self.assertFalse(CatalogEntry.objects.exists())
+
+        # dry_run не ставит загрузку в очередь
+        data = self.upload("catalog.jsonl", content, dry_run="true", background="true")
+        self.assertEqual(data["Stats"]["created"], 5)
+        self.assertFalse(ImportJob.objects.exists())
+
+        data = self.upload("catalog.jsonl", content, profile="true")
+        self.assertNotIn("DryRun", data)
+        self.assertEqual(ProductInfo.objects.count(), 5)
+
+
+class CatalogSwapTest(TestCase):
+    """
+    Загрузка с swap строит новую версию каталога и переключает её,
+    прошлые версии удаляет collect_old_versions
+    """
+
+    def setUp(self):
+        self.records = price_records("Склад", 0, goods=5)
+        import_price_list(jsonl(self.records))
+        self.shop = Shop.objects.get(name="Склад")
+        user = User.objects.create(email="buyer@example.com", type="buyer")
+        self.basket, self.placed = [
+            Order.objects.create(user=user, state=state) for state in ("basket", "new")
+        ]
+        for order, external_id in ((self.basket, 0), (self.placed, 1)):
+            OrderItem.objects.create(
+                order=order,
+                product_info=ProductInfo.objects.get(external_id=external_id),
+                quantity=2,
+            )
+        refresh_order_totals([self.basket.id, self.placed.id])
+        self.old = dict(ProductInfo.objects.values_list("external_id", "id"))
+
+    def swap(self):
+        records = copy.deepcopy(self.records)
+        for record in records[1:]:
+            record["price"] += 10
+        import_price_list(jsonl(records), swap=True)
+        return records
+
+    def test_current_returns_live_version(self):
+        self.swap()
+        self.shop.refresh_from_db()
+        self.assertEqual(self.shop.catalog_version, 1)
+        self.assertEqual(ProductInfo.objects.count(), 10)
+        current = ProductInfo.objects.current()
+        self.assertEqual(set(current.values_list("catalog_version", flat=True)), {1})
+        self.assertFalse(current.filter(id__in=self.old.values()).exists())
+        self.assertEqual(
+            set(CatalogEntry.objects.values_list("pk", flat=True)),
+            set(current.values_list("id", flat=True)),
+        )
+
+    def test_swap_drops_basket_items_missing_from_new_version(self):
+        records = [record for record in self.records if record.get("id") != 0]
+        import_price_list(jsonl(records), swap=True)
+        self.assertFalse(self.basket.ordered_items.exists())
+        self.basket.refresh_from_db()
+        self.assertEqual((self.basket.total_sum, self.basket.items_count), (0, 0))
+
+    def test_swap_moves_baskets_and_gc_keeps_ordered_rows(self):
+        records = self.swap()
+        new = ProductInfo.objects.current().get(external_id=0)
+        item = self.basket.ordered_items.get()
+        self.assertEqual(item.product_info_id, new.id)
+        self.basket.refresh_from_db()
+        self.assertEqual(self.basket.total_sum, records[1]["price"] * 2)
+
+        self.assertEqual(collect_old_versions(), 4)
+
+        item = self.placed.ordered_items.get()
+        self.assertEqual(item.product_info_id, self.old[1])
+        self.placed.refresh_from_db()
+        self.assertEqual(self.placed.total_sum, self.records[2]["price"] * 2)
+        self.assertEqual(
+            set(
+                ProductInfo.objects.exclude(catalog_version=1).values_list(
+                    "id", flat=True
+                )
+            ),
+            {self.old[1]},
+        )
+        self.assertEqual(collect_old_versions(), 0)
+
+
+class KeysetPaginationTest(TestCase):
+    """
+    Обход списков по курсору: каждая строка выводится ровно один раз,
+    в том числе при одинаковых значениях ключа сортировки
+    """
+
+    def setUp(self):
+        cache.clear()
+        records = price_records("Склад", 0, goods=40)
+        for record in records[1:]:
+            # много строк с одной ценой
+            record["price"] = 100 + record["id"] % 3 * 10
+        import_price_list(jsonl(records))
+        Shop.objects.bulk_create(Shop(name=f"Магазин {pk:02}") for pk in range(15))
+        self.client = APIClient()
+
+    def traverse(self, url, **params):
+        pages = []
+        response = self.client.get(url, {"cursor": "", "page_size": 7, **params})
+        while True:
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn("count", response.data)
+            pages.append(response.data["results"])
+            if response.data["next"] is None:
+                return [row["id"] for page in pages for row in page], len(pages)
+            response = self.client.get(response.data["next"])
+
+    def test_products(self):
+        entries = CatalogEntry.objects.all()
+        cases = {
+            "price": entries.order_by("price", "pk"),
+            "-price": entries.order_by("-price", "pk"),
+            "": entries.order_by("-model", "pk"),
+        }
+        for ordering, expected in cases.items():
+            ids, pages = self.traverse("/order_service/products", ordering=ordering)
+            self.assertEqual(ids, list(expected.values_list("pk", flat=True)))
+            self.assertEqual(pages, 6)
+
+    def test_shops(self):
+        ids, pages = self.traverse("/order_service/shops")
+        expected = Shop.objects.filter(state=True).order_by("-name", "pk")
+        self.assertEqual(ids, list(expected.values_list("pk", flat=True)))
+        self.assertEqual(pages, 3)
+
+    def test_invalid_cursor(self):
+        response = self.client.get("/order_service/products", {"cursor": "не курсор"})
+        self.assertEqual(response.status_code, 404)
+
+
+class PartnerStockTest(TestCase):
+    """
+    Обновление остатков и цен без загрузки прайса
+    """
+
+    def setUp(self):
+        self.user = User.objects.create(
+            email="shop@example.com", type="shop", is_active=True
+        )
+        with open(BASE_DIR / "shop1.yaml", "rb") as stream:
+            import_price_list(stream, user_id=self.user.id)
+        self.shop = Shop.objects.get(user=self.user)
+        self.client = APIClient()
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        self.url = reverse("order_service:partner-stock")
+
+    def offer(self, external_id):
+        return ProductInfo.objects.current().get(external_id=external_id)
+
+    def test_sync_stock(self):
+        before = self.offer(4216292)
+        stats = sync_stock(
+            self.shop, [(4216292, 3, "", None), ("4216313", "0", "60000", "")]
+        )
+        self.assertEqual(stats, {"rows": 2, "updated": 2, "not_found": 0})
+        offer = self.offer(4216292)
+        self.assertEqual((offer.quantity, offer.price), (3, before.price))
+        offer = self.offer(4216313)
+        self.assertEqual((offer.quantity, offer.price), (0, 60000))
+        entry = CatalogEntry.objects.get(product_info=offer)
+        self.assertEqual((entry.quantity, entry.price), (0, 60000))
+
+        self.assertEqual(sync_stock(self.shop, [(1, 1, None, None)])["not_found"], 1)
+        for rows in ([(4216292, -1, None, None)], [(4216292, 1)], [(4216292, "")]):
+            with self.assertRaises((TypeError, ValueError)):
+                sync_stock(self.shop, rows)
+
+    def test_json_body(self):
+        for data in (
+            {"items": [{"external_id": 4216292, "quantity": 5, "price": 100}]},
+            [[4216292, 6, None, None]],
+        ):
+            response = self.client.post(self.url, data, format="json")
+            self.assertEqual(response.status_code, 200, response.data)
+            self.assertEqual(response.data["Stats"]["updated"], 1)
+        offer = self.offer(4216292)
+        self.assertEqual((offer.quantity, offer.price), (6, 100))
+
+        for data in ("строка", 5, [], {"items": "4216292"}, [[4216292, "x", 1, 1]]):
+            response = self.client.post(self.url, data, format="json")
+            self.assertEqual(response.status_code, 400, data)
+            self.assertFalse(response.data["Status"])
+
+    def test_csv_body(self):
+        for body in (
+            "external_id,quantity,price,price_rrc\n4216292,7,,\n4216313,8,500,600\n",
+            "4216292,7,,\n4216313,8,500,600\n",
+        ):
+            response = self.client.post(
+                self.url, body.encode(), content_type="text/csv"
+            )
+            self.assertEqual(response.data["Stats"]["rows"], 2, response.data)
+        self.assertEqual(self.offer(4216292).quantity, 7)
+        offer = self.offer(4216313)
+        self.assertEqual((offer.quantity, offer.price, offer.price_rrc), (8, 500, 600))
+
+
+def by_id(rows):
+    return sorted(rows, key=lambda row: row["id"])
+
+
+class FastPathTest(TestCase):
+    """
+    Списки через values() должны отдавать тот же JSON, что и сериализаторы
+    """
+
+    def setUp(self):
+        cache.clear()
+        for name in ("shop1.yaml", "shop2.yaml"):
+            with open(BASE_DIR / name, "rb") as stream:
+                import_price_list(stream)
+        self.user = User.objects.create(email="buyer@example.com", type="buyer")
+        contact = Contact.objects.create(
+            user=self.user, city="Москва", street="Тверская", phone="1"
+        )
+        for state, offset in (("new", 0), ("basket", 3)):
+            order = Order.objects.create(user=self.user, state=state, contact=contact)
+            for product_info in ProductInfo.objects.order_by("id")[offset : offset + 3]:
+                OrderItem.objects.create(
+                    order=order, product_info=product_info, quantity=2
+                )
+        self.client = APIClient()
+
+    def assertSameJSON(self, data, expected):
+        render = JSONRenderer().render
+        self.assertEqual(render(data), render(expected))
+
+    def test_catalog_lists(self):
+        cases = [
+            ("categories", CategorySerializer, Category.objects.all()),
+            ("shops", ShopSerializer, Shop.objects.filter(state=True)),
+            ("products", CatalogEntrySerializer, CatalogEntry.objects.all()),
+        ]
+        for url, serializer_class, queryset in cases:
+            response = self.client.get(f"/order_service/{url}", {"page_size": 100})
+            expected = serializer_class(queryset, many=True).data
+            # у предложений разных магазинов модель может совпадать,
+            # а порядок строк с одинаковым ключом в PostgreSQL не определён
+            self.assertSameJSON(by_id(response.data["results"]), by_id(expected))
+
+    def test_products_fields(self):
+        response = self.client.get(
+            "/order_service/products", {"fields": "id,name,price", "page_size": 100}
+        )
+        expected = CatalogEntrySerializer(
+            CatalogEntry.objects.all(),
+            many=True,
+            context={"fields": {"id", "name", "price"}},
+        ).data
+        self.assertSameJSON(by_id(response.data["results"]), by_id(expected))
+
+    def test_orders(self):
+        orders = Order.objects.filter(user=self.user)
+        self.assertSameJSON(
+            order_rows(orders),
+            OrderSerializer(order_relations(orders, {}), many=True).data,
+        )
+
+    def test_compile_mapper(self):
+        spec = (
+            ("id", "pk"),
+            ("item", (("name", "item_name"), ("id", "pk"))),
+            ("price", "price"),
+        )
+        converters = {"price": str}
+        mapper = compile_mapper(spec, converters)
+        self.assertIs(compile_mapper(spec, converters), mapper)
+        self.assertEqual(mapper.columns, ("pk", "item_name", "price"))
+        self.assertEqual(
+            mapper({"pk": 1, "item_name": "Кабель", "price": 100}),
+            {"id": 1, "item": {"name": "Кабель", "id": 1}, "price": "100"},
+        )
+        self.assertEqual(
+            compile_mapper(spec)({"pk": 1, "item_name": "", "price": 5})["price"], 5
+        )
+
+    def test_select_spec(self):
+        names = [name for name, _ in select_spec(CATALOG_SPEC, set(), CATALOG_OPTIONAL)]
+        self.assertEqual(names, list(CatalogEntrySerializer(context={}).fields))
+        spec = select_spec(CATALOG_SPEC, {"price", "name", "unknown"}, CATALOG_OPTIONAL)
+        self.assertEqual([name for name, _ in spec], ["name", "price"])
+        self.assertEqual(
+            select_spec(CATALOG_SPEC, {"unknown"}, CATALOG_OPTIONAL),
+            select_spec(CATALOG_SPEC, None, CATALOG_OPTIONAL),
+        )
+
+    def test_sparse_fields_and_expand(self):
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+
+        def orders(**params):
+            response = self.client.get(reverse("order_service:order"), params)
+            self.assertEqual(response.status_code, 200)
+            [order] = response.data
+            return order
+
+        self.assertEqual(set(orders(fields="id,state")), {"id", "state"})
+
+        order = orders(expand="")
+        self.assertIsInstance(order["contact"], int)
+        self.assertIsInstance(order["ordered_items"][0]["product_info"], int)
+
+        order = orders(expand="contact,product_info,product")
+        self.assertEqual(order["contact"]["city"], "Москва")
+        product_info = order["ordered_items"][0]["product_info"]
+        self.assertIn("product", product_info)
+        self.assertNotIn("product_parameters", product_info)
+
+        order = orders(fields="id,ordered_items", expand="product_info")
+        self.assertEqual(set(order), {"id", "ordered_items"})
+        self.assertNotIn("product", order["ordered_items"][0]["product_info"])
+
+        response = self.client.get("/order_service/products", {"fields": "name,price"})
+        self.assertEqual(set(response.data["results"][0]), {"name", "price"})
+        response = self.client.get("/order_service/products", {"fields": "unknown"})
+        self.assertEqual(
+            set(response.data["results"][0]),
+            set(CatalogEntrySerializer.Meta.fields) - {"name"},
+        )
+
+
+class OrderTotalsTest(TestCase):
+    """
+    Сумма и число товаров заказа хранятся в заказе и обновляются вместе
+    с позициями
+    """
+
+    def setUp(self):
+        with open(BASE_DIR / "shop1.yaml", "rb") as stream:
+            import_price_list(stream)
+        self.shop = Shop.objects.get(name="Связной")
+        self.user = User.objects.create(
+            email="buyer@example.com", type="buyer", is_active=True
+        )
+        Contact.objects.create(
+            user=self.user, city="Москва", street="Тверская", phone="1"
+        )
+        self.client = APIClient()
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        self.product_infos = list(
+            ProductInfo.objects.select_related("product").order_by("id")
+        )
+
+    def assertTotals(self, order, total_sum, items_count):
+        order.refresh_from_db()
+        self.assertEqual((order.total_sum, order.items_count), (total_sum, items_count))
+
+    def test_basket_writes(self):
+        first, second = self.product_infos[:2]
+        url = reverse("order_service:basket")
+        self.client.post(
+            url,
+            {
+                "items": [
+                    {"name": first.product.name, "quantity": 2},
+                    {"name": second.product.name, "quantity": 1},
+                ]
+            },
+            format="json",
+        )
+        basket = Order.objects.get(user=self.user, state="basket")
+        self.assertTotals(basket, first.price * 2 + second.price, 3)
+
+        self.client.put(
+            url, {"items": [{"name": first.product.name, "quantity": 5}]}, format="json"
+        )
+        self.assertTotals(basket, first.price * 5 + second.price, 6)
+
+        self.client.delete(
+            url, {"order_id": basket.id, "items": [second.product.name]}, format="json"
+        )
+        self.assertTotals(basket, first.price * 5, 5)
+
+    def test_price_change_and_backfill(self):
+        product_info = self.product_infos[0]
+        price = product_info.price
+        orders = [
+            Order.objects.create(user=self.user, state=state)
+            for state in ("basket", "new")
+        ]
+        for order in orders:
+            OrderItem.objects.create(order=order, product_info=product_info, quantity=2)
+        refresh_order_totals([order.id for order in orders])
+
+        sync_stock(
+            self.shop,
+            [(product_info.external_id, product_info.quantity, price + 100, None)],
+        )
+        basket, placed = orders
+        self.assertTotals(basket, (price + 100) * 2, 2)
+        self.assertTotals(placed, price * 2, 2)
+
+        Order.objects.update(total_sum=0, items_count=0)
+        call_command("backfill_order_totals", stdout=io.StringIO())
+        self.assertTotals(basket, (price + 100) * 2, 2)
+        self.assertTotals(placed, (price + 100) * 2, 2)
+
+    def test_product_info_save_and_cascade_deletes(self):
+        first, second = self.product_infos[:2]
+        basket, placed = [
+            Order.objects.create(user=self.user, state=state)
+            for state in ("basket", "new")
+        ]
+        for order in (basket, placed):
+            OrderItem.objects.create(order=order, product_info=first, quantity=2)
+            OrderItem.objects.create(order=order, product_info=second, quantity=1)
+        refresh_order_totals([basket.id, placed.id])
+        price = first.price
+
+        first.price += 100
+        first.save()
+        self.assertTotals(basket, first.price * 2 + second.price, 3)
+        self.assertTotals(placed, price * 2 + second.price, 3)
+
+        second.product.delete()
+        self.assertTotals(basket, first.price * 2, 2)
+        self.assertTotals(placed, price * 2, 2)
+
+        self.shop.delete()
+        self.assertTotals(basket, 0, 0)
+        self.assertTotals(placed, 0, 0)
+
+    def test_confirmation_keeps_placed_prices(self):
+        first, second = self.product_infos[:2]
+        order = Order.objects.create(user=self.user, state="new")
+        OrderItem.objects.create(order=order, product_info=first, quantity=2)
+        refresh_order_totals([order.id])
+        price = first.price
+        ProductInfo.objects.filter(id=first.id).update(price=price + 100)
+
+        response = self.client.put(
+            reverse("order_service:update_order"),
+            {
+                "id": order.id,
+                "contact": "1",
+                "items": [{"name": second.product.name, "quantity": 3}],
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTotals(order, price * 2 + second.price * 3, 5)
+
+
+class ProductFilterIndexTest(TestCase):
+    """
+    Фильтры списка товаров должны выбирать строки по частичным индексам
+    """
+
+    def setUp(self):
+        records = [
+            {
+                "shop": "Склад",
+                "categories": [
+                    {"id": pk, "name": f"Категория {pk}"} for pk in range(1, 21)
+                ],
+            }
+        ]
+        for pk in range(2000):
+            records.append(
+                {
+                    "id": pk,
+                    "category": pk % 20 + 1,
+                    "model": f"model-{pk}",
+                    "name": f"Товар {pk}",
+                    "price": pk * 37 % 1000,
+                    "price_rrc": 1000,
+                    "quantity": pk % 3,
+                    "parameters": {},
+                }
+            )
+        stream = io.BytesIO(
+            "\n".join(json.dumps(record) for record in records).encode()
+        )
+        import_price_list(stream, name="catalog.jsonl")
+        self.shop = Shop.objects.get(name="Склад")
+        self.category = Category.objects.get(id=3)
+
+    def assertUsesIndex(self, params, ordering, index):
+        queryset = ProductFilter(
+            params, queryset=CatalogEntry.objects.filter(shop_state=True)
+        ).qs.order_by(ordering, "product_info_id")
+        self.assertIn(index, queryset.explain())
+
+    # на 2000 строках планировщик PostgreSQL выбирает индекс по статистике,
+    # а SQLite - по условиям запроса, поэтому проверяем выбор на SQLite
+    @skipUnless(connection.vendor == "sqlite", "выбор индекса по условиям")
+    def test_filters_use_partial_indexes(self):
+        cases = [
+            ({}, "-model", "catalog_entry_model"),
+            ({"price_min": "100", "price_max": "200"}, "price", "catalog_entry_price"),
+            ({"in_stock": "true"}, "price", "catalog_entry_in_stock"),
+            (
+                {"shop_id": str(self.shop.id), "price_max": "50"},
+                "price",
+                "catalog_entry_shop_price",
+            ),
+            (
+                {"category_id": str(self.category.id)},
+                "price",
+                "catalog_entry_category",
+            ),
+        ]
+        for params, ordering, index in cases:
+            with self.subTest(params=params):
+                self.assertUsesIndex(params, ordering, index)
+
+    def test_filter_values(self):
+        queryset = CatalogEntry.objects.filter(shop_state=True)
+        in_stock = ProductFilter({"in_stock": "true", "price_max": "100"}, queryset)
+        self.assertTrue(in_stock.qs.exists())
+        for entry in in_stock.qs:
+            self.assertGreater(entry.quantity, 0)
+            self.assertLessEqual(entry.price, 100)
+        self.assertEqual(
+            ProductFilter({"in_stock": "false"}, queryset).qs.count(),
+            queryset.filter(quantity=0).count(),
+        )
+        self.assertEqual(
+            ProductFilter({"category_id": "3,4"}, queryset).qs.count(), 200
+        )
+
+
+class OrderIndexTest(TestCase):
+    """
+    Запросы корзины и заказов не должны читать таблицы целиком
+    """
+
+    shops = 50
+    users = 200
+    products = 2000
+
+    def setUp(self):
+        shops = Shop.objects.bulk_create(
+            Shop(name=f"Магазин {pk}") for pk in range(self.shops)
+        )
+        category = Category.objects.create(name="Категория")
+        products = Product.objects.bulk_create(
+            Product(name=f"Товар {pk}", category=category)
+            for pk in range(self.products)
+        )
+        product_infos = ProductInfo.objects.bulk_create(
+            ProductInfo(
+                product=product,
+                shop=shops[pk % self.shops],
+                external_id=pk,
+                quantity=10,
+                price=100,
+                price_rrc=100,
+            )
+            for pk, product in enumerate(products)
+        )
+        users = User.objects.bulk_create(
+            User(email=f"buyer{pk}@example.com", type="buyer")
+            for pk in range(self.users)
+        )
+        orders = Order.objects.bulk_create(
+            Order(user=user, state=state)
+            for user in users
+            for state in ("basket", "new", "confirmed", "delivered", "canceled")
+        )
+        OrderItem.objects.bulk_create(
+            OrderItem(
+                order=order,
+                product_info=product_infos[(pk * 7 + shift) % self.products],
+                quantity=1,
+            )
+            for pk, order in enumerate(orders)
+            for shift in range(3)
+        )
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        self.user = users[self.users // 2]
+        self.product_info = product_infos[self.products // 2]
+        self.basket = orders[self.users // 2 * 5]
+
+    def assertNoFullScan(self, queryset):
+        plan = queryset.explain()
+        if connection.vendor == "postgresql":
+            # маленькую таблицу магазинов в соединении планировщик читает целиком
+            self.assertNotIn(f"Seq Scan on {queryset.model._meta.db_table} ", plan)
+        elif connection.vendor == "sqlite":
+            for line in plan.splitlines():
+                self.assertFalse(
+                    " SCAN " in f" {line} " and " USING " not in line, plan
+                )
+
+    def test_hot_queries_use_indexes(self):
+        queries = {
+            "product": Product.objects.filter(name="Товар 1000"),
+            "product_info": ProductInfo.objects.current().filter(
+                product_id=self.product_info.product_id
+            ),
+            "basket": Order.objects.filter(user_id=self.user.id, state="basket"),
+            "orders": Order.objects.filter(user_id=self.user.id).exclude(
+                state="basket"
+            ),
+            "order_item": OrderItem.objects.filter(
+                order_id=self.basket.id, product_info_id=self.product_info.id
+            ),
+            "basket_items": OrderItem.objects.filter(order_id=self.basket.id),
+        }
+        for name, queryset in queries.items():
+            with self.subTest(name):
+                self.assertNoFullScan(queryset)
+
+
+# Бюджет обращений к базе для каждого адреса API и метода:
+# (число SQL-запросов, число прочитанных строк). Запросы описаны
+# в QueryBudgetTest.requests, данные - в QueryBudgetTest.setUp.
+# Рост чисел в ревью означает лишние запросы, в том числе N+1.
+QUERY_BUDGETS = {
+    ("get", "all-views"): (0, 0),
+    ("post", "user-register"): (6, 2),
+    ("post", "user-login"): (1, 1),
+    ("get", "user-details"): (2, 2),
+    ("put", "user-details"): (3, 1),
+    ("delete", "user-details"): (16, 22),
+    ("get", "user-contact"): (2, 2),
+    ("post", "user-contact"): (4, 4),
+    ("put", "user-contact"): (3, 2),
+    ("delete", "user-contact"): (6, 12),
+    ("post", "password-reset"): (4, 3),
+    ("post", "password-reset-confirm"): (5, 3),
+    ("get", "categories"): (2, 9),
+    ("get", "shops"): (2, 4),
+    ("get", "products"): (4, 33),
+    ("get", "products-export"): (1, 120),
+    ("get", "cache-stats"): (1, 1),
+    ("get", "db-stats"): (1, 1),
+    ("get", "basket"): (5, 12),
+    ("post", "basket"): (22, 16),
+    ("put", "basket"): (30, 12),
+    ("delete", "basket"): (15, 7),
+    ("get", "order"): (5, 92),
+    ("post", "order"): (19, 16),
+    ("delete", "order"): (5, 2),
+    ("get", "update_order"): (5, 92),
+    ("put", "update_order"): (24, 15),
+    ("post", "partner-update"): (12, 220),
+    ("get", "partner-update-status"): (2, 2),
+    ("get", "partner-state"): (2, 2),
+    ("post", "partner-state"): (3, 1),
+    ("post", "partner-stock"): (9, 5),
+    ("get", "partner-orders"): (5, 12),
+}
+
+
+class QueryCounter:
+    """
+    Считаем SQL-запросы и строки, прочитанные из их результатов
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.rows = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries += 1
+        result = execute(sql, params, many, context)
+        wrapper = context["cursor"]
+        if not isinstance(wrapper.cursor, RowCountingCursor):
+            wrapper.cursor = RowCountingCursor(wrapper.cursor, self)
+        return result
+
+
+class RowCountingCursor:
+    """
+    Курсор базы, который считает выбранные строки
+    """
+
+    def __init__(self, cursor, counter):
+        self.cursor = cursor
+        self.counter = counter
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+    def __iter__(self):
+        for row in self.cursor:
+            self.counter.rows += 1
+            yield row
+
+    def fetchone(self):
+        row = self.cursor.fetchone()
+        if row is not None:
+            self.counter.rows += 1
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = self.cursor.fetchmany(*args, **kwargs)
+        self.counter.rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self.cursor.fetchall()
+        self.counter.rows += len(rows)
+        return rows
+
+
+def price_records(shop, offset, goods=40, categories=8):
+    records = [
+        {
+            "shop": shop,
+            "categories": [
+                {"id": pk, "name": f"Категория {pk}"} for pk in range(1, categories + 1)
+            ],
+        }
+    ]
+    for pk in range(offset, offset + goods):
+        records.append(
+            {
+                "id": pk,
+                "category": pk % categories + 1,
+                "model": f"model-{pk}",
+                "name": f"Товар {pk}",
+                "price": pk * 37 % 1000 + 100,
+                "price_rrc": 1500,
+                "quantity": pk % 5,
+                "parameters": {"Цвет": f"цвет {pk % 4}", "Вес": pk % 7},
+            }
+        )
+    return records
+
+
+def jsonl(records):
+    stream = io.BytesIO("\n".join(json.dumps(record) for record in records).encode())
+    stream.name = "catalog.jsonl"
+    return stream
+
+
+def price_list(shop, offset, goods=40, categories=8):
+    return jsonl(price_records(shop, offset, goods, categories))
+
+
+class QueryBudgetTest(TestCase):
+    """
+    Каждый адрес API укладывается в бюджет запросов из QUERY_BUDGETS
+    """
+
+    password = "Kx7-budget-Pass"
+
+    def setUp(self):
+        cache.clear()
+        self.shops = []
+        for pk in range(3):
+            user = User.objects.create(
+                email=f"shop{pk}@example.com", type="shop", is_active=True
+            )
+            import_price_list(price_list(f"Магазин {pk}", pk * 1000), user.id)
+            self.shops.append(user)
+        self.buyer = User.objects.create(
+            email="buyer@example.com", type="buyer", is_active=True
+        )
+        self.buyer.set_password(self.password)
+        self.buyer.save()
+        self.admin = User.objects.create(
+            email="admin@example.com", type="buyer", is_staff=True
+        )
+        self.contacts = [
+            Contact.objects.create(
+                user=self.buyer, city="Москва", street="Тверская", phone=str(pk)
+            )
+            for pk in range(1)
+        ]
+        product_infos = list(ProductInfo.objects.order_by("id"))
+        self.orders = []
+        for pk in range(10):
+            order = Order.objects.create(
+                user=self.buyer,
+                state="basket" if pk == 0 else "new",
+                contact=self.contacts[0],
+            )
+            OrderItem.objects.bulk_create(
+                OrderItem(order=order, product_info=product_info, quantity=2)
+                for product_info in product_infos[pk * 3 : pk * 3 + 3]
+            )
+            self.orders.append(order)
+        self.job = ImportJob.objects.create(user=self.shops[0], file="imports/x.yaml")
+        self.reset_token = ResetPasswordToken.objects.create(user=self.buyer)
+
+    def requests(self):
+        """
+        Запросы к каждому адресу: (пользователь, параметры или тело запроса)
+        """
+        buyer, shop = self.buyer, self.shops[0]
+        items = [
+            {"name": "Товар 30", "quantity": 3},
+            {"name": "Товар 1031", "quantity": 1},
+        ]
+        return {
+            ("get", "all-views"): (None, {}),
+            ("post", "user-register"): (
+                None,
+                {
+                    "first_name": "Иван",
+                    "last_name": "Иванов",
+                    "email": "new@example.com",
+                    "password": self.password,
+                    "company": "ООО",
+                    "position": "менеджер",
+                },
+            ),
+            ("post", "user-login"): (
+                None,
+                {"email": buyer.email, "password": self.password},
+            ),
+            ("get", "user-details"): (buyer, {}),
+            ("put", "user-details"): (buyer, {"first_name": "Пётр", "type": "buyer"}),
+            ("delete", "user-details"): (buyer, {}),
+            ("get", "user-contact"): (buyer, {}),
+            ("post", "user-contact"): (
+                buyer,
+                {"city": "Казань", "street": "Баумана", "phone": "9"},
+            ),
+            ("put", "user-contact"): (
+                buyer,
+                {"id": self.contacts[0].id, "city": "Тула"},
+            ),
+            ("delete", "user-contact"): (buyer, {"items": [self.contacts[0].id]}),
+            ("post", "password-reset"): (None, {"email": buyer.email}),
+            ("post", "password-reset-confirm"): (
+                None,
+                {"token": self.reset_token.key, "password": "Zq8-another-Pass"},
+            ),
+            ("get", "categories"): (None, {}),
+            ("get", "shops"): (None, {}),
+            ("get", "products"): (
+                None,
+                {"price_max": "800", "in_stock": "true", "facets": "true"},
+            ),
+            ("get", "products-export"): (None, {}),
+            ("get", "cache-stats"): (self.admin, {}),
+            ("get", "db-stats"): (self.admin, {}),
+            ("get", "basket"): (buyer, {}),
+            ("post", "basket"): (buyer, {"items": items}),
+            ("put", "basket"): (buyer, {"items": items}),
+            ("delete", "basket"): (
+                buyer,
+                {"order_id": self.orders[0].id, "items": ["Товар 0", "Товар 1"]},
+            ),
+            ("get", "order"): (buyer, {}),
+            ("post", "order"): (
+                buyer,
+                {
+                    "contact": [
+                        {
+                            "phone": "0",
+                            "city": "Москва",
+                            "street": "Тверская",
+                            "house": "",
+                            "apartment": "",
+                        }
+                    ],
+                    "items": items,
+                },
+            ),
+            ("delete", "order"): (buyer, {"items": [self.orders[1].id]}),
+            ("get", "update_order"): (buyer, {}),
+            ("put", "update_order"): (
+                buyer,
+                {"id": self.orders[2].id, "contact": "0", "items": items},
+            ),
+            ("post", "partner-update"): (
+                shop,
+                {"file": price_list("Магазин 0", 0)},
+            ),
+            ("get", "partner-update-status"): (shop, {}),
+            ("get", "partner-state"): (shop, {}),
+            ("post", "partner-state"): (shop, {"state": "false"}),
+            ("post", "partner-stock"): (
+                shop,
+                {
+                    "items": [
+                        {"external_id": 1, "quantity": 0},
+                        {"external_id": 2, "quantity": 5, "price": 10},
+                    ]
+                },
+            ),
+            ("get", "partner-orders"): (shop, {}),
+        }
+
+    def url(self, name):
+        kwargs = {"job_id": self.job.id} if name == "partner-update-status" else {}
+        return reverse(f"order_service:{name}", kwargs=kwargs)
+
+    def call(self, method, name, user, data):
+        client = APIClient()
+        if user is not None:
+            token, _ = Token.objects.get_or_create(user=user)
+            client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        url = self.url(name)
+        cache.clear()
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            if method == "get":
+                response = client.get(url, data)
+            else:
+                data_format = "multipart" if "file" in data else "json"
+                response = getattr(client, method)(url, data, format=data_format)
+            if response.streaming:
+                content = b"".join(response.streaming_content)
+            else:
+                content = response.content
+        return response, content, counter
+
+    def test_every_endpoint_has_budget(self):
+        endpoints = {
+            (method, pattern.name)
+            for pattern in urlpatterns
+            for method in ("get", "post", "put", "patch", "delete")
+            if hasattr(pattern.callback.cls, method)
+        }
+        self.assertEqual(endpoints, set(QUERY_BUDGETS))
+        self.assertEqual(endpoints, set(self.requests()))
+
+    def test_query_budgets(self):
+        for (method, name), (user, data) in self.requests().items():
+            with self.subTest(f"{method.upper()} {name}"):
+                with transaction.atomic():
+                    response, content, counter = self.call(method, name, user, data)
+                    transaction.set_rollback(True)
+                self.assertLess(response.status_code, 400, content[:300])
+                self.assertNotIn(b'"Status":false', content[:300])
+                queries, rows = QUERY_BUDGETS[method, name]
+                self.assertLessEqual(counter.queries, queries, "SQL-запросов")
+                self.assertLessEqual(counter.rows, rows, "прочитанных строк")
+
+
+@skipUnless(connection.vendor == "sqlite", "реплика - вторая база SQLite")
+class ReplicaRoutingTest(TestCase):
+    """
+    Каталог и история заказов читаются с реплики, после записи клиент
+    читает с основной базы. Реплику заменяет вторая база SQLite
+    без репликации, поэтому по ответу видно, откуда прочитаны данные.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        descriptor, cls.replica_name = tempfile.mkstemp(suffix=".sqlite3")
+        os.close(descriptor)
+        connections.settings["replica"] = {
+            **connections.settings["default"],
+            "NAME": cls.replica_name,
+        }
+        call_command("migrate", database="replica", verbosity=0)
+        cls.replica_settings = override_settings(
+            DATABASE_REPLICAS=["replica"], REPLICA_STICKY_SECONDS=5
+        )
+        cls.replica_settings.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.replica_settings.disable()
+        connections["replica"].close()
+        del connections["replica"]
+        del connections.settings["replica"]
+        os.remove(cls.replica_name)
+        super().tearDownClass()
+
+    def setUp(self):
+        replica = transaction.atomic(using="replica")
+        replica.__enter__()
+        self.addCleanup(replica.__exit__, None, None, None)
+        self.addCleanup(transaction.set_rollback, True, using="replica")
+
+        cache.clear()
+        Category.objects.create(name="Основная")
+        Category.objects.using("replica").create(name="Реплика")
+        self.buyer = User.objects.create(email="buyer@example.com", type="buyer")
+        token = Token.objects.create(user=self.buyer)
+        User.objects.using("replica").create(
+            id=self.buyer.id, email=self.buyer.email, type="buyer"
+        )
+        Token.objects.using("replica").create(key=token.key, user_id=self.buyer.id)
+        Order.objects.create(user=self.buyer, state="new")
+        self.authorization = f"Token {token.key}"
+
+    def client_for(self, authorization=None):
+        client = APIClient()
+        if authorization:
+            client.credentials(HTTP_AUTHORIZATION=authorization)
+        return client
+
+    def category_names(self, client):
+        cache.clear()
+        response = client.get(reverse("order_service:categories"))
+        return [category["name"] for category in response.json()["results"]]
+
+    def order_count(self, client):
+        return len(client.get(reverse("order_service:order")).json())
+
+    def test_safe_reads_go_to_replica(self):
+        client = self.client_for(self.authorization)
+        self.assertEqual(self.category_names(client), ["Реплика"])
+        self.assertEqual(self.order_count(client), 0)
+
+        response = client.get(reverse("order_service:user-contact"))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_client_reads_own_writes(self):
+        client = self.client_for(self.authorization)
+        response = client.post(
+            reverse("order_service:user-contact"),
+            {"city": "Москва", "street": "Тверская", "phone": "1"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.cookies[PIN_COOKIE]["max-age"], 5)
+
+        # тот же клиент по токену без cookie и по cookie
+        self.assertEqual(self.order_count(self.client_for(self.authorization)), 1)
+        self.assertEqual(self.category_names(client), ["Основная"])
+        # остальные клиенты читают с реплики
+        self.assertEqual(self.category_names(self.client_for()), ["Реплика"])
+        # отметка в кеше истекла (category_names очищает кеш)
+        self.assertEqual(self.order_count(self.client_for(self.authorization)), 0)
+
+
+class FakeConnection:
+    """
+    Соединение psycopg2 без сервера: только то, что использует пул
+    """
+
+    def __init__(self):
+        self.closed = 0
+        self.rollbacks = 0
+        self.info = SimpleNamespace(
+            transaction_status=extensions.TRANSACTION_STATUS_IDLE
+        )
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.info.transaction_status = extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+
+class ConnectionPoolTest(SimpleTestCase):
+    def test_connections_are_reused_and_reset(self):
+        pool = ConnectionPool(size=2, max_age=600, timeout=1)
+        connection = pool.checkout(FakeConnection)
+        connection.info.transaction_status = extensions.TRANSACTION_STATUS_INTRANS
+        pool.checkin(connection)
+        self.assertEqual(connection.rollbacks, 1)
+        self.assertIs(pool.checkout(FakeConnection), connection)
+
+        pool.checkin(connection, broken=True)
+        self.assertTrue(connection.closed)
+        self.assertIsNot(pool.checkout(FakeConnection), connection)
+        stats = pool.snapshot()
+        self.assertEqual(
+            (stats["checkouts"], stats["connects"], stats["reconnects"]), (3, 2, 1)
+        )
+        self.assertEqual((stats["in_use"], stats["saturation"]), (1, 0.5))
+
+    def test_expired_connections_are_replaced(self):
+        pool = ConnectionPool(size=1, max_age=0, timeout=1)
+        connection = pool.checkout(FakeConnection)
+        time.sleep(0.01)
+        pool.checkin(connection)
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.snapshot()["expired"], 1)
+        self.assertEqual(pool.snapshot()["opened"], 0)
+
+    def test_checkout_waits_for_free_connection(self):
+        pool = ConnectionPool(size=1, max_age=600, timeout=0.05)
+        connection = pool.checkout(FakeConnection)
+        with self.assertRaises(PoolTimeout):
+            pool.checkout(FakeConnection)
+
+        pool.timeout = 5
+        threading.Timer(0.05, pool.checkin, [connection]).start()
+        self.assertIs(pool.checkout(FakeConnection), connection)
+        stats = pool.snapshot()
+        self.assertEqual((stats["waits"], stats["timeouts"]), (1, 1))
+        self.assertGreater(stats["max_wait_ms"], 40)
@@ -0,0 +1,83 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import (
+    F,
+    OuterRef,
+    PositiveIntegerField,
+    Subquery,
+    Sum,
+    Value,
+)
+from django.db.models.functions import Coalesce, Greatest
+
+from order_service.models import Order, OrderItem
+
+TOTALS_BATCH_SIZE = getattr(settings, "IMPORT_BATCH_SIZE", 1000)
+
+
+def _items_sum(expression):
+    return Coalesce(
+        Subquery(
+            OrderItem.objects.filter(order_id=OuterRef("pk"))
+            .order_by()
+            .values("order_id")
+            .annotate(value=Sum(expression))
+            .values("value")
+        ),
+        0,
+        output_field=PositiveIntegerField(),
+    )
+
+
+def refresh_order_totals(order_ids, batch_size=None):
+    """
+    Пересчитываем сохранённые сумму и число товаров заказов.
+
+    Вызывается в одной транзакции с изменением позиций заказов. Строки
+    заказов блокируются перед пересчётом, чтобы параллельные изменения
+    одного заказа не затёрли сумму друг друга. Возвращаем число
+    обновлённых заказов.
+    """
+    order_ids = sorted(set(order_ids))
+    batch_size = batch_size or TOTALS_BATCH_SIZE
+    updated = 0
+    with transaction.atomic(savepoint=False):
+        for start in range(0, len(order_ids), batch_size):
+            chunk = order_ids[start : start + batch_size]
+            list(
+                Order.objects.select_for_update()
+                .filter(id__in=chunk)
+                .order_by("id")
+                .values_list("id", flat=True)
+            )
+            updated += Order.objects.filter(id__in=chunk).update(
+                total_sum=_items_sum(F("quantity") * F("product_info__price")),
+                items_count=_items_sum("quantity"),
+            )
+    return updated
+
+
+def refresh_basket_totals(product_info_ids, batch_size=None):
+    """
+    Пересчитываем корзины с карточками товаров, у которых изменилась цена.
+    Оформленные заказы сохраняют сумму на момент оформления.
+    """
+    return refresh_order_totals(
+        OrderItem.objects.filter(
+            order__state="basket", product_info_id__in=product_info_ids
+        ).values_list("order_id", flat=True),
+        batch_size,
+    )
+
+
+def adjust_order_totals(order_id, quantity, price):
+    """
+    Меняем сохранённые сумму и число товаров оформленного заказа
+    на quantity единиц по цене price, quantity может быть отрицательным.
+    Остальные позиции не пересчитываются и сохраняют цены
+    на момент оформления.
+    """
+    return Order.objects.filter(id=order_id).update(
+        total_sum=Greatest(F("total_sum") + quantity * price, Value(0)),
+        items_count=Greatest(F("items_count") + quantity, Value(0)),
+    )
@@ -8,16 +8,21 @@ from django.conf.urls.static import static
 
 from order_service.views import (
     PartnerUpdate,
+    PartnerUpdateStatus,
     RegisterAccount,
     LoginAccount,
     CategoryView,
     ShopView,
     ProductInfoView,
+    CatalogCacheStats,
+    DatabasePoolStats,
+    ProductExport,
     BasketView,
     AccountDetails,
     ContactView,
     OrderConfirmationView,
     PartnerState,
+    PartnerStock,
     PartnerOrders,
     OrderView,
     AllViews,
@@ -26,7 +31,13 @@ from order_service.views import (
 app_name = "order_service"
 urlpatterns = [
     path("partner/update", PartnerUpdate.as_view(), name="partner-update"),
+    path(
+        "partner/update/<int:job_id>",
+        PartnerUpdateStatus.as_view(),
+        name="partner-update-status",
+    ),
     path("partner/state", PartnerState.as_view(), name="partner-state"),
+    path("partner/stock", PartnerStock.as_view(), name="partner-stock"),
     path("partner/orders", PartnerOrders.as_view(), name="partner-orders"),
     path("user/register", RegisterAccount.as_view(), name="user-register"),
     path("user/details", AccountDetails.as_view(), name="user-details"),
@@ -41,6 +52,9 @@ urlpatterns = [
     path("categories", CategoryView.as_view(), name="categories"),
     path("shops", ShopView.as_view(), name="shops"),
     path("products", ProductInfoView.as_view(), name="products"),
+    path("products/export", ProductExport.as_view(), name="products-export"),
+    path("cache/stats", CatalogCacheStats.as_view(), name="cache-stats"),
+    path("db/stats", DatabasePoolStats.as_view(), name="db-stats"),
     path("basket", BasketView.as_view(), name="basket"),
     path("order", OrderView.as_view(), name="order"),
     path("update_order", OrderConfirmationView.as_view(), name="update_order"),
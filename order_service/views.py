@@ -8,15 +8,35 @@ from django.core.exceptions import ValidationError, ObjectDoesNotExist
 from rest_framework.filters import OrderingFilter
 
 from order_service.filters import OrderFilter, CategoryFilter, ShopFilter, ProductFilter
+from order_service.exports import EXPORTS, changed_since
+from order_service.facets import facet_counts
+from order_service.importers import import_price_list, sync_stock
+from order_service.mappers import (
+    CATALOG_OPTIONAL,
+    CATALOG_SPEC,
+    CATEGORY_SPEC,
+    SHOP_SPEC,
+    ValuesListMixin,
+    order_rows,
+    select_spec,
+)
+from order_service.parsers import CSVParser
+from order_service.jobs import get_progress
+from order_service.caching import CachedListMixin, bump_catalog_version, cache_stats
 from django_filters import rest_framework as filters
-from rest_framework.parsers import MultiPartParser
-import yaml
+from rest_framework.parsers import MultiPartParser, JSONParser
 from django.db import IntegrityError
-from django.db.models import Q, Sum, F
+from django.db.models import Q
+from django.db.models.functions import Now
 from rest_framework.authtoken.models import Token
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.db import transaction
-from rest_framework.pagination import PageNumberPagination
+from order_service.pagination import CustomPagination, KeysetPagination
+from order_service.pooling import pool_stats
+from order_service.replicas import ReplicaReadMixin
+from order_service.totals import adjust_order_totals, refresh_order_totals
 from rest_framework.generics import ListAPIView
 from rest_framework.response import Response
 from rest_framework.authentication import TokenAuthentication
@@ -26,29 +46,60 @@ from order_service.models import (
     Category,
     Product,
     ProductInfo,
-    Parameter,
-    ProductParameter,
     Order,
     OrderItem,
     Contact,
+    ImportJob,
+    CatalogEntry,
     USER_TYPE_CHOICES,
 )
 from order_service.serializers import (
     UserSerializer,
     CategorySerializer,
     ShopSerializer,
-    ProductInfoSerializer,
     OrderItemSerializer,
     OrderSerializer,
     ContactSerializer,
+    ImportJobSerializer,
+    CatalogEntrySerializer,
 )
 from order_service.signals import new_user_registered, new_order, updated_order
 
 
-class CustomPagination(PageNumberPagination):
-    page_size = 10
-    page_size_query_param = "page_size"
-    max_page_size = 100
+def sparse_context(request):
+    """
+    Разбираем параметры fields и expand запроса для контекста сериализатора
+    """
+    context = {}
+    for name in ("fields", "expand"):
+        value = request.query_params.get(name)
+        if value is not None:
+            context[name] = {item.strip() for item in value.split(",") if item.strip()}
+    return context
+
+
+def order_relations(queryset, context):
+    """
+    Подгружаем только те связи заказов, которые попадут в ответ
+    """
+    fields = context.get("fields")
+    if not fields or not fields & set(OrderSerializer.Meta.fields):
+        fields = set(OrderSerializer.Meta.fields)
+    expand = context.get("expand")
+
+    if "contact" in fields and (expand is None or "contact" in expand):
+        queryset = queryset.select_related("contact")
+    if "ordered_items" not in fields:
+        return queryset
+    if expand is not None and "product_info" not in expand:
+        return queryset.prefetch_related("ordered_items")
+
+    prefetch = ["ordered_items__product_info__shop"]
+    if expand is None or "product" in expand:
+        prefetch.append("ordered_items__product_info__product__category")
+    if expand is None or "product_parameters" in expand:
+        prefetch.append("ordered_items__product_info__product_parameters__parameter")
+    return queryset.prefetch_related(*prefetch)
 
 
 class AllViews(APIView):
@@ -178,56 +229,144 @@ class RegisterAccount(APIView):
         )
 
 
-class CategoryView(ListAPIView):
+class CategoryView(ReplicaReadMixin, CachedListMixin, ValuesListMixin, ListAPIView):
     """
     Класс для просмотра категорий
     """
 
     serializer_class = CategorySerializer
+    values_spec = CATEGORY_SPEC
     filter_backends = (filters.DjangoFilterBackend,)
     filterset_class = CategoryFilter
     queryset = Category.objects.all()
     pagination_class = CustomPagination
 
 
-class ShopView(ListAPIView):
+class ShopView(ReplicaReadMixin, CachedListMixin, ValuesListMixin, ListAPIView):
     """
     Класс для просмотра списка магазинов
     """
 
     serializer_class = ShopSerializer
+    values_spec = SHOP_SPEC
     filter_backends = (filters.DjangoFilterBackend,)
     filterset_class = ShopFilter
     queryset = Shop.objects.filter(state=True)
-    pagination_class = CustomPagination
+    pagination_class = KeysetPagination
 
 
-class ProductInfoView(ListAPIView):
+class ProductInfoView(ReplicaReadMixin, CachedListMixin, ValuesListMixin, ListAPIView):
     """
     Класс для поиска товаров
     """
 
-    queryset = ProductInfo.objects.filter(shop__state=True)
-    serializer_class = ProductInfoSerializer
+    queryset = CatalogEntry.objects.filter(shop_state=True)
+    serializer_class = CatalogEntrySerializer
     filterset_class = ProductFilter
     filter_backends = [DjangoFilterBackend, OrderingFilter]
     ordering_fields = ["price"]
-    pagination_class = CustomPagination
+    pagination_class = KeysetPagination
+
+    def filter_queryset(self, queryset):
+        self.filtered_queryset = super().filter_queryset(queryset)
+        fields = sparse_context(self.request).get("fields")
+        columns = CatalogEntrySerializer.columns
+        if fields and fields & columns.keys():
+            return self.filtered_queryset.only(
+                *{
+                    column
+                    for name in fields & columns.keys()
+                    for column in columns[name]
+                }
+            )
+        return self.filtered_queryset
 
-    def get_queryset(self):
-        queryset = super().get_queryset()
-        shop_id = self.request.query_params.get("shop_id")
-        category_id = self.request.query_params.get("category_id")
+    def get_serializer_context(self):
+        return {**super().get_serializer_context(), **sparse_context(self.request)}
+
+    def get_values_spec(self):
+        fields = sparse_context(self.request).get("fields")
+        return select_spec(CATALOG_SPEC, fields, CATALOG_OPTIONAL)
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        try:
+            with_facets = strtobool(self.request.query_params.get("facets", "false"))
+        except ValueError:
+            with_facets = False
+        if with_facets:
+            response.data["facets"] = facet_counts(self.filtered_queryset)
+        return response
+
+
+class ProductExport(APIView):
+    """
+    Класс для выгрузки всех активных предложений каталога потоком
+    в формате JSON Lines (type=ndjson) или CSV (type=csv).
+    С since выгружаются только строки, изменённые после этого времени
+    (с перекрытием EXPORT_SINCE_OVERLAP), и отметки об удалённых.
+    """
 
-        if shop_id:
-            queryset = queryset.filter(shop_id=shop_id)
+    def get(self, request):
+        export_type = request.query_params.get("type", "ndjson")
+        if export_type not in EXPORTS:
+            return JsonResponse(
+                {"Status": False, "Errors": "Формат выгрузки: ndjson или csv"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
-        if category_id:
-            queryset = queryset.filter(product__category_id=category_id)
+        started = timezone.now()
+        queryset = CatalogEntry.objects.filter(shop_state=True)
+        since = request.query_params.get("since")
+        if since:
+            # незакодированный "+" часового пояса приходит в адресе пробелом
+            since = parse_datetime(since.replace(" ", "+"))
+            if since is None:
+                return JsonResponse(
+                    {"Status": False, "Errors": "Неверный формат since"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+            queryset, deleted = changed_since(since)
+        else:
+            deleted = ()
 
-        return queryset.select_related("shop", "product__category").prefetch_related(
-            "product_parameters__parameter"
+        lines, content_type = EXPORTS[export_type]
+        response = StreamingHttpResponse(
+            lines(queryset, deleted), content_type=content_type
         )
+        # время начала выгрузки - значение since для следующей выгрузки
+        response["X-Export-Timestamp"] = started.isoformat()
+        return response
+
+
+class CatalogCacheStats(APIView):
+    """
+    Класс для просмотра счётчиков кеша каталога
+    """
+
+    authentication_classes = [TokenAuthentication]
+
+    def get(self, request):
+        if not request.user.is_authenticated or not request.user.is_staff:
+            return JsonResponse({"Status": False}, status=status.HTTP_403_FORBIDDEN)
+
+        return Response({"Status": True, **cache_stats()})
+
+
+class DatabasePoolStats(APIView):
+    """
+    Класс для просмотра счётчиков пула соединений с базой
+    """
+
+    authentication_classes = [TokenAuthentication]
+
+    def get(self, request):
+        if not request.user.is_authenticated or not request.user.is_staff:
+            return JsonResponse({"Status": False}, status=status.HTTP_403_FORBIDDEN)
+
+        return Response({"Status": True, **pool_stats()})
 
 
 class BasketView(APIView):
@@ -238,20 +377,9 @@ class BasketView(APIView):
     authentication_classes = [TokenAuthentication]
 
     @staticmethod
-    def get_basket(user_id):
-        return (
-            Order.objects.filter(user_id=user_id, state="basket")
-            .prefetch_related(
-                "ordered_items__product_info__product__category",
-                "ordered_items__product_info__product_parameters__parameter",
-            )
-            .annotate(
-                total_sum=Sum(
-                    F("ordered_items__quantity")
-                    * F("ordered_items__product_info__price")
-                )
-            )
-            .distinct()
+    def get_basket(user_id, context):
+        return order_relations(
+            Order.objects.filter(user_id=user_id, state="basket"), context
         )
 
     def get(self, request):
@@ -261,8 +389,11 @@ class BasketView(APIView):
                 status=status.HTTP_403_FORBIDDEN,
             )
 
-        basket = self.get_basket(request.user.id)
-        serializer = OrderSerializer(basket, many=True)
+        context = sparse_context(request)
+        basket = self.get_basket(request.user.id, context)
+        if not context:
+            return Response(order_rows(basket))
+        serializer = OrderSerializer(basket, many=True, context=context)
         return Response(serializer.data)
 
     @staticmethod
@@ -295,7 +426,7 @@ class BasketView(APIView):
 
             if product_name is not None and quantity is not None:
                 product = Product.objects.get(name=product_name).id
-                product_id = ProductInfo.objects.get(product_id=product).id
+                product_id = ProductInfo.objects.current().get(product_id=product).id
 
                 order_item_data = {
                     "order": basket.id,
@@ -306,7 +437,9 @@ class BasketView(APIView):
                 serializer = OrderItemSerializer(data=order_item_data)
                 if serializer.is_valid():
                     try:
-                        serializer.save()
+                        with transaction.atomic():
+                            serializer.save()
+                            refresh_order_totals([basket.id])
                     except IntegrityError as error:
                         return Response(
                             {"Status": False, "Errors": str(error)},
@@ -353,10 +486,13 @@ class BasketView(APIView):
         for product_name in items_list:
             try:
                 product = Product.objects.get(name=product_name).id
-                product_info = ProductInfo.objects.get(product_id=product).id
-                deleted_count = order_items_to_delete.filter(
-                    product_info_id=product_info
-                ).delete()[0]
+                product_info = ProductInfo.objects.current().get(product_id=product).id
+                with transaction.atomic():
+                    deleted_count = order_items_to_delete.filter(
+                        product_info_id=product_info
+                    ).delete()[0]
+                    if deleted_count:
+                        refresh_order_totals([order_id])
                 objects_deleted += deleted_count
             except ObjectDoesNotExist:
                 return Response(
@@ -407,13 +543,17 @@ class BasketView(APIView):
 
                 try:
                     product = Product.objects.get(name=product_name).id
-                    product_id = ProductInfo.objects.get(product_id=product).id
-                    order_item_obj, created = OrderItem.objects.update_or_create(
-                        order=basket,
-                        product_info_id=product_id,
-                        defaults={"quantity": new_quantity},
+                    product_id = (
+                        ProductInfo.objects.current().get(product_id=product).id
                     )
-                    order_item_obj.save()
+                    with transaction.atomic():
+                        order_item_obj, created = OrderItem.objects.update_or_create(
+                            order=basket,
+                            product_info_id=product_id,
+                            defaults={"quantity": new_quantity},
+                        )
+                        order_item_obj.save()
+                        refresh_order_totals([basket.id])
                     objects_updated += 1
                 except ObjectDoesNotExist:
                     return Response({"Status": False, "Errors": "Заказ не найден"})
@@ -421,7 +561,7 @@ class BasketView(APIView):
         return Response({"Status": True, "Обновлено объектов": objects_updated})
 
 
-class OrderView(APIView):
+class OrderView(ReplicaReadMixin, APIView):
     """
     Класс для получения, размещения и удаления заказов пользователями
     """
@@ -433,28 +573,19 @@ class OrderView(APIView):
     pagination_class = CustomPagination
     authentication_classes = [TokenAuthentication]
 
-    def get_queryset(self):
-        return (
-            Order.objects.filter(user_id=self.request.user.id)
-            .exclude(state="basket")
-            .prefetch_related(
-                "ordered_items__product_info__product__category",
-                "ordered_items__product_info__product_parameters__parameter",
-            )
-            .select_related("contact")
-            .annotate(
-                total_sum=Sum(
-                    F("ordered_items__quantity")
-                    * F("ordered_items__product_info__price")
-                )
-            )
-            .distinct()
+    def get_queryset(self, context=None):
+        return order_relations(
+            Order.objects.filter(user_id=self.request.user.id).exclude(state="basket"),
+            context or {},
         )
 
     def get(self, request):
         if request.user.is_authenticated:
-            queryset = self.get_queryset()
-            serializer = OrderSerializer(queryset, many=True)
+            context = sparse_context(request)
+            queryset = self.get_queryset(context)
+            if not context:
+                return Response(order_rows(queryset))
+            serializer = OrderSerializer(queryset, many=True, context=context)
             return Response(serializer.data)
         else:
             return Response({"Status": False, "Error": "Log in required"}, status=403)
@@ -493,7 +624,9 @@ class OrderView(APIView):
                         product_name = item["name"]
                         product_quantity = item["quantity"]
                         product = Product.objects.get(name=product_name)
-                        product_info = ProductInfo.objects.get(product=product)
+                        product_info = ProductInfo.objects.current().get(
+                            product=product
+                        )
                         product_id = Product.objects.get(name=product_name).id
 
                         OrderItem.objects.create(
@@ -501,7 +634,11 @@ class OrderView(APIView):
                             product_info=product_info,
                             quantity=product_quantity,
                         )
-                        shop = ProductInfo.objects.get(product_id=product_id).shop_id
+                        shop = (
+                            ProductInfo.objects.current()
+                            .get(product_id=product_id)
+                            .shop_id
+                        )
                         shop1 = Shop.objects.get(id=shop)
                         admin_email = shop1.admin_email
                         if admin_email:
@@ -512,6 +649,8 @@ class OrderView(APIView):
                                 admin_emails=[admin_email],
                             )
 
+                    refresh_order_totals([order.id])
+
                     base_url = request.build_absolute_uri("/")
                     order_url = f"{base_url}order_service/order"
                     order_id = order.id
@@ -552,8 +691,8 @@ class OrderView(APIView):
                     objects_deleted = True
 
             if objects_deleted:
+                # позиции удаляются вместе с заказами
                 deleted_count = Order.objects.filter(query).delete()[0]
-                OrderItem.objects.filter(order_id__in=items_list).delete()
                 return Response(
                     {"Status": True, "Заказ удалён. Удалено объектов": deleted_count}
                 )
@@ -576,24 +715,19 @@ class OrderConfirmationView(APIView):
             Order.objects.filter(user=self.request.user)
             .exclude(state="basket")
             .select_related("contact")
-            .annotate(
-                total_sum=Sum(
-                    F("ordered_items__quantity")
-                    * F("ordered_items__product_info__price")
-                )
-            )
-            .distinct()
         )
 
     def get(self, request):
         if not request.user.is_authenticated:
             return Response({"Status": False, "Error": "Log in required"}, status=403)
-        orders = (
-            Order.objects.filter(user=self.request.user)
-            .exclude(state="basket")
-            .select_related("contact")
+        context = sparse_context(request)
+        orders = order_relations(
+            Order.objects.filter(user=self.request.user).exclude(state="basket"),
+            context,
         )
-        serializer = OrderSerializer(orders, many=True)
+        if not context:
+            return Response(order_rows(orders))
+        serializer = OrderSerializer(orders, many=True, context=context)
         return Response(serializer.data)
 
     def put(self, request):
@@ -607,6 +741,8 @@ class OrderConfirmationView(APIView):
                     contact_phone = request.data["contact"]
                     contact = Contact.objects.get(phone=contact_phone).id
                     order.contact_id = contact
+                    # оформленный заказ сохраняет цены на момент оформления
+                    placed = order.state != "basket"
                     order.state = "new"
                     order.save()
                     items = request.data["items"]
@@ -614,22 +750,36 @@ class OrderConfirmationView(APIView):
                         product_name = item["name"]
                         product_quantity = item["quantity"]
                         product = Product.objects.get(name=product_name).id
-                        product_id = ProductInfo.objects.get(product_id=product).id
-
-                        try:
-                            order_item = OrderItem.objects.get(
-                                order=order, product_info_id=product_id
-                            )
-                            order_item.quantity = product_quantity
-                            order_item.save()
-                        except ObjectDoesNotExist:
-                            OrderItem.objects.create(
-                                order=order,
-                                product_info_id=product_id,
-                                quantity=product_quantity,
-                            )
+                        product_info = ProductInfo.objects.current().get(
+                            product_id=product
+                        )
+                        product_id = product_info.id
+
+                        with transaction.atomic():
+                            try:
+                                order_item = OrderItem.objects.get(
+                                    order=order, product_info_id=product_id
+                                )
+                                added = product_quantity - order_item.quantity
+                                order_item.quantity = product_quantity
+                                order_item.save()
+                            except ObjectDoesNotExist:
+                                added = product_quantity
+                                OrderItem.objects.create(
+                                    order=order,
+                                    product_info_id=product_id,
+                                    quantity=product_quantity,
+                                )
+                            if placed:
+                                adjust_order_totals(order.id, added, product_info.price)
+                            else:
+                                refresh_order_totals([order.id])
                         user_email = request.user.email
-                        shop = ProductInfo.objects.get(product_id=product_id).shop_id
+                        shop = (
+                            ProductInfo.objects.current()
+                            .get(product_id=product_id)
+                            .shop_id
+                        )
                         shop1 = Shop.objects.get(id=shop)
                         admin_email = shop1.admin_email
                         if admin_email:
@@ -759,51 +909,119 @@ class PartnerUpdate(APIView):
             )
 
         try:
-            with transaction.atomic():
-                data = yaml.safe_load(yaml_file.read())
+            background, dry_run, profile, swap = (
+                strtobool(request.data.get(flag, "false"))
+                for flag in ("background", "dry_run", "profile", "swap")
+            )
+        except ValueError as error:
+            return Response(
+                {"Status": False, "Errors": str(error)},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
-                shop, _ = Shop.objects.get_or_create(
-                    name=data["shop"], user_id=request.user.id
-                )
+        if background and not (dry_run or profile):
+            job = ImportJob.objects.create(
+                user=request.user, file=yaml_file, swap=bool(swap)
+            )
+            status_url = request.build_absolute_uri(
+                f"/order_service/partner/update/{job.id}"
+            )
+            return Response(
+                {"Status": True, "job_id": job.id, "status_url": status_url},
+                status=status.HTTP_202_ACCEPTED,
+            )
 
-                Category.objects.filter(shops=shop).delete()
-                for category in data["categories"]:
-                    category_object, _ = Category.objects.get_or_create(
-                        id=category["id"], name=category["name"]
-                    )
-                    category_object.shops.add(shop.id)
+        try:
+            importer = import_price_list(
+                yaml_file, request.user.id, dry_run=bool(dry_run), swap=bool(swap)
+            )
+        except Exception as e:
+            return Response(
+                {"Status": False, "Errors": str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
 
-                ProductInfo.objects.filter(shop=shop).delete()
-                for item in data["goods"]:
-                    product, _ = Product.objects.get_or_create(
-                        name=item["name"], category_id=item["category"]
-                    )
+        response_data = {"Status": True, "Stats": importer.stats}
+        if dry_run:
+            response_data["DryRun"] = True
+        if profile:
+            response_data["Profile"] = importer.profile()
+        return Response(response_data)
 
-                    product_info = ProductInfo.objects.create(
-                        product=product,
-                        external_id=item["id"],
-                        model=item["model"],
-                        price=item["price"],
-                        price_rrc=item["price_rrc"],
-                        quantity=item["quantity"],
-                        shop=shop,
-                    )
 
-                    for name, value in item["parameters"].items():
-                        parameter_object, _ = Parameter.objects.get_or_create(name=name)
-                        ProductParameter.objects.create(
-                            product_info=product_info,
-                            parameter=parameter_object,
-                            value=value,
-                        )
+class PartnerUpdateStatus(APIView):
+    """
+    Класс для просмотра статуса фоновой загрузки прайса
+    """
 
-        except Exception as e:
+    authentication_classes = [TokenAuthentication]
+
+    @staticmethod
+    def get(request, job_id):
+        if not request.user.is_authenticated:
             return Response(
-                {"Status": False, "Errors": str(e)},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                {"Status": False, "Error": "Вход в систему не выполнен"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        job = ImportJob.objects.filter(id=job_id, user_id=request.user.id).first()
+        if job is None:
+            return Response(
+                {"Status": False, "Errors": "Загрузка не найдена"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        return Response({**ImportJobSerializer(job).data, **get_progress(job)})
+
+
+class PartnerStock(APIView):
+    """
+    Класс для обновления остатков и цен поставщика без загрузки прайса
+    """
+
+    parser_classes = [JSONParser, CSVParser]
+    authentication_classes = [TokenAuthentication]
+
+    @staticmethod
+    def post(request):
+        if not request.user.is_authenticated:
+            return Response(
+                {"Status": False, "Error": "Вход в систему не выполнен"},
+                status=status.HTTP_403_FORBIDDEN,
             )
 
-        return Response({"Status": True})
+        if request.user.type != "shop":
+            return Response(
+                {"Status": False, "Error": "Только для магазинов"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        shop = Shop.objects.filter(user_id=request.user.id).first()
+        if shop is None:
+            return Response(
+                {"Status": False, "Errors": "Сначала загрузите прайс магазина"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # строки можно передать списком или в ключе items
+        items = request.data
+        if isinstance(items, dict):
+            items = items.get("items")
+        if not items or not isinstance(items, list):
+            return Response(
+                {"Status": False, "Errors": "Не указаны все необходимые аргументы"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            stats = sync_stock(shop, items)
+        except (TypeError, ValueError) as error:
+            return Response(
+                {"Status": False, "Errors": str(error)},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        return Response({"Status": True, "Stats": stats})
 
 
 class PartnerState(APIView):
@@ -840,9 +1058,12 @@ class PartnerState(APIView):
         state = request.data.get("state")
         if state is not None:
             try:
-                Shop.objects.filter(user_id=request.user.id).update(
-                    state=strtobool(state)
+                state = strtobool(state)
+                Shop.objects.filter(user_id=request.user.id).update(state=state)
+                CatalogEntry.objects.filter(shop__user_id=request.user.id).update(
+                    shop_state=state, updated_at=Now()
                 )
+                bump_catalog_version()
                 return JsonResponse(self.SUCCESS_STATUS)
             except ValueError as error:
                 return JsonResponse(
@@ -874,26 +1095,23 @@ class PartnerOrders(APIView):
                 {"Status": False, "Error": "Только для магазинов"}, status=403
             )
 
+        context = sparse_context(request)
         orders = (
-            Order.objects.filter(
-                ordered_items__product_info__shop__user=request.user,
-                state__exact="basket",
-            )
-            .prefetch_related(
-                "ordered_items__product_info__product__category",
-                "ordered_items__product_info__product_parameters__parameter",
-            )
-            .select_related("contact")
-            .annotate(
-                total_sum=Sum(
-                    F("ordered_items__quantity")
-                    * F("ordered_items__product_info__price")
-                )
+            order_relations(
+                Order.objects.filter(
+                    ordered_items__product_info__shop__user=request.user,
+                    state__exact="basket",
+                ),
+                context,
             )
+            # заказ с несколькими позициями магазина попадает в выборку
+            # несколько раз
             .distinct()
         )
 
-        serializer = OrderSerializer(orders, many=True)
+        if not context:
+            return Response(order_rows(orders))
+        serializer = OrderSerializer(orders, many=True, context=context)
         return Response(serializer.data)
 
 